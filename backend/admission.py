@@ -0,0 +1,197 @@
+"""
+Career Flow Diagnostic Tool - Admission Control
+Decides whether a new submission may start an analysis, so a traffic spike queues
+politely instead of piling every worker onto Anthropic:
+
+- per-IP and per-email fixed-window rate limits     -> 429 with Retry-After
+- a global cap on queued + running analysis jobs    -> 503 with Retry-After and queue position
+
+Counters live in the rate_limit_counter table and are bumped with a single upsert,
+so limits hold across gunicorn workers and machines. The in-flight cap is checked once
+up front and again by reserve_slot() inside the transaction that inserts the job; a
+submission turned away there gets its rate-limit hits back (refund()).
+"""
+
+from datetime import datetime, timedelta
+import math
+import os
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AnalysisJob, RateLimitCounter
+import jobs
+
+ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+IP_LIMIT = int(os.environ.get('ADMISSION_IP_LIMIT', 20))
+IP_WINDOW = int(os.environ.get('ADMISSION_IP_WINDOW', 3600))
+EMAIL_LIMIT = int(os.environ.get('ADMISSION_EMAIL_LIMIT', 5))
+EMAIL_WINDOW = int(os.environ.get('ADMISSION_EMAIL_WINDOW', 3600))
+MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 50))
+# Analysis workers across all processes, used to estimate how long the queue takes to drain
+WORKER_CAPACITY = int(os.environ.get('ADMISSION_WORKER_CAPACITY', jobs.WORKER_COUNT))
+# Number of reverse proxies in front of the app whose X-Forwarded-For entries can be trusted;
+# create_app() applies it with ProxyFix. Railway always puts one proxy in front (and sets RAILWAY_ENVIRONMENT)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1 if os.environ.get('RAILWAY_ENVIRONMENT') else 0))
+# Postgres advisory lock serializing reserve_slot() with the job insert
+IN_FLIGHT_LOCK_KEY = 7291504
+
+DEFAULT_JOB_SECONDS = 45
+
+class Rejection:
+    """Why a submission was refused and when to retry"""
+
+    def __init__(self, status_code, error, retry_after, queue_position=None):
+        self.status_code = status_code
+        self.error = error
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.queue_position = queue_position
+
+    def to_dict(self):
+        result = {'success': False, 'error': self.error, 'retry_after': self.retry_after}
+        if self.queue_position is not None:
+            result['queue_position'] = self.queue_position
+        return result
+
+def client_ip(request):
+    """Caller's address; ProxyFix has already taken it from X-Forwarded-For as far as TRUSTED_PROXY_HOPS allows"""
+    return request.remote_addr or 'unknown'
+
+EPOCH = datetime(1970, 1, 1)
+
+def _window_start(now, window):
+    seconds = int((now - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % window)
+
+def hit(bucket, window):
+    """
+    Count one request against bucket's current window; returns (count, seconds until the window resets).
+    Commits immediately so concurrent workers see each other's hits.
+    """
+    now = datetime.utcnow()
+    start = _window_start(now, window)
+    values = {'bucket': bucket, 'window_start': start, 'count': 1}
+    table = RateLimitCounter.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table).values(**values)
+        statement = insert.on_conflict_do_update(
+            index_elements=['bucket', 'window_start'],
+            set_={'count': table.c.count + 1}
+        ).returning(table.c.count)
+        count = db.session.execute(statement).scalar_one()
+    else:
+        result = db.session.execute(
+            db.update(table).where(table.c.bucket == bucket, table.c.window_start == start)
+            .values(count=table.c.count + 1)
+        )
+        if result.rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(table).values(**values))
+            except IntegrityError:
+                db.session.execute(
+                    db.update(table).where(table.c.bucket == bucket, table.c.window_start == start)
+                    .values(count=table.c.count + 1)
+                )
+        count = db.session.execute(
+            db.select(table.c.count).where(table.c.bucket == bucket, table.c.window_start == start)
+        ).scalar_one()
+
+    if count == 1:
+        # First hit of a new window: drop this bucket's old windows
+        db.session.execute(db.delete(table).where(table.c.bucket == bucket, table.c.window_start < start))
+    db.session.commit()
+    return count, (start + timedelta(seconds=window) - now).total_seconds()
+
+def in_flight_count():
+    return db.session.execute(
+        db.select(db.func.count(AnalysisJob.id)).where(AnalysisJob.status.in_([jobs.QUEUED, jobs.RUNNING]))
+    ).scalar_one()
+
+def average_job_seconds(sample=20):
+    """Mean duration of recently completed jobs, used for Retry-After estimates"""
+    rows = db.session.execute(
+        db.select(AnalysisJob.started_at, AnalysisJob.finished_at)
+        .where(AnalysisJob.status == jobs.COMPLETED, AnalysisJob.started_at.isnot(None))
+        .order_by(AnalysisJob.id.desc())
+        .limit(sample)
+    ).all()
+    durations = [(finished - started).total_seconds() for started, finished in rows if finished]
+    return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+def queue_position(job):
+    """1-based position of a queued job among queued jobs (0 once it is running)"""
+    if job.status != jobs.QUEUED:
+        return 0
+    ahead = db.session.execute(
+        db.select(db.func.count(AnalysisJob.id))
+        .where(AnalysisJob.status == jobs.QUEUED, AnalysisJob.id < job.id)
+    ).scalar_one()
+    return ahead + 1
+
+def _over_capacity():
+    in_flight = in_flight_count()
+    if in_flight < MAX_IN_FLIGHT:
+        return None
+    ahead = in_flight - MAX_IN_FLIGHT + 1
+    retry_after = average_job_seconds() * ahead / max(WORKER_CAPACITY, 1)
+    return Rejection(503, 'We are generating a lot of reports right now. Please retry shortly.',
+                     retry_after, queue_position=in_flight + 1)
+
+def _email_bucket(email):
+    email = (email or '').strip().lower()
+    return f"email:{email}" if email else None
+
+def check(ip, email):
+    """Returns a Rejection, or None when the submission may proceed"""
+    if not ENABLED:
+        return None
+
+    rejection = _over_capacity()
+    if rejection is not None:
+        return rejection
+
+    count, reset_in = hit(f"ip:{ip}", IP_WINDOW)
+    if count > IP_LIMIT:
+        return Rejection(429, 'Too many submissions from this network. Please try again later.', reset_in)
+
+    bucket = _email_bucket(email)
+    if bucket:
+        count, reset_in = hit(bucket, EMAIL_WINDOW)
+        if count > EMAIL_LIMIT:
+            return Rejection(429, 'Too many submissions for this email address. Please try again later.', reset_in)
+    return None
+
+def reserve_slot():
+    """
+    Re-check the in-flight cap in the submission's transaction, after its first write and before
+    the job insert, so concurrent submissions can't all pass the check in check(). On Postgres a
+    transaction-scoped advisory lock serializes this until commit; SQLite already holds its single
+    write lock from the first write. Returns a Rejection (the caller rolls back) or None.
+    """
+    if not ENABLED:
+        return None
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {'key': IN_FLIGHT_LOCK_KEY})
+    return _over_capacity()
+
+def refund(ip, email):
+    """
+    Take back the hits check() counted for a submission that reserve_slot() then refused, so
+    retrying after that 503 doesn't use up the caller's rate limits. Commits immediately.
+    """
+    if not ENABLED:
+        return
+    now = datetime.utcnow()
+    table = RateLimitCounter.__table__
+    for bucket, window in ((f"ip:{ip}", IP_WINDOW), (_email_bucket(email), EMAIL_WINDOW)):
+        if bucket:
+            db.session.execute(
+                db.update(table)
+                .where(table.c.bucket == bucket, table.c.window_start == _window_start(now, window),
+                       table.c.count > 0)
+                .values(count=table.c.count - 1)
+            )
+    db.session.commit()
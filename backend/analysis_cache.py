@@ -0,0 +1,231 @@
+"""
+Career Flow Diagnostic Tool - Analysis Cache
+Content-addressed cache in front of generate_claude_analysis.
+
+Keys are a SHA-256 of the normalized prompt inputs plus model name and prompt version,
+so a resubmitted form reuses the earlier result instead of paying for another Claude call.
+Two tiers: a per-process LRU with TTL eviction, and a shared database table that every
+gunicorn worker can read.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AnalysisCacheEntry
+import compensation_index
+import metrics
+
+CACHE_ENABLED = os.environ.get('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+LOCAL_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_LOCAL_SIZE', 256))
+LOCAL_TTL = int(os.environ.get('ANALYSIS_CACHE_LOCAL_TTL', 3600))
+SHARED_TTL = int(os.environ.get('ANALYSIS_CACHE_SHARED_TTL', 7 * 24 * 3600))
+
+# Assessment fields that appear in the Claude prompt; anything else (e.g. email) must not affect the key
+PROMPT_FIELDS = {
+    'name': str,
+    'role': str,
+    'industry': str,
+    'location': str,
+    'current_salary': int,
+    'years_experience': int,
+    'last_raise_percent': float,
+    'technical_skills': list,
+    'certifications': str,
+    'education_level': str,
+    'role_description': str,
+    'value_articulation': str,
+    'negotiation_experience': str,
+    'visibility_rating': int,
+    'values_clarity': int,
+    'purpose_alignment': int,
+    'lifestyle_fit': int,
+    'energy_level': int,
+    # The benchmark figures as the prompt shows them: the narrative cites them, so a rebuild that
+    # moves a cohort's figures misses for that cohort only (the raw benchmark numbers don't count)
+    'compensation_gap': dict,
+}
+
+def _normalize_text(value):
+    return ' '.join(str(value).split())
+
+def normalize_inputs(assessment_data):
+    """Canonical form of the prompt-relevant fields: collapsed whitespace, coerced numbers, sorted skills"""
+    normalized = {}
+    for field, kind in PROMPT_FIELDS.items():
+        value = assessment_data.get(field)
+        if value is None or value == '':
+            normalized[field] = None
+        elif kind is dict:
+            normalized[field] = {key: value.get(key) for key in compensation_index.GAP_FIELDS}
+        elif kind is list:
+            items = value if isinstance(value, list) else [value]
+            normalized[field] = sorted(_normalize_text(item) for item in items)
+        elif kind is str:
+            normalized[field] = _normalize_text(value)
+        else:
+            try:
+                normalized[field] = kind(float(value))
+            except (TypeError, ValueError):
+                normalized[field] = _normalize_text(value)
+    return normalized
+
+def make_key(assessment_data, model, prompt_version):
+    canonical = json.dumps({
+        'inputs': normalize_inputs(assessment_data),
+        'model': model,
+        'prompt_version': prompt_version
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class AnalysisCache:
+    """Two-tier (process-local LRU + shared database) analysis cache"""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES, local_ttl=LOCAL_TTL, shared_ttl=SHARED_TTL):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self._local = OrderedDict()  # key -> (expires_at monotonic, json text)
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'bypasses': 0, 'evictions': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                self._stats['evictions'] += 1
+                return None
+            self._local.move_to_end(key)
+            return text
+
+    def _set_local(self, key, text):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, text)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get(self, key):
+        """Return the cached analysis dict for key, or None"""
+        text = self._get_local(key)
+        if text is not None:
+            self._count('local_hits')
+            return json.loads(text)
+
+        entry = db.session.get(AnalysisCacheEntry, key)
+        if entry is not None and entry.expires_at > datetime.utcnow():
+            db.session.execute(
+                db.update(AnalysisCacheEntry)
+                .where(AnalysisCacheEntry.key == key)
+                .values(hit_count=AnalysisCacheEntry.hit_count + 1)
+            )
+            db.session.commit()
+            self._set_local(key, entry.result)
+            self._count('shared_hits')
+            return json.loads(entry.result)
+
+        self._count('misses')
+        return None
+
+    def set(self, key, analysis, model, prompt_version):
+        text = json.dumps(analysis)
+        self._set_local(key, text)
+
+        entry = AnalysisCacheEntry(
+            key=key,
+            model=model,
+            prompt_version=prompt_version,
+            result=text,
+            expires_at=datetime.utcnow() + timedelta(seconds=self.shared_ttl)
+        )
+        try:
+            db.session.merge(entry)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker stored the same key first - its result is just as good
+            db.session.rollback()
+        self._count('stores')
+
+    def invalidate(self, key=None, prompt_version=None):
+        """
+        Drop cached analyses: one key, every entry for a prompt version, or everything.
+        Returns the number of shared entries removed.
+        """
+        query = db.delete(AnalysisCacheEntry)
+        if key:
+            query = query.where(AnalysisCacheEntry.key == key)
+        elif prompt_version:
+            query = query.where(AnalysisCacheEntry.prompt_version == prompt_version)
+        removed = db.session.execute(query).rowcount
+        db.session.commit()
+
+        with self._lock:
+            # Local entries don't record their version, so anything broader than one key clears the tier
+            if key:
+                self._local.pop(key, None)
+            else:
+                self._local.clear()
+        return removed
+
+    def purge_expired(self):
+        removed = db.session.execute(
+            db.delete(AnalysisCacheEntry).where(AnalysisCacheEntry.expires_at <= datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['local_entries'] = len(self._local)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        return stats
+
+cache = AnalysisCache()
+
+def get_or_generate(assessment_data, generate, model, prompt_version, bypass=False):
+    """
+    Return (analysis, cache_status) where cache_status is 'hit', 'miss' or 'bypass'.
+    On a miss or bypass the fresh result is stored for later submissions.
+    """
+    if not CACHE_ENABLED:
+        return generate(assessment_data), 'disabled'
+
+    key = make_key(assessment_data, model, prompt_version)
+    if bypass:
+        cache._count('bypasses')
+    else:
+        with metrics.stage('analysis.cache_lookup'):
+            cached = cache.get(key)
+        if cached is not None:
+            return cached, 'hit'
+
+    analysis = generate(assessment_data)
+    cache.set(key, analysis, model, prompt_version)
+    return analysis, 'bypass' if bypass else 'miss'
+
+def lookup(assessment_data, model, prompt_version):
+    """Cached analysis for these inputs, or None (used by the streaming path)"""
+    if not CACHE_ENABLED:
+        return None
+    return cache.get(make_key(assessment_data, model, prompt_version))
+
+def store(assessment_data, analysis, model, prompt_version):
+    if CACHE_ENABLED:
+        cache.set(make_key(assessment_data, model, prompt_version), analysis, model, prompt_version)
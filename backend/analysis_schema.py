@@ -0,0 +1,131 @@
+"""
+Career Flow Diagnostic Tool - Analysis Schema
+Formal JSON schema of the report. It is used both as the tool input schema that constrains
+generation and to validate results, section by section, so a repair pass can regenerate
+only what is missing or malformed.
+"""
+
+TOOL_NAME = 'record_analysis'
+
+def _text(description):
+    return {'type': 'string', 'minLength': 1, 'description': description}
+
+def _object(properties):
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties)
+    }
+
+SECTION_SCHEMAS = {
+    'executive_summary': _text('2-3 sentence overview of their biggest opportunity'),
+    'compensation_gap': _object({
+        'market_salary_range': _text('Estimated market range for their experience/role'),
+        'gap_percentage': _text('Estimated % below market'),
+        'annual_opportunity': _text('Dollar amount leaving on table'),
+        'key_insight': _text('Why this gap exists')
+    }),
+    'leverage_points': {
+        'type': 'array',
+        'minItems': 3,
+        'maxItems': 3,
+        'items': _object({
+            'area': _text('Highest leverage area (technical/positioning/alignment)'),
+            'current_state': _text("What's happening now"),
+            'impact': _text('Why this matters for compensation'),
+            'quick_win': _text('Specific action they can take this week')
+        })
+    },
+    'positioning_diagnosis': _object({
+        'language_gaps': _text('How their self-description undersells them'),
+        'visibility_issues': _text('Problems with how work is perceived'),
+        'narrative_coherence': _text('Strength of their career story'),
+        'specific_fixes': {
+            'type': 'array',
+            'minItems': 1,
+            'items': _text('Concrete positioning change')
+        }
+    }),
+    'alignment_assessment': _object({
+        'values_insight': _text('What their scores reveal about purpose/values'),
+        'energy_pattern': _text('Connection between alignment and engagement'),
+        'strategic_implication': _text('How alignment affects negotiation leverage')
+    }),
+    'ninety_day_roadmap': {
+        'type': 'array',
+        'minItems': 3,
+        'maxItems': 3,
+        'items': _object({
+            'week_range': _text('e.g. Weeks 1-4'),
+            'focus': _text('Primary objective'),
+            'actions': {'type': 'array', 'minItems': 1, 'items': _text('Specific action')},
+            'success_metric': _text("How to know it's working")
+        })
+    },
+    'next_step': _text('Clear call to action for working together')
+}
+
+SECTIONS = list(SECTION_SCHEMAS)
+
+# What the model writes when the compensation figures come from the local index (compensation_index.py)
+BENCHMARKED_SECTION_SCHEMAS = dict(SECTION_SCHEMAS, compensation_gap=_object({
+    'key_insight': _text('Why this gap exists, explaining the COMPENSATION BENCHMARK figures')
+}))
+
+def sections_schema(names=None, schemas=SECTION_SCHEMAS):
+    """Object schema covering the given sections (all by default)"""
+    names = SECTIONS if names is None else [name for name in SECTIONS if name in names]
+    return _object({name: schemas[name] for name in names})
+
+ANALYSIS_SCHEMA = sections_schema()
+
+def analysis_tool(schema=ANALYSIS_SCHEMA):
+    return {
+        'name': TOOL_NAME,
+        'description': 'Record the Career Flow analysis for this client.',
+        'input_schema': schema
+    }
+
+_TYPES = {'string': str, 'object': dict, 'array': list}
+
+def _errors(value, schema, path):
+    expected = _TYPES[schema['type']]
+    if not isinstance(value, expected):
+        return [f"{path} must be {schema['type']}"]
+
+    if expected is str:
+        return [f"{path} is empty"] if len(value.strip()) < schema.get('minLength', 0) else []
+
+    errors = []
+    if expected is dict:
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append(f"{path}.{key} is missing")
+        for key, child in schema['properties'].items():
+            if key in value:
+                errors.extend(_errors(value[key], child, f"{path}.{key}"))
+    else:
+        if len(value) < schema.get('minItems', 0):
+            errors.append(f"{path} needs at least {schema['minItems']} items")
+        if len(value) > schema.get('maxItems', len(value)):
+            errors.append(f"{path} allows at most {schema['maxItems']} items")
+        for i, item in enumerate(value):
+            errors.extend(_errors(item, schema['items'], f"{path}[{i}]"))
+    return errors
+
+def section_errors(analysis, schemas=SECTION_SCHEMAS):
+    """
+    Map of section name -> list of problems, for every missing or invalid section.
+    Empty when the analysis matches the schema.
+    """
+    if not isinstance(analysis, dict):
+        return {name: ['analysis is not an object'] for name in SECTIONS}
+    problems = {}
+    for name, schema in schemas.items():
+        if name not in analysis:
+            problems[name] = [f"{name} is missing"]
+            continue
+        errors = _errors(analysis[name], schema, name)
+        if errors:
+            problems[name] = errors
+    return problems
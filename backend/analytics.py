@@ -0,0 +1,238 @@
+"""
+Career Flow Diagnostic Tool - Analytics Rollups
+Cohort statistics for the admin dashboard, kept in pre-aggregated tables. Each new assessment
+adds itself to one row per cohort (all, role, industry, location) for its submission day, in
+the same transaction as the insert, so the analytics endpoint reads day rows instead of
+assessments and its cost depends on the date range and cohort count, not the table size.
+Medians and distributions come from fixed-width bins (SALARY_BIN, RAISE_BIN).
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+import math
+import os
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Assessment, AssessmentAnalysis, AnalyticsRollup, AnalyticsHistogram
+
+DIMENSIONS = ['all', 'role', 'industry', 'location']
+BUCKETS = ['day', 'week', 'month', 'all']
+SALARY_BIN = int(os.environ.get('ANALYTICS_SALARY_BIN', 5000))
+RAISE_BIN = float(os.environ.get('ANALYTICS_RAISE_BIN', 1.0))
+
+ROLLUP_KEY = ['dimension', 'day', 'value']
+HISTOGRAM_KEY = ['dimension', 'day', 'value', 'metric', 'bin']
+# Rollup column prefix -> Assessment field summed into it
+AVERAGED = {
+    'salary': 'current_salary',
+    'raise': 'last_raise_percent',
+    'values_clarity': 'values_clarity',
+    'energy_level': 'energy_level'
+}
+BIN_WIDTHS = {'current_salary': SALARY_BIN, 'last_raise_percent': RAISE_BIN}
+
+def cohort_value(value):
+    return (value or '').strip().lower()[:100]
+
+def _cohorts(assessment):
+    return [('all', '')] + [(dimension, cohort_value(getattr(assessment, dimension))) for dimension in DIMENSIONS[1:]]
+
+def _number(assessment, field):
+    """
+    Numeric answer as its column's type. The form posts numbers as strings, which the insert
+    converts but the flushed object keeps; blank answers count as missing.
+    """
+    value = getattr(assessment, field)
+    if value is None or not isinstance(value, str):
+        return value
+    if not value.strip():
+        return None
+    value = float(value)
+    return int(value) if Assessment.__table__.c[field].type.python_type is int else value
+
+def _rollup_counters(assessment, analyzed):
+    counters = {'assessments': 1, 'analyzed': 1 if analyzed else 0}
+    for prefix, field in AVERAGED.items():
+        value = _number(assessment, field)
+        counters[f'{prefix}_count'] = 0 if value is None else 1
+        counters[f'{prefix}_sum'] = 0 if value is None else value
+    return counters
+
+def _bins(assessment):
+    values = {metric: _number(assessment, metric) for metric in BIN_WIDTHS}
+    return [(metric, int(math.floor(values[metric] / width)))
+            for metric, width in BIN_WIDTHS.items() if values[metric] is not None]
+
+def _increment(table, key_columns, rows):
+    """
+    Add each row's counters to the stored row with the same key, creating it if needed.
+    Every row must carry the same columns. Rows are applied in key order so concurrent
+    writers lock them in the same order.
+    """
+    rows = sorted(rows, key=lambda row: [str(row[column]) for column in key_columns])
+    counters = [column for column in rows[0] if column not in key_columns]
+    dialect = db.engine.dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        # Rows go in as executemany parameters, so the statement compiles once and is cached
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + insert.excluded[column] for column in counters}
+        ), rows)
+        return
+
+    for row in rows:
+        match = [table.c[column] == row[column] for column in key_columns]
+        add = {column: table.c[column] + row[column] for column in counters}
+        if db.session.execute(db.update(table).where(*match).values(add)).rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(table).values(**row))
+            except IntegrityError:
+                db.session.execute(db.update(table).where(*match).values(add))
+
+def record_assessment(assessment):
+    """Add a new (flushed) assessment to its cohorts' rollups; the caller commits"""
+    day = assessment.submitted_at.date()
+    cohorts = _cohorts(assessment)
+    counters = _rollup_counters(assessment, analyzed=False)
+    _increment(AnalyticsRollup.__table__, ROLLUP_KEY,
+               [dict(dimension=dimension, day=day, value=value, **counters) for dimension, value in cohorts])
+    bins = _bins(assessment)
+    if bins:
+        _increment(AnalyticsHistogram.__table__, HISTOGRAM_KEY,
+                   [dict(dimension=dimension, day=day, value=value, metric=metric, bin=bin, count=1)
+                    for dimension, value in cohorts for metric, bin in bins])
+
+def record_analysis(assessment):
+    """Count an assessment's first stored analysis; the caller commits"""
+    day = assessment.submitted_at.date()
+    _increment(AnalyticsRollup.__table__, ROLLUP_KEY,
+               [dict(dimension=dimension, day=day, value=value, analyzed=1) for dimension, value in _cohorts(assessment)])
+
+def rebuild(start=None, batch_size=1000):
+    """
+    Recompute the rollups from the assessment table, for every day or from start (a date) on.
+    Run it for backfills or after changing the bin widths; returns the number of assessments read.
+    """
+    rollups = {}
+    histograms = defaultdict(int)
+    query = (db.select(Assessment.submitted_at, Assessment.role, Assessment.industry, Assessment.location,
+                       *[getattr(Assessment, field) for field in AVERAGED.values()],
+                       AssessmentAnalysis.assessment_id.isnot(None).label('analyzed'))
+             .outerjoin(AssessmentAnalysis)
+             .where(Assessment.submitted_at.isnot(None)))
+    if start is not None:
+        query = query.where(Assessment.submitted_at >= datetime.combine(start, datetime.min.time()))
+
+    scanned = 0
+    for row in db.session.execute(query.execution_options(yield_per=batch_size)):
+        scanned += 1
+        day = row.submitted_at.date()
+        counters = _rollup_counters(row, row.analyzed)
+        bins = _bins(row)
+        for dimension, value in _cohorts(row):
+            totals = rollups.setdefault((dimension, day, value), defaultdict(int))
+            for column, amount in counters.items():
+                totals[column] += amount
+            for metric, bin in bins:
+                histograms[(dimension, day, value, metric, bin)] += 1
+
+    for model in (AnalyticsRollup, AnalyticsHistogram):
+        delete = db.delete(model)
+        if start is not None:
+            delete = delete.where(model.day >= start)
+        db.session.execute(delete)
+    if rollups:
+        db.session.execute(db.insert(AnalyticsRollup), [
+            dict(zip(ROLLUP_KEY, key), **totals) for key, totals in rollups.items()
+        ])
+    if histograms:
+        db.session.execute(db.insert(AnalyticsHistogram), [
+            dict(zip(HISTOGRAM_KEY, key), count=count) for key, count in histograms.items()
+        ])
+    db.session.commit()
+    return scanned
+
+def needs_backfill():
+    """True when there are assessments but no rollups yet (e.g. right after this table was added)"""
+    has_rollups = db.session.execute(db.select(AnalyticsRollup.day).limit(1)).first() is not None
+    return not has_rollups and db.session.execute(db.select(Assessment.id).limit(1)).first() is not None
+
+def bucket_start(day, bucket):
+    if bucket == 'day':
+        return day
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return None
+
+def histogram_median(bins, width):
+    """Median interpolated within its bin, from {bin: count}"""
+    total = sum(bins.values())
+    if not total:
+        return None
+    target, seen = total / 2, 0
+    for bin in sorted(bins):
+        if seen + bins[bin] >= target:
+            return (bin + (target - seen) / bins[bin]) * width
+        seen += bins[bin]
+
+def _average(totals, prefix, digits=1):
+    count = totals[f'{prefix}_count']
+    if not count:
+        return None
+    average = totals[f'{prefix}_sum'] / count
+    return round(average, digits) if digits else round(average)
+
+def summarize(dimension='all', bucket='month', start=None, end=None, value=None):
+    """Cohort stats per period from the rollup tables; start and end are inclusive dates"""
+    conditions = {}
+    for model in (AnalyticsRollup, AnalyticsHistogram):
+        where = [model.dimension == dimension]
+        if start is not None:
+            where.append(model.day >= start)
+        if end is not None:
+            where.append(model.day <= end)
+        if value is not None:
+            where.append(model.value == cohort_value(value))
+        conditions[model] = where
+
+    groups = defaultdict(lambda: {'totals': defaultdict(int), 'bins': defaultdict(lambda: defaultdict(int))})
+    for row in db.session.execute(db.select(AnalyticsRollup).where(*conditions[AnalyticsRollup])).scalars():
+        totals = groups[(bucket_start(row.day, bucket), row.value)]['totals']
+        for column in AnalyticsRollup.__table__.columns.keys():
+            if column not in ROLLUP_KEY:
+                totals[column] += getattr(row, column)
+    for row in db.session.execute(
+        db.select(AnalyticsHistogram.day, AnalyticsHistogram.value, AnalyticsHistogram.metric,
+                  AnalyticsHistogram.bin, AnalyticsHistogram.count)
+        .where(*conditions[AnalyticsHistogram])
+    ):
+        groups[(bucket_start(row.day, bucket), row.value)]['bins'][row.metric][row.bin] += row.count
+
+    results = []
+    for (period, cohort), group in groups.items():
+        totals, bins = group['totals'], group['bins']
+        median_salary = histogram_median(bins['current_salary'], SALARY_BIN)
+        results.append({
+            'period': period.isoformat() if period else None,
+            'cohort': cohort if dimension != 'all' else None,
+            'assessments': totals['assessments'],
+            'analyzed': totals['analyzed'],
+            'median_salary': round(median_salary) if median_salary is not None else None,
+            'avg_salary': _average(totals, 'salary', 0),
+            'avg_values_clarity': _average(totals, 'values_clarity'),
+            'avg_energy_level': _average(totals, 'energy_level'),
+            'avg_last_raise_percent': _average(totals, 'raise'),
+            'last_raise_distribution': [
+                {'from': bin * RAISE_BIN, 'to': (bin + 1) * RAISE_BIN, 'count': count}
+                for bin, count in sorted(bins['last_raise_percent'].items())
+            ]
+        })
+    results.sort(key=lambda result: (result['period'] or '', -result['assessments'], result['cohort'] or ''))
+    return results
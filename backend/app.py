@@ -3,17 +3,43 @@ Career Flow Diagnostic Tool - Backend API
 Flask application handling assessment submission, Claude API integration, and report generation
 """
 
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import anthropic
+from flask import Flask, Blueprint, request, jsonify, send_file, Response, stream_with_context
+from flask.cli import with_appcontext
+from datetime import date, datetime
+import base64
+import click
 import json
+import time
 import os
+import socket
 from io import BytesIO
 from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
 import threading
 
+from models import db, Assessment, AssessmentAnalysis, AnalysisJob, AnalysisCacheEntry, BulkExport, EmailOutbox, ensure_columns, ensure_indexes, migrate_legacy_analyses
+import jobs
+import analysis_cache
+import reports
+import bulk_export
+import assessment_export
+import analytics
+import search
+import scoring
+import compensation_index
+import outbox
+from assessment_filters import parse_assessment_filters
+from json_stream import SectionParser
+from llm_gateway import gateway
+import llm_providers
+import prompts
+import analysis_schema
+import idempotency
+import admission
+import metrics
+import http_middleware
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -30,62 +56,14 @@ def get_database_url():
         return database_url
     # Fallback to SQLite for local development
     return 'sqlite:///career_flow.db'
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# CORS configuration
-cors_origins = os.environ.get('CORS_ORIGINS', 'http://localhost:3000')
-# Support multiple origins separated by comma, strip trailing slashes
-allowed_origins = [origin.strip().rstrip('/') for origin in cors_origins.split(',')]
-
-# Apply CORS to all routes - Flask-CORS handles everything automatically
-CORS(app, 
-     origins=allowed_origins,
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization"],
-     supports_credentials=True,
-     expose_headers=None,
-     max_age=3600)
-
-# Explicit CORS handler as backup - ensure headers are always set
-@app.after_request
-def add_cors_headers(response):
-    """Explicitly add CORS headers to all responses"""
-    origin = request.headers.get('Origin')
-    if origin:
-        # Check if origin is in allowed list (with flexible matching)
-        origin_normalized = origin.rstrip('/')
-        for allowed in allowed_origins:
-            allowed_normalized = allowed.rstrip('/')
-            if origin_normalized == allowed_normalized or origin == allowed:
-                response.headers['Access-Control-Allow-Origin'] = origin
-                response.headers['Access-Control-Allow-Credentials'] = 'true'
-                response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-                response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-                if request.method == 'OPTIONS':
-                    response.headers['Access-Control-Max-Age'] = '3600'
-                break
-    return response
 
-# Global error handler to catch all exceptions and return with CORS headers
-@app.errorhandler(Exception)
+# Global error handler; CORS headers come from http_middleware like on any other response
 def handle_exception(e):
-    """Handle all exceptions and return with CORS headers"""
+    """Handle all exceptions with a JSON 500"""
     import traceback
     error_trace = traceback.format_exc()
     print(f"Unhandled exception: {error_trace}")
+    metrics.record_error('http', e)
     
     # Create error response
     response = jsonify({
@@ -94,377 +72,295 @@ def handle_exception(e):
         'details': error_trace if os.environ.get('FLASK_ENV') == 'development' else None
     })
     
-    # Add CORS headers to error response
-    origin = request.headers.get('Origin') if request else None
-    if origin:
-        origin_normalized = origin.rstrip('/')
-        for allowed in allowed_origins:
-            allowed_normalized = allowed.rstrip('/')
-            if origin_normalized == allowed_normalized or origin == allowed:
-                response.headers['Access-Control-Allow-Origin'] = origin
-                response.headers['Access-Control-Allow-Credentials'] = 'true'
-                response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-                response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-                break
-    
     return response, 500
 
-db = SQLAlchemy(app)
+def queue_metrics():
+    """Scrape-time gauges: analysis jobs and report emails by status"""
+    lines = []
+    for name, model, documentation in (
+        ('careerflow_analysis_jobs', AnalysisJob, 'Analysis jobs by status'),
+        ('careerflow_email_outbox', EmailOutbox, 'Report emails by status')
+    ):
+        counts = db.session.execute(db.select(model.status, db.func.count(model.id)).group_by(model.status)).all()
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{status="{status}"}} {count}' for status, count in counts]
+    return lines
 
-# Database Models
-class Assessment(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Compensation Data
-    current_salary = db.Column(db.Integer)
-    years_experience = db.Column(db.Integer)
-    role = db.Column(db.String(100))
-    industry = db.Column(db.String(100))
-    location = db.Column(db.String(100))
-    last_raise_percent = db.Column(db.Float)
-    
-    # Technical Skills (JSON stored as text)
-    technical_skills = db.Column(db.Text)
-    certifications = db.Column(db.Text)
-    education_level = db.Column(db.String(50))
-    
-    # Positioning & Communication
-    role_description = db.Column(db.Text)
-    value_articulation = db.Column(db.Text)
-    negotiation_experience = db.Column(db.Text)
-    visibility_rating = db.Column(db.Integer)  # 1-10 scale
-    
-    # Alignment Factors
-    values_clarity = db.Column(db.Integer)  # 1-10 scale
-    purpose_alignment = db.Column(db.Integer)  # 1-10 scale
-    lifestyle_fit = db.Column(db.Integer)  # 1-10 scale
-    energy_level = db.Column(db.Integer)  # 1-10 scale
-    
-    # Claude Analysis (stored as JSON)
-    analysis_result = db.Column(db.Text)
-    report_generated = db.Column(db.Boolean, default=False)
-    report_sent = db.Column(db.Boolean, default=False)
+def init_db():
+    """Create missing tables, columns and indexes and move legacy data; safe to re-run on every deploy"""
+    db.create_all()
+    ensure_columns()
+    ensure_indexes()
+    moved = migrate_legacy_analyses()
+    if moved:
+        print(f"Moved {moved} analyses to assessment_analysis")
+    if analytics.needs_backfill():
+        print(f"Built analytics rollups from {analytics.rebuild()} assessments")
+    search.ensure_index()
+    if search.needs_backfill():
+        print(f"Indexed {search.rebuild()} assessments for search")
 
-# Create tables
-with app.app_context():
-    try:
-        db.create_all()
-        print("Database tables created successfully")
-    except Exception as e:
-        print(f"Warning: Could not create database tables: {e}")
-        print("This is normal if tables already exist or database is not yet available")
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database tables and indexes (run before starting the app)"""
+    init_db()
+    click.echo("Database tables created successfully")
+
+@click.command('migrate-analysis')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--drop-column', is_flag=True, help='Drop assessment.analysis_result once it is empty')
+@with_appcontext
+def migrate_analysis_command(batch_size, drop_column):
+    """Move analyses from assessment.analysis_result into the assessment_analysis table"""
+    moved = migrate_legacy_analyses(batch_size=batch_size, drop_column=drop_column)
+    click.echo(f"Moved {moved} analyses to assessment_analysis")
+
+@click.command('rebuild-analytics')
+@click.option('--from', 'start', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Only rebuild days from this date on (default: everything)')
+@with_appcontext
+def rebuild_analytics_command(start):
+    """Recompute the analytics rollup tables from the assessments"""
+    scanned = analytics.rebuild(start.date() if start else None)
+    click.echo(f"Rebuilt analytics rollups from {scanned} assessments")
+
+@click.command('build-compensation-index')
+@click.option('--csv', 'csv_paths', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='Reference CSV to merge (role, industry, location, years_experience, salary); '
+                   'repeatable, replaces COMPENSATION_REFERENCE_CSV for this build')
+@with_appcontext
+def build_compensation_index_command(csv_paths):
+    """Rebuild the compensation benchmark index from the assessments and reference CSVs"""
+    summary = compensation_index.build(list(csv_paths) if csv_paths else None)
+    click.echo(f"Compensation index {summary['version']}: {summary['rows']} salaries, {summary['cells']} cells "
+               f"({', '.join(f'{source} {count}' for source, count in summary['sources'].items())})")
+
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search_command():
+    """Re-index every assessment for full-text search"""
+    search.ensure_index()
+    click.echo(f"Indexed {search.rebuild()} assessments for search")
+
+api = Blueprint('api', __name__)
+
+# Claude model and prompt revision; both are part of the analysis cache key
+# (the prompt template and PROMPT_VERSION live in prompts.py)
+ANALYSIS_MODEL = llm_providers.ANALYSIS_MODEL
+PROMPT_VERSION = prompts.PROMPT_VERSION
 
+# Queue the PDF report email whenever an analysis completes
+EMAIL_REPORTS_ENABLED = os.environ.get('EMAIL_REPORTS_ENABLED', 'false').lower() == 'true'
+
+# How long workers leave a ?stream=1 submission for its SSE request to claim
+STREAM_CLAIM_GRACE = int(os.environ.get('ANALYSIS_STREAM_GRACE', 15))
+
+def get_anthropic_client():
+    """Shared process-wide client; calls should go through the gateway so limits apply"""
+    return gateway.client
+
+@metrics.timed('analysis.generate')
 def generate_claude_analysis(assessment_data):
     """
-    Use Claude API to analyze assessment and generate personalized report
+    Analyze an assessment with the configured LLM provider(s) and return the validated analysis
     """
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
-    
-    client = anthropic.Anthropic(api_key=api_key)
-    
-    prompt = f"""You are an expert STEM career strategist with a PhD in Bioengineering and experience leading utility operations. You're analyzing a career diagnostic assessment for a client who wants to increase their compensation by 10-30% through strategic positioning.
-
-CLIENT DATA:
-Name: {assessment_data['name']}
-Current Role: {assessment_data['role']}
-Industry: {assessment_data['industry']}
-Location: {assessment_data['location']}
-Current Salary: ${int(assessment_data['current_salary']):,}
-Years Experience: {int(assessment_data['years_experience'])}
-Last Raise: {float(assessment_data['last_raise_percent'])}%
-
-TECHNICAL PROFILE:
-Skills: {assessment_data['technical_skills']}
-Certifications: {assessment_data['certifications']}
-Education: {assessment_data['education_level']}
-
-POSITIONING & COMMUNICATION:
-How they describe their role: "{assessment_data['role_description']}"
-How they articulate value: "{assessment_data['value_articulation']}"
-Negotiation experience: "{assessment_data['negotiation_experience']}"
-Work visibility (1-10): {assessment_data['visibility_rating']}
-
-ALIGNMENT FACTORS:
-Values clarity (1-10): {assessment_data['values_clarity']}
-Purpose alignment (1-10): {assessment_data['purpose_alignment']}
-Lifestyle fit (1-10): {assessment_data['lifestyle_fit']}
-Energy level (1-10): {assessment_data['energy_level']}
-
-Generate a comprehensive analysis following the Career Flow Framework. Structure your response as JSON with these sections:
-
-{{
-  "executive_summary": "2-3 sentence overview of their biggest opportunity",
-  "compensation_gap": {{
-    "market_salary_range": "Estimated market range for their experience/role",
-    "gap_percentage": "Estimated % below market",
-    "annual_opportunity": "Dollar amount leaving on table",
-    "key_insight": "Why this gap exists"
-  }},
-  "leverage_points": [
-    {{
-      "area": "Highest leverage area (technical/positioning/alignment)",
-      "current_state": "What's happening now",
-      "impact": "Why this matters for compensation",
-      "quick_win": "Specific action they can take this week"
-    }},
-    // 2 more leverage points
-  ],
-  "positioning_diagnosis": {{
-    "language_gaps": "How their self-description undersells them",
-    "visibility_issues": "Problems with how work is perceived",
-    "narrative_coherence": "Strength of their career story",
-    "specific_fixes": ["3-4 concrete positioning changes"]
-  }},
-  "alignment_assessment": {{
-    "values_insight": "What their scores reveal about purpose/values",
-    "energy_pattern": "Connection between alignment and engagement",
-    "strategic_implication": "How alignment affects negotiation leverage"
-  }},
-  "ninety_day_roadmap": [
-    {{
-      "week_range": "Weeks 1-4",
-      "focus": "Primary objective",
-      "actions": ["Specific action 1", "Specific action 2", "Specific action 3"],
-      "success_metric": "How to know it's working"
-    }},
-    // 2 more phases (weeks 5-8, weeks 9-12)
-  ],
-  "next_step": "Clear call to action for working together"
-}}
-
-Be direct about gaps - they've completed this assessment because they know something's wrong. Use your PhD + utility leadership credibility. Tie every recommendation to compensation impact. Use Career Flow Framework language (alignment, positioning, strategic value)."""
+    import anthropic
+
+    with metrics.stage('analysis.prompt'):
+        system, messages = prompts.build_request(assessment_data)
+    gap = assessment_data.get('compensation_gap')
 
     try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            timeout=60.0  # 60 second timeout
-        )
-        
-        # Parse Claude's response
-        response_text = message.content[0].text
-        
-        # Extract JSON from response (Claude might wrap it in markdown)
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            response_text = response_text[json_start:json_end].strip()
-        
-        return json.loads(response_text)
+        analysis, provider = llm_providers.generate_analysis(system, messages, generated_schemas(gap))
+        if provider != 'anthropic':
+            print(f"Analysis generated by {provider}")
+        return compensation_index.ground(analysis, gap)
     except anthropic.APIError as e:
         print(f"Anthropic API error: {e}")
         raise Exception(f"Failed to generate analysis: {str(e)}")
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        print(f"Response text: {response_text[:500] if 'response_text' in locals() else 'No response'}")
-        raise Exception(f"Failed to parse analysis response: {str(e)}")
+    except llm_providers.ProviderError as e:
+        print(f"LLM provider error: {e}")
+        raise Exception(f"Failed to generate analysis: {str(e)}")
     except Exception as e:
         print(f"Unexpected error in generate_claude_analysis: {e}")
         raise
 
-def generate_pdf_report(assessment, analysis):
+def analysis_data(assessment):
     """
-    Generate professional PDF report from analysis
+    Prompt inputs for an assessment: the form answers plus the compensation_gap figures from the
+    local index (None without a usable benchmark). Also the analysis cache key input.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    story = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#1a1a1a',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#2c3e50',
-        spaceAfter=12,
-        spaceBefore=20
-    )
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=11,
-        leading=16,
-        textColor='#333333'
-    )
-    
-    # Title Page
-    story.append(Paragraph("Career Flow Diagnostic Report", title_style))
-    story.append(Paragraph(f"Prepared for: {assessment.name}", body_style))
-    story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", body_style))
-    story.append(Spacer(1, 0.5*inch))
-    
-    # Executive Summary
-    story.append(Paragraph("Executive Summary", heading_style))
-    story.append(Paragraph(analysis['executive_summary'], body_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Compensation Gap Analysis
-    story.append(Paragraph("Compensation Gap Analysis", heading_style))
-    comp_gap = analysis['compensation_gap']
-    story.append(Paragraph(f"<b>Market Range:</b> {comp_gap['market_salary_range']}", body_style))
-    story.append(Paragraph(f"<b>Gap:</b> {comp_gap['gap_percentage']}", body_style))
-    story.append(Paragraph(f"<b>Annual Opportunity:</b> {comp_gap['annual_opportunity']}", body_style))
-    story.append(Paragraph(f"<b>Key Insight:</b> {comp_gap['key_insight']}", body_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Leverage Points
-    story.append(Paragraph("Top 3 Leverage Points for Fastest Impact", heading_style))
-    for i, point in enumerate(analysis['leverage_points'], 1):
-        story.append(Paragraph(f"<b>{i}. {point['area']}</b>", body_style))
-        story.append(Paragraph(f"Current State: {point['current_state']}", body_style))
-        story.append(Paragraph(f"Impact: {point['impact']}", body_style))
-        story.append(Paragraph(f"Quick Win: {point['quick_win']}", body_style))
-        story.append(Spacer(1, 0.2*inch))
-    
-    # Positioning Diagnosis
-    story.append(PageBreak())
-    story.append(Paragraph("Positioning Diagnosis", heading_style))
-    pos = analysis['positioning_diagnosis']
-    story.append(Paragraph(f"<b>Language Gaps:</b> {pos['language_gaps']}", body_style))
-    story.append(Spacer(1, 0.1*inch))
-    story.append(Paragraph(f"<b>Visibility Issues:</b> {pos['visibility_issues']}", body_style))
-    story.append(Spacer(1, 0.1*inch))
-    story.append(Paragraph(f"<b>Narrative Coherence:</b> {pos['narrative_coherence']}", body_style))
-    story.append(Spacer(1, 0.1*inch))
-    story.append(Paragraph("<b>Specific Fixes:</b>", body_style))
-    for fix in pos['specific_fixes']:
-        story.append(Paragraph(f"• {fix}", body_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # 90-Day Roadmap
-    story.append(Paragraph("Your 90-Day Roadmap", heading_style))
-    for phase in analysis['ninety_day_roadmap']:
-        story.append(Paragraph(f"<b>{phase['week_range']}: {phase['focus']}</b>", body_style))
-        story.append(Paragraph("Actions:", body_style))
-        for action in phase['actions']:
-            story.append(Paragraph(f"• {action}", body_style))
-        story.append(Paragraph(f"<b>Success Metric:</b> {phase['success_metric']}", body_style))
-        story.append(Spacer(1, 0.2*inch))
-    
-    # Next Steps
-    story.append(Spacer(1, 0.3*inch))
-    story.append(Paragraph("Next Step", heading_style))
-    story.append(Paragraph(analysis['next_step'], body_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Schedule a Strategy Call
-    calendly_link = "https://calendly.com/drcraigmiller-careerflowframework/strategy-call"
-    story.append(Paragraph("<b>Ready to Take Action?</b>", heading_style))
-    story.append(Paragraph(f"Schedule your strategy call:", body_style))
-    story.append(Paragraph(calendly_link, body_style))
-    story.append(Spacer(1, 0.2*inch))
-    story.append(Paragraph("During this call, we'll discuss how to implement the strategies outlined in this report and create a personalized plan to increase your compensation.", body_style))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    data = assessment.analysis_input()
+    data['compensation_gap'] = compensation_index.compensation_gap(data)
+    return data
 
-def send_report_email(assessment, pdf_buffer):
+def generated_schemas(gap):
+    """Sections the model writes: with local compensation figures it only adds their key_insight"""
+    return analysis_schema.BENCHMARKED_SECTION_SCHEMAS if gap else analysis_schema.SECTION_SCHEMAS
+
+def stream_claude_analysis(assessment_data):
     """
-    Send PDF report via email
+    Streaming variant of generate_claude_analysis.
+    Yields ('section', name, value) as each top-level section of the JSON completes,
+    then ('complete', None, analysis) with exactly what generate_claude_analysis would return.
+    Only Anthropic streams; when routing picks another provider (or Anthropic fails before
+    any section arrives under primary_fallback) the sections are emitted once it finishes.
     """
-    # Email configuration (use environment variables in production)
-    smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('SMTP_PORT', 587))
-    sender_email = os.environ.get('SENDER_EMAIL')
-    sender_password = os.environ.get('SENDER_PASSWORD')
-    
-    if not all([sender_email, sender_password]):
-        print("Email credentials not configured")
-        return False
-    
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = assessment.email
-    msg['Subject'] = f"Your Career Flow Diagnostic Report - {assessment.name}"
-    
-    body = f"""Hi {assessment.name},
+    import anthropic
 
-Thank you for completing the Career Flow Diagnostic assessment!
+    if llm_providers.ANALYSIS_MODE == 'fanout' and llm_providers.ROUTING != 'race':
+        yield from stream_fanout_analysis(assessment_data)
+        return
 
-Your personalized report is attached. This analysis identifies specific opportunities to increase your compensation by 10-30% through strategic positioning.
+    if llm_providers.ROUTING == 'race' or llm_providers.select_provider() != 'anthropic':
+        analysis = generate_claude_analysis(assessment_data)
+        for name, value in analysis.items():
+            yield 'section', name, value
+        yield 'complete', None, analysis
+        return
 
-Key highlights from your assessment:
-• Compensation gap analysis with market benchmarking
-• Top 3 leverage points for fastest impact
-• Specific positioning improvements
-• Your customized 90-day roadmap
+    system, messages = prompts.build_request(assessment_data)
+    gap = assessment_data.get('compensation_gap')
+    schemas = generated_schemas(gap)
+    parser = SectionParser()
+    sections_sent = 0
 
-Ready to discuss how to implement these strategies? Schedule your strategy call:
+    try:
+        llm_providers.record_generation('generations')
+        started = time.monotonic()
+        with gateway.stream(
+            model=ANALYSIS_MODEL,
+            max_tokens=llm_providers.MAX_TOKENS,
+            system=system,
+            messages=messages,
+            tools=[analysis_schema.analysis_tool(analysis_schema.sections_schema(schemas=schemas))],
+            tool_choice={'type': 'tool', 'name': analysis_schema.TOOL_NAME},
+            timeout=60.0
+        ) as stream:
+            # The forced tool call's arguments arrive as JSON text deltas
+            for event in stream:
+                if event.type == 'content_block_delta' and event.delta.type == 'input_json_delta':
+                    for name, value in parser.feed(event.delta.partial_json):
+                        sections_sent += 1
+                        yield 'section', name, compensation_index.ground_section(name, value, gap)
+            message = stream.get_final_message()
+        llm_providers.record_generation('full_seconds', time.monotonic() - started)
 
-https://calendly.com/drcraigmiller-careerflowframework/strategy-call
+        draft = llm_providers.tool_input(message)
+        broken = analysis_schema.section_errors(draft, schemas)
+        analysis = compensation_index.ground(
+            llm_providers.repair_analysis('anthropic', system, messages, draft, schemas), gap)
+        # Replace anything the client was shown before repair
+        for name in broken:
+            yield 'section', name, analysis[name]
+    except (anthropic.APIError, llm_providers.ProviderError) as e:
+        fallback = llm_providers.FALLBACK
+        if llm_providers.ROUTING != 'primary_fallback' or fallback == 'anthropic' or sections_sent:
+            print(f"LLM error: {e}")
+            raise Exception(f"Failed to generate analysis: {str(e)}")
 
-During this call, we'll discuss how to implement the strategies outlined in your report and create a personalized plan to increase your compensation.
+        print(f"Anthropic stream failed, falling back to {fallback}: {e}")
+        llm_providers.record_generation('full_regenerations')
+        analysis = compensation_index.ground(llm_providers.run_provider(fallback, system, messages, schemas), gap)
+        for name, value in analysis.items():
+            yield 'section', name, value
+
+    yield 'complete', None, analysis
+
+def stream_fanout_analysis(assessment_data):
+    """
+    Fan-out mode for the SSE stream: each section is sent as its own request completes
+    """
+    import anthropic
+
+    system, messages = prompts.build_request(assessment_data)
+    gap = assessment_data.get('compensation_gap')
+    schemas = generated_schemas(gap)
+    provider = llm_providers.select_provider()
+    draft = {}
 
-Best regards,
-Craig
-Career Flow Framework
-"""
-    
-    msg.attach(MIMEText(body, 'plain'))
-    
-    # Attach PDF
-    part = MIMEBase('application', 'octet-stream')
-    part.set_payload(pdf_buffer.read())
-    encoders.encode_base64(part)
-    part.add_header('Content-Disposition', f'attachment; filename=Career_Flow_Report_{assessment.name.replace(" ", "_")}.pdf')
-    msg.attach(part)
-    
-    # Send email
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        return True
+        llm_providers.record_generation('generations')
+        started = time.monotonic()
+        for name, value in llm_providers.iter_fanout(provider, system, messages, schemas):
+            draft[name] = value
+            yield 'section', name, compensation_index.ground_section(name, value, gap)
+        llm_providers.record_generation('full_seconds', time.monotonic() - started)
+
+        broken = analysis_schema.section_errors(draft, schemas)
+        analysis = compensation_index.ground(llm_providers.ordered(
+            llm_providers.repair_analysis(provider, system, messages, draft, schemas)), gap)
+        for name in broken:
+            yield 'section', name, analysis[name]
+    except (anthropic.APIError, llm_providers.ProviderError) as e:
+        print(f"LLM error: {e}")
+        raise Exception(f"Failed to generate analysis: {str(e)}")
+
+    yield 'complete', None, analysis
+
+def release_connection():
+    """
+    End the session's transaction so its pooled connection isn't held for the length of an LLM call;
+    in-flight analyses then need DB connections only while they actually read or write
+    """
+    db.session.commit()
+
+def generate_released(assessment_data):
+    release_connection()
+    return generate_claude_analysis(assessment_data)
+
+def process_analysis_job(job):
+    """
+    Job handler: run Claude analysis for a queued assessment and store the result
+    """
+    assessment = db.session.get(Assessment, job.assessment_id, options=[db.undefer_group('answers')])
+    if assessment is None:
+        raise ValueError(f"Assessment {job.assessment_id} no longer exists")
+
+    print(f"Starting Claude analysis for {assessment.name} (job {job.id})...")
+    if job.attempts > 1 and not assessment.has_analysis:
+        # An earlier attempt failed outright, so this one regenerates the whole report
+        llm_providers.record_generation('full_regenerations')
+    analysis, cache_status = analysis_cache.get_or_generate(
+        analysis_data(assessment),
+        generate_released,
+        model=ANALYSIS_MODEL,
+        prompt_version=PROMPT_VERSION,
+        bypass=job.bypass_cache
+    )
+    print(f"Claude analysis completed for {assessment.name} (cache {cache_status})")
+
+    save_analysis(assessment, analysis)
+
+def save_analysis(assessment, analysis):
+    with metrics.stage('analysis.save'):
+        if not assessment.has_analysis:
+            analytics.record_analysis(assessment)
+        search.index_analysis(assessment, analysis)
+        record = assessment.set_analysis(analysis)
+        assessment.report_generated = True
+        db.session.commit()
+
+    # Pre-render the PDF so the first download is served from storage
+    try:
+        reports.render_and_store(assessment, analysis, record.digest)
     except Exception as e:
-        print(f"Email send failed: {e}")
-        return False
+        db.session.rollback()
+        print(f"PDF pre-render failed for assessment {assessment.id}: {e}")
+
+    if EMAIL_REPORTS_ENABLED and 'error' not in analysis:
+        outbox.queue_report_email(assessment)
+        db.session.commit()
+        outbox.notify_senders()
 
 # API Endpoints
-@app.route('/api/submit-assessment', methods=['POST', 'OPTIONS'])
+@api.route('/api/submit-assessment', methods=['POST'])
 def submit_assessment():
     """
-    Accept assessment submission, generate Claude analysis, create PDF, send email
-    """
-    if request.method == 'OPTIONS':
-        # Handle CORS preflight with explicit headers
-        origin = request.headers.get('Origin')
-        response = jsonify({})
-        # Only set CORS headers if origin is in allowed list
-        if origin:
-            origin_normalized = origin.rstrip('/')
-            for allowed in allowed_origins:
-                allowed_normalized = allowed.rstrip('/')
-                if origin_normalized == allowed_normalized or origin == allowed:
-                    response.headers['Access-Control-Allow-Origin'] = origin
-                    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-                    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-                    response.headers['Access-Control-Allow-Credentials'] = 'true'
-                    response.headers['Access-Control-Max-Age'] = '3600'
-                    break
-        return response, 200
-    
+    Accept assessment submission and queue Claude analysis.
+    Returns 202 immediately; poll /api/assessment-status/<id> for the result.
+    """
     try:
         # Quick validation first
         if not request.json:
@@ -481,6 +377,22 @@ def submit_assessment():
         # Check API key early
         if not os.environ.get("ANTHROPIC_API_KEY"):
             return jsonify({'success': False, 'error': 'ANTHROPIC_API_KEY not configured'}), 500
+
+        base_url = os.environ.get('API_BASE_URL', request.url_root.rstrip('/'))
+        stream = request.args.get('stream') == '1'
+
+        # Double-clicks and client retries attach to the first submission instead of starting another analysis
+        with metrics.stage('submit.idempotency'):
+            key, key_source = idempotency.submission_key(data, request.headers.get('Idempotency-Key'))
+            existing = idempotency.find_existing(key)
+        if existing is not None:
+            return duplicate_submission_response(existing, base_url, stream)
+
+        # Shed load before any work is queued: per-IP/per-email limits and a global in-flight cap
+        with metrics.stage('submit.admission'):
+            rejection = admission.check(admission.client_ip(request), data.get('email'))
+        if rejection is not None:
+            return rejection_response(rejection)
         
         # Create assessment record
         assessment = Assessment(
@@ -505,145 +417,397 @@ def submit_assessment():
             energy_level=data['energy_level']
         )
         
-        db.session.add(assessment)
-        db.session.commit()
-        
-        # Generate Claude analysis (wait for it to complete)
-        print(f"Starting Claude analysis for {data['name']}...")
-        analysis = generate_claude_analysis(data)
-        print(f"Claude analysis completed for {data['name']}")
-        
-        # Save analysis to database
-        assessment.analysis_result = json.dumps(analysis)
-        assessment.report_generated = True
-        db.session.commit()
-        
-        # Return analysis results directly (skip PDF and email)
-        return jsonify({
+        # Queue Claude analysis in the same transaction so a job never exists without its assessment.
+        # With ?stream=1 the client will open the SSE stream, so workers hold off for a grace period.
+        with metrics.stage('submit.insert'):
+            db.session.add(assessment)
+            db.session.flush()
+            # The cap again, now that this transaction holds the lock the job insert commits under
+            rejection = admission.reserve_slot()
+            if rejection is not None:
+                db.session.rollback()
+                admission.refund(admission.client_ip(request), data.get('email'))
+                return rejection_response(rejection)
+            idempotency.register(key, key_source, assessment.id)
+            analytics.record_assessment(assessment)
+            search.index_assessment(assessment)
+            job = jobs.enqueue_analysis(assessment.id, delay=STREAM_CLAIM_GRACE if stream else 0)
+        try:
+            with metrics.stage('submit.commit'):
+                db.session.commit()
+        except IntegrityError as e:
+            # Another worker registered the same key between our check and commit
+            db.session.rollback()
+            existing = idempotency.find_existing(key) if idempotency.is_duplicate_key_error(e) else None
+            if existing is None:
+                raise
+            return duplicate_submission_response(existing, base_url, stream)
+        if not stream:
+            jobs.notify_workers()
+        print(f"Queued Claude analysis job {job.id} for {data['name']}")
+
+        with metrics.stage('submit.queue_position'):
+            position = admission.queue_position(job)
+        # Rule-based first read from the ratings; the Claude analysis replaces it when it completes
+        with metrics.stage('submit.preliminary'):
+            preliminary = scoring.preliminary(assessment)
+        result = {
             'success': True,
-            'message': 'Assessment completed successfully!',
+            'message': 'Assessment received! Your analysis is being generated.',
             'assessment_id': assessment.id,
-            'status': 'completed',
-            'analysis': analysis,
+            'status': jobs.QUEUED,
+            'queue_position': position,
+            'preliminary': preliminary,
+            'status_url': f'{base_url}/api/assessment-status/{assessment.id}',
             'schedule_call_url': 'https://calendly.com/drcraigmiller-careerflowframework/strategy-call'
-        })
+        }
+        if stream:
+            result['stream_url'] = f'{base_url}/api/assessment-stream/{assessment.id}'
+        return jsonify(result), 202
         
     except Exception as e:
         db.session.rollback()
+        metrics.record_error('submit', e)
         import traceback
         error_trace = traceback.format_exc()
         print(f"Error in submit_assessment: {error_trace}")  # Log to Railway logs
         
-        # Return error response with CORS headers
         response = jsonify({
             'success': False,
             'error': str(e),
             'details': error_trace if os.environ.get('FLASK_ENV') == 'development' else None
         })
         
-        # Ensure CORS headers are on error response too
-        origin = request.headers.get('Origin')
-        if origin:
-            origin_normalized = origin.rstrip('/')
-            for allowed in allowed_origins:
-                allowed_normalized = allowed.rstrip('/')
-                if origin_normalized == allowed_normalized or origin == allowed:
-                    response.headers['Access-Control-Allow-Origin'] = origin
-                    response.headers['Access-Control-Allow-Credentials'] = 'true'
-                    break
-        
         return response, 500
 
-@app.route('/api/assessment-status/<int:assessment_id>', methods=['GET'])
+@api.route('/api/assessment-status/<int:assessment_id>', methods=['GET'])
 def get_assessment_status(assessment_id):
     """
-    Check the status of an assessment (processing, completed, or error)
+    Check the status of an assessment (queued, running, completed, or failed)
     """
     assessment = Assessment.query.get_or_404(assessment_id)
-    
+
     base_url = os.environ.get('API_BASE_URL', request.url_root.rstrip('/'))
-    
-    if not assessment.analysis_result:
+
+    job = jobs.latest_job(assessment_id)
+    if job is not None and job.status != jobs.COMPLETED:
+        if job.status == jobs.FAILED:
+            return jsonify({
+                'status': jobs.FAILED,
+                'message': 'An error occurred during processing.',
+                'error': job.error,
+                'assessment_id': assessment_id
+            })
+        return jsonify({
+            'status': job.status,
+            'message': 'Your analysis is still being processed. Please check back in a few minutes.',
+            'assessment_id': assessment_id,
+            'attempts': job.attempts,
+            'queue_position': admission.queue_position(job),
+            'preliminary': scoring.preliminary(assessment)
+        })
+
+    analysis = assessment.get_analysis()
+    if analysis is None:
         return jsonify({
             'status': 'processing',
             'message': 'Your analysis is still being processed. Please check back in a few minutes.',
-            'assessment_id': assessment_id
+            'assessment_id': assessment_id,
+            'preliminary': scoring.preliminary(assessment)
         })
     
     # Check if there's an error in the analysis
-    try:
-        analysis = json.loads(assessment.analysis_result)
-        if 'error' in analysis:
-            return jsonify({
-                'status': 'error',
-                'message': 'An error occurred during processing.',
-                'error': analysis.get('error'),
-                'assessment_id': assessment_id
-            })
-    except:
-        pass
+    if 'error' in analysis:
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred during processing.',
+            'error': analysis.get('error'),
+            'assessment_id': assessment_id
+        })
     
-    return jsonify({
+    return jsonify(completed_status(assessment, analysis, base_url))
+
+def rejection_response(rejection):
+    """429/503 for a submission admission control refused"""
+    print(f"Submission rejected ({rejection.status_code}): {rejection.error}")
+    response = jsonify(rejection.to_dict())
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, rejection.status_code
+
+def duplicate_submission_response(assessment, base_url, stream):
+    """
+    Response for a submission matching an earlier one: the stored result if it completed,
+    otherwise the running analysis' status (and stream) URLs. A failed analysis is requeued.
+    """
+    job = jobs.latest_job(assessment.id)
+    if (job is None or job.status == jobs.COMPLETED) and assessment.has_analysis:
+        result = completed_status(assessment, assessment.get_analysis(), base_url)
+        result.update({'success': True, 'duplicate': True})
+        return jsonify(result), 200
+
+    if job is None or job.status == jobs.FAILED:
+        job = jobs.enqueue_analysis(assessment.id, delay=STREAM_CLAIM_GRACE if stream else 0)
+        db.session.commit()
+        if not stream:
+            jobs.notify_workers()
+
+    print(f"Duplicate submission attached to assessment {assessment.id} (job {job.id}, {job.status})")
+    result = {
+        'success': True,
+        'duplicate': True,
+        'message': 'Assessment already received! Your analysis is being generated.',
+        'assessment_id': assessment.id,
+        'status': job.status,
+        'preliminary': scoring.preliminary(assessment),
+        'status_url': f'{base_url}/api/assessment-status/{assessment.id}',
+        'schedule_call_url': 'https://calendly.com/drcraigmiller-careerflowframework/strategy-call'
+    }
+    if stream:
+        result['stream_url'] = f'{base_url}/api/assessment-stream/{assessment.id}'
+    return jsonify(result), 202
+
+def completed_status(assessment, analysis, base_url):
+    return {
         'status': 'completed',
         'message': 'Your report is ready!',
-        'assessment_id': assessment_id,
+        'assessment_id': assessment.id,
         'report_generated': assessment.report_generated,
         'report_sent': assessment.report_sent,
-        'download_url': f'{base_url}/api/download-report/{assessment_id}',
+        'download_url': f'{base_url}/api/download-report/{assessment.id}',
+        'analysis': analysis,
         'schedule_call_url': 'https://calendly.com/drcraigmiller-careerflowframework/strategy-call'
-    })
+    }
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-@app.route('/api/download-report/<int:assessment_id>', methods=['GET'])
+def stream_claimed_job(assessment, job, base_url):
+    """
+    Run a job this request has claimed, streaming sections to the client as Claude writes them
+    """
+    data = analysis_data(assessment)
+    yield sse_event('status', {'status': jobs.RUNNING, 'assessment_id': assessment.id})
+
+    try:
+        with jobs.running(job):
+            analysis = None
+            if not job.bypass_cache:
+                analysis = analysis_cache.lookup(data, ANALYSIS_MODEL, PROMPT_VERSION)
+
+            if analysis is not None:
+                for name, value in analysis.items():
+                    yield sse_event('section', {'name': name, 'content': value})
+            else:
+                release_connection()
+                for kind, name, value in stream_claude_analysis(data):
+                    if kind == 'section':
+                        yield sse_event('section', {'name': name, 'content': value})
+                    else:
+                        analysis = value
+                analysis_cache.store(data, analysis, ANALYSIS_MODEL, PROMPT_VERSION)
+
+        save_analysis(assessment, analysis)
+        jobs.finish_job(job, jobs.COMPLETED)
+    except GeneratorExit:
+        # Client went away mid-stream - let a background worker finish the analysis
+        db.session.rollback()
+        jobs.release_job(job, 'Streaming client disconnected')
+        raise
+    except Exception as e:
+        db.session.rollback()
+        print(f"Streaming analysis failed for assessment {assessment.id}: {e}")
+        if job.attempts < jobs.MAX_ATTEMPTS:
+            jobs.release_job(job, str(e))
+            yield sse_event('error', {'error': str(e), 'retrying': True, 'assessment_id': assessment.id})
+        else:
+            jobs.finish_job(job, jobs.FAILED, str(e))
+            yield sse_event('error', {'error': str(e), 'retrying': False, 'assessment_id': assessment.id})
+        return
+
+    yield sse_event('complete', completed_status(assessment, analysis, base_url))
+
+def stream_stored_analysis(assessment_id, base_url):
+    """
+    Another worker owns the job: wait for it to finish, then send every section at once
+    """
+    deadline = time.monotonic() + jobs.JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        job = jobs.latest_job(assessment_id)
+        assessment = db.session.get(Assessment, assessment_id)
+
+        if job is not None and job.status == jobs.FAILED:
+            yield sse_event('error', {'error': job.error, 'retrying': False, 'assessment_id': assessment_id})
+            return
+        if (job is None or job.status == jobs.COMPLETED) and assessment.has_analysis:
+            analysis = assessment.get_analysis()
+            for name, value in analysis.items():
+                yield sse_event('section', {'name': name, 'content': value})
+            yield sse_event('complete', completed_status(assessment, analysis, base_url))
+            return
+
+        # End the transaction so the connection is free while we wait and the next poll sees other workers' commits
+        db.session.rollback()
+        yield ": keep-alive\n\n"
+        time.sleep(1.0)
+
+    yield sse_event('error', {'error': 'Timed out waiting for analysis', 'retrying': True, 'assessment_id': assessment_id})
+
+@api.route('/api/assessment-stream/<int:assessment_id>', methods=['GET'])
+def stream_assessment(assessment_id):
+    """
+    Server-Sent Events stream of an assessment's analysis.
+    Emits a 'section' event as each top-level section (executive_summary, compensation_gap, ...)
+    is complete, then 'complete' with the same payload as the status endpoint, or 'error'.
+    """
+    assessment = Assessment.query.get_or_404(assessment_id)
+    base_url = os.environ.get('API_BASE_URL', request.url_root.rstrip('/'))
+
+    job = jobs.latest_job(assessment_id)
+    stream_id = f"stream:{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    claimed = job is not None and job.status == jobs.QUEUED and jobs.claim_job(job.id, stream_id)
+
+    if claimed:
+        job = db.session.get(AnalysisJob, job.id)
+        events = stream_claimed_job(assessment, job, base_url)
+    else:
+        events = stream_stored_analysis(assessment_id, base_url)
+
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api.route('/api/download-report/<int:assessment_id>', methods=['GET'])
 def download_report(assessment_id):
     """
-    Download PDF report for a specific assessment
+    Download PDF report for a specific assessment.
+    Serves the stored render with ETag/Last-Modified; repeat fetches get 304 without touching reportlab.
     """
     assessment = Assessment.query.get_or_404(assessment_id)
     
-    if not assessment.analysis_result:
+    # Only the digest is read here; the analysis document loads if a render is needed
+    record = assessment.analysis_record
+    if record is None:
         return jsonify({'error': 'Report not generated yet. Please wait a few minutes and try again.'}), 404
     
-    # Check for errors
-    try:
-        analysis = json.loads(assessment.analysis_result)
+    digest = record.digest
+    etag = reports.make_etag(assessment.id, digest)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    report = reports.find_stored_report(assessment.id, digest)
+    if report is None:
+        # Check for errors
+        analysis = record.analysis
         if 'error' in analysis:
             return jsonify({'error': 'Report generation failed. Please contact support.'}), 500
-    except:
-        pass
-    
-    analysis = json.loads(assessment.analysis_result)
-    pdf_buffer = generate_pdf_report(assessment, analysis)
-    
-    return send_file(
-        pdf_buffer,
+        report = reports.render_and_store(assessment, analysis, digest)
+
+    response = send_file(
+        BytesIO(report.pdf),
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'Career_Flow_Report_{assessment.name.replace(" ", "_")}.pdf'
+        download_name=f'Career_Flow_Report_{assessment.name.replace(" ", "_")}.pdf',
+        etag=report.etag,
+        last_modified=report.created_at,
+        conditional=True
     )
+    # Reports are personal: browsers may keep them but must revalidate, shared caches must not store them
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.cache_control.public = False
+    response.cache_control.max_age = None
+    return response
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+def encode_cursor(submitted_at, assessment_id):
+    raw = json.dumps([submitted_at.isoformat(), assessment_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
 
-@app.route('/api/admin/assessments', methods=['GET'])
+def decode_cursor(cursor):
+    try:
+        submitted_at, assessment_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(submitted_at), int(assessment_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+@api.route('/api/admin/assessments', methods=['GET'])
 def get_assessments():
     """
-    Admin endpoint: Get all assessments with summary data
+    Admin endpoint: Page through assessments, newest first, with summary data.
+    Keyset pagination on (submitted_at, id): pass next_cursor back as ?cursor= for the next page.
+    Filters: role, industry, from, to, report_sent. Only the listed columns are selected,
+    so the free-text answers are never read (the analysis lives in its own table).
     """
-    assessments = Assessment.query.order_by(Assessment.submitted_at.desc()).all()
-    
-    return jsonify([{
-        'id': a.id,
-        'name': a.name,
-        'email': a.email,
-        'role': a.role,
-        'current_salary': a.current_salary,
-        'submitted_at': a.submitted_at.isoformat(),
-        'report_sent': a.report_sent
-    } for a in assessments])
-
-@app.route('/api/admin/assessment/<int:assessment_id>', methods=['GET'])
+    try:
+        limit = min(max(int(request.args.get('limit', ADMIN_PAGE_SIZE)), 1), ADMIN_MAX_PAGE_SIZE)
+        conditions = parse_assessment_filters(request.args)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    query = db.select(
+        Assessment.id,
+        Assessment.name,
+        Assessment.email,
+        Assessment.role,
+        Assessment.current_salary,
+        Assessment.submitted_at,
+        Assessment.report_sent
+    ).where(*conditions)
+    if after is not None:
+        query = query.where(db.tuple_(Assessment.submitted_at, Assessment.id) < after)
+    with metrics.stage('admin.list_query'):
+        rows = db.session.execute(
+            query.order_by(Assessment.submitted_at.desc(), Assessment.id.desc()).limit(limit + 1)
+        ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    result = {
+        'items': [{
+            'id': a.id,
+            'name': a.name,
+            'email': a.email,
+            'role': a.role,
+            'current_salary': a.current_salary,
+            'submitted_at': a.submitted_at.isoformat(),
+            'report_sent': a.report_sent
+        } for a in rows],
+        'next_cursor': encode_cursor(rows[-1].submitted_at, rows[-1].id) if has_more else None
+    }
+
+    # Dashboard totals only on the first page, from one aggregate query over the same filters
+    if after is None:
+        with metrics.stage('admin.summary_query'):
+            total, reports_sent, avg_salary = db.session.execute(
+                db.select(
+                    db.func.count(Assessment.id),
+                    db.func.count(Assessment.id).filter(Assessment.report_sent.is_(True)),
+                    db.func.avg(Assessment.current_salary)
+                ).where(*conditions)
+            ).one()
+        result['summary'] = {
+            'total': total,
+            'reports_sent': reports_sent,
+            'avg_salary': round(avg_salary) if avg_salary is not None else None
+        }
+
+    return jsonify(result)
+
+@api.route('/api/admin/assessment/<int:assessment_id>', methods=['GET'])
 def get_assessment_detail(assessment_id):
     """
     Admin endpoint: Get full assessment details including analysis
     """
-    assessment = Assessment.query.get_or_404(assessment_id)
+    with metrics.stage('admin.detail_query'):
+        assessment = Assessment.query.get_or_404(assessment_id)
     
     return jsonify({
         'id': assessment.id,
@@ -657,23 +821,332 @@ def get_assessment_detail(assessment_id):
             'industry': assessment.industry,
             'location': assessment.location
         },
-        'analysis': json.loads(assessment.analysis_result) if assessment.analysis_result else None,
+        'analysis': assessment.get_analysis(),
         'report_sent': assessment.report_sent
     })
 
-@app.route('/health', methods=['GET'])
+@api.route('/api/admin/assessment/<int:assessment_id>/reanalyze', methods=['POST'])
+def reanalyze_assessment(assessment_id):
+    """
+    Admin endpoint: Queue a fresh Claude analysis, bypassing the analysis cache
+    """
+    assessment = Assessment.query.get_or_404(assessment_id)
+    job = jobs.enqueue_analysis(assessment.id, bypass_cache=True)
+    db.session.commit()
+    jobs.notify_workers()
+
+    return jsonify({
+        'success': True,
+        'assessment_id': assessment.id,
+        'job_id': job.id,
+        'status': jobs.QUEUED
+    }), 202
+
+@api.route('/api/admin/bulk-export', methods=['GET', 'POST'])
+def bulk_export_reports():
+    """
+    Admin endpoint: Stream a ZIP of every report matching the filter.
+    Filters (query string or JSON body): from, to (YYYY-MM-DD), role, industry.
+    The X-Export-Id header identifies the export for progress polling.
+    """
+    if request.method == 'POST':
+        filters = request.get_json(silent=True) or {}
+    else:
+        filters = request.args.to_dict()
+    try:
+        conditions = parse_assessment_filters(filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    export, ids = bulk_export.create_export(filters, conditions)
+    print(f"Bulk export {export.id} started: {export.total} reports, {bulk_export.POOL_SIZE} processes")
+
+    return Response(
+        stream_with_context(bulk_export.stream_export(export, ids)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename=Career_Flow_Reports_{export.id}.zip',
+            'X-Export-Id': str(export.id),
+            'X-Export-Total': str(export.total),
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@api.route('/api/admin/export', methods=['GET'])
+def export_assessments():
+    """
+    Admin endpoint: Stream every matching assessment as CSV or NDJSON.
+    Query: format (csv | ndjson), include_analysis (true/false), since (last id already exported),
+    plus the admin filters (from, to, role, industry, report_sent).
+    X-Export-Cursor is the last id covered; pass it as ?since= on the next pull.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    include_analysis = request.args.get('include_analysis', 'false').lower() in ('true', '1')
+    if export_format not in assessment_export.FORMATS:
+        return jsonify({'success': False, 'error': f"Invalid format '{export_format}', expected csv or ndjson"}), 400
+    try:
+        since = int(request.args.get('since', 0))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since must be a non-negative assessment id'}), 400
+    try:
+        conditions = parse_assessment_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    bound = assessment_export.export_bound(since, include_analysis)
+    rows = assessment_export.export_rows(conditions, since, bound, include_analysis)
+
+    return Response(
+        stream_with_context(assessment_export.stream_export(rows, export_format, include_analysis)),
+        mimetype=assessment_export.FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename=assessments_{since + 1}-{bound}.{export_format}',
+            'X-Export-Cursor': str(bound),
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@api.route('/api/admin/analytics', methods=['GET'])
+def get_analytics():
+    """
+    Admin endpoint: Cohort stats from the rollup tables (median and average salary, average
+    values_clarity / energy_level / last raise, and the last-raise distribution).
+    Query: group_by (all | role | industry | location), bucket (day | week | month | all),
+    from / to (YYYY-MM-DD, inclusive), value (one cohort of group_by).
+    """
+    group_by = request.args.get('group_by', 'all')
+    bucket = request.args.get('bucket', 'month')
+    if group_by not in analytics.DIMENSIONS:
+        return jsonify({'success': False, 'error': f"Invalid group_by '{group_by}'"}), 400
+    if bucket not in analytics.BUCKETS:
+        return jsonify({'success': False, 'error': f"Invalid bucket '{bucket}'"}), 400
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from and to must be YYYY-MM-DD'}), 400
+
+    with metrics.stage('admin.analytics_query'):
+        results = analytics.summarize(group_by, bucket, start, end, request.args.get('value'))
+    return jsonify({
+        'group_by': group_by,
+        'bucket': bucket,
+        'salary_bin': analytics.SALARY_BIN,
+        'results': results
+    })
+
+@api.route('/api/admin/preliminary-scores', methods=['GET'])
+def get_preliminary_scores():
+    """
+    Admin endpoint: Rule-based scores for every matching assessment, summarized per cohort
+    (alignment profiles, top leverage areas and average scores).
+    Query: group_by (all | role | industry | location) plus the admin filters (from, to, role, industry, report_sent).
+    """
+    group_by = request.args.get('group_by', 'all')
+    if group_by not in analytics.DIMENSIONS:
+        return jsonify({'success': False, 'error': f"Invalid group_by '{group_by}'"}), 400
+    try:
+        conditions = parse_assessment_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with metrics.stage('admin.scoring_query'):
+        results = scoring.score_table(conditions, group_by)
+    return jsonify({
+        'group_by': group_by,
+        'scoring_version': scoring.SCORING_VERSION,
+        'results': results
+    })
+
+@api.route('/api/admin/search', methods=['GET'])
+def search_assessments():
+    """
+    Admin endpoint: Full-text search over the free-text answers and the analysis, best match first.
+    Query: q (words must all match; "quoted phrases" match in order), page (from 1), limit (default 20, max 100).
+    Snippets are HTML-escaped with matches wrapped in <mark>.
+    """
+    query = request.args.get('q', '').strip()
+    if not search.terms(query):
+        return jsonify({'success': False, 'error': 'q is required'}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page and limit must be integers'}), 400
+
+    with metrics.stage('admin.search_query'):
+        total, results = search.search(query, limit=limit, offset=(page - 1) * limit)
+    return jsonify({
+        'query': query,
+        'total': total,
+        'page': page,
+        'pages': (total + limit - 1) // limit,
+        'results': results
+    })
+
+@api.route('/api/admin/bulk-export/<int:export_id>', methods=['GET'])
+def get_bulk_export_progress(export_id):
+    """
+    Admin endpoint: Progress and throughput (PDFs/sec) of a bulk export
+    """
+    export = BulkExport.query.get_or_404(export_id)
+    return jsonify(bulk_export.export_progress(export))
+
+@api.route('/api/admin/send-reports', methods=['POST'])
+def send_reports():
+    """
+    Admin endpoint: Queue report emails for a cohort.
+    Body: filters (from, to, role, industry) or 'assessment_ids'; 'resend': true includes already-sent reports.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        conditions = parse_assessment_filters(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    query = Assessment.query.join(AssessmentAnalysis).filter(*conditions)
+    if data.get('assessment_ids'):
+        query = query.filter(Assessment.id.in_(data['assessment_ids']))
+    if not data.get('resend'):
+        query = query.filter(db.or_(Assessment.report_sent.is_(False), Assessment.report_sent.is_(None)))
+
+    queued = 0
+    for assessment in query.yield_per(200):
+        if outbox.queue_report_email(assessment) is not None:
+            queued += 1
+    db.session.commit()
+    outbox.notify_senders()
+
+    return jsonify({'success': True, 'queued': queued, 'outbox': outbox.outbox_stats()}), 202
+
+@api.route('/api/admin/outbox', methods=['GET'])
+def get_outbox():
+    """
+    Admin endpoint: Outbox counts by status and the most recent failures
+    """
+    failures = EmailOutbox.query.filter_by(status=outbox.FAILED).order_by(EmailOutbox.id.desc()).limit(20).all()
+    return jsonify({
+        'configured': outbox.is_configured(),
+        'counts': outbox.outbox_stats(),
+        'recent_failures': [{
+            'id': m.id,
+            'assessment_id': m.assessment_id,
+            'recipient': m.recipient,
+            'attempts': m.attempts,
+            'error': m.last_error
+        } for m in failures]
+    })
+
+@api.route('/api/admin/analysis-cache', methods=['GET'])
+def get_analysis_cache_stats():
+    """
+    Admin endpoint: Analysis cache hit/miss counters for this process plus shared-tier totals
+    """
+    shared_entries, shared_hits = db.session.execute(
+        db.select(db.func.count(AnalysisCacheEntry.key), db.func.coalesce(db.func.sum(AnalysisCacheEntry.hit_count), 0))
+    ).one()
+
+    return jsonify({
+        'enabled': analysis_cache.CACHE_ENABLED,
+        'model': ANALYSIS_MODEL,
+        'prompt_version': PROMPT_VERSION,
+        'process': analysis_cache.cache.stats(),
+        'shared': {
+            'entries': shared_entries,
+            'hits': int(shared_hits)
+        }
+    })
+
+@api.route('/api/admin/llm-stats', methods=['GET'])
+def get_llm_stats():
+    """
+    Admin endpoint: LLM gateway counters for this process (in-flight, retries, latency, token usage)
+    """
+    return jsonify({
+        'model': ANALYSIS_MODEL,
+        'routing': llm_providers.ROUTING,
+        'process': gateway.stats(),
+        'structured_output': llm_providers.generation_stats()
+    })
+
+@api.route('/api/admin/analysis-cache/invalidate', methods=['POST'])
+def invalidate_analysis_cache():
+    """
+    Admin endpoint: Invalidate cached analyses.
+    Body may contain 'key' or 'prompt_version'; an empty body clears the whole cache.
+    """
+    data = request.get_json(silent=True) or {}
+    removed = analysis_cache.cache.invalidate(key=data.get('key'), prompt_version=data.get('prompt_version'))
+    expired = analysis_cache.cache.purge_expired()
+
+    return jsonify({'success': True, 'removed': removed, 'expired_removed': expired})
+
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy'})
 
-@app.route('/api/cors-debug', methods=['GET'])
+@api.route('/api/cors-debug', methods=['GET'])
 def cors_debug():
     """Debug endpoint to check CORS configuration"""
     return jsonify({
         'cors_origins_env': os.environ.get('CORS_ORIGINS', 'NOT SET'),
-        'allowed_origins': allowed_origins,
+        'allowed_origins': sorted(http_middleware.ALLOWED_ORIGINS),
         'request_origin': request.headers.get('Origin', 'NOT PROVIDED')
     })
 
+def create_app(start_background=None):
+    """
+    Build the Flask app. Nothing here touches the database (tables come from
+    `flask --app app init-db`), and the Anthropic SDK, reportlab and the email
+    MIME modules load on first use, so importing the app stays fast.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection pool sizing; raise it for the gevent server (gunicorn_async.py), where one process
+    # serves hundreds of requests at once
+    engine_options = {}
+    if os.environ.get('DB_POOL_SIZE'):
+        engine_options['pool_size'] = int(os.environ['DB_POOL_SIZE'])
+    if os.environ.get('DB_MAX_OVERFLOW'):
+        engine_options['max_overflow'] = int(os.environ['DB_MAX_OVERFLOW'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    # Client addresses from X-Forwarded-For, as far as the trusted proxies go (rate limits key on them)
+    if admission.TRUSTED_PROXY_HOPS > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=admission.TRUSTED_PROXY_HOPS)
+    # CORS (preflights answered before routing), compression and ETags for every response
+    app.wsgi_app = http_middleware.ResponseMiddleware(app.wsgi_app)
+    app.register_error_handler(Exception, handle_exception)
+
+    db.init_app(app)
+    # Per-request timings, /metrics in Prometheus text format, and optional sampled profiling
+    metrics.init_app(app, collectors=[queue_metrics])
+    app.register_blueprint(api)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_analysis_command)
+    app.cli.add_command(rebuild_analytics_command)
+    app.cli.add_command(rebuild_search_command)
+    app.cli.add_command(build_compensation_index_command)
+
+    # Background analysis workers and outbox senders: 'thread' runs them inside each web process,
+    # 'external' leaves both queues to a separate `python worker.py` process. Flask CLI commands
+    # such as init-db never start them.
+    if start_background is None:
+        start_background = (os.environ.get('ANALYSIS_WORKER_MODE', 'thread') == 'thread'
+                            and not os.environ.get('FLASK_RUN_FROM_CLI'))
+    if start_background:
+        jobs.start_workers(app, process_analysis_job)
+        outbox.start_senders(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
+    # Local development: create the tables first so a fresh checkout just works
+    with app.app_context():
+        init_db()
     app.run(debug=True, port=5000)
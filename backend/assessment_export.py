@@ -0,0 +1,128 @@
+"""
+Career Flow Diagnostic Tool - Assessment Data Export
+Streams assessments as CSV or NDJSON for offline analysis, optionally with the parsed analysis.
+Rows are read with yield_per (a server-side cursor on Postgres), so memory stays flat however
+many rows match. Exports are ordered by id; the cursor is the last id covered, so a nightly
+pull passes the previous X-Export-Cursor back as ?since= and receives only newer rows.
+"""
+
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+import os
+
+from models import db, Assessment, AssessmentAnalysis, AnalysisJob, skill_list
+from analysis_schema import SECTION_SCHEMAS
+import jobs
+
+BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+# Flush the response roughly this often (bytes) rather than once per row
+FLUSH_SIZE = 64 * 1024
+
+FIELDS = [
+    'id', 'submitted_at', 'email', 'name',
+    'current_salary', 'years_experience', 'role', 'industry', 'location', 'last_raise_percent',
+    'technical_skills', 'certifications', 'education_level',
+    'role_description', 'value_articulation', 'negotiation_experience', 'visibility_rating',
+    'values_clarity', 'purpose_alignment', 'lifestyle_fit', 'energy_level',
+    'report_generated', 'report_sent'
+]
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Spreadsheets run a cell starting with one of these as a formula; answers are user input
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _analysis_columns():
+    """CSV columns for the analysis: object sections become section.field, the rest one column each"""
+    columns = []
+    for name, schema in SECTION_SCHEMAS.items():
+        if schema['type'] == 'object':
+            columns += [(f"{name}.{key}", name, key) for key in schema['properties']]
+        else:
+            columns.append((name, name, None))
+    return columns
+
+ANALYSIS_COLUMNS = _analysis_columns()
+
+def export_bound(since, include_analysis):
+    """
+    Highest id this export covers. With analysis included it stops before the oldest assessment
+    still being analysed, so that row is picked up by the next pull instead of skipped. Jobs with
+    no sign of life for JOB_TIMEOUT are ignored, so one stuck job can't hold the cursor forever.
+    """
+    bound = db.session.execute(db.select(db.func.max(Assessment.id))).scalar() or 0
+    if include_analysis:
+        cutoff = datetime.utcnow() - timedelta(seconds=jobs.JOB_TIMEOUT)
+        last_seen = db.func.coalesce(AnalysisJob.heartbeat_at, AnalysisJob.started_at, AnalysisJob.created_at)
+        pending = db.session.execute(
+            db.select(db.func.min(AnalysisJob.assessment_id))
+            .where(AnalysisJob.status.in_([jobs.QUEUED, jobs.RUNNING]), last_seen >= cutoff)
+        ).scalar()
+        if pending is not None:
+            bound = min(bound, pending - 1)
+    return max(bound, since)
+
+def export_rows(conditions, since, bound, include_analysis):
+    """Matching rows in id order, fetched BATCH_SIZE at a time"""
+    query = (db.select(*[getattr(Assessment, field) for field in FIELDS])
+             .where(Assessment.id > since, Assessment.id <= bound, *conditions)
+             .order_by(Assessment.id))
+    if include_analysis:
+        query = (query.add_columns(AssessmentAnalysis.document, AssessmentAnalysis.compressed)
+                 .outerjoin(AssessmentAnalysis))
+    return db.session.execute(query.execution_options(yield_per=BATCH_SIZE))
+
+def _record(row, include_analysis):
+    record = {field: row[i] for i, field in enumerate(FIELDS)}
+    record['submitted_at'] = record['submitted_at'].isoformat() if record['submitted_at'] else None
+    record['technical_skills'] = skill_list(record['technical_skills'])
+    if include_analysis:
+        document, compressed = row[len(FIELDS)], row[len(FIELDS) + 1]
+        record['analysis'] = compressed if compressed is not None else document
+    return record
+
+def _csv_cell(value):
+    """Text that a spreadsheet would evaluate is prefixed with ' so it stays text"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _csv_values(record, include_analysis):
+    values = [record[field] for field in FIELDS]
+    values[FIELDS.index('technical_skills')] = '; '.join(record['technical_skills'])
+    if include_analysis:
+        analysis = record['analysis'] or {}
+        for _, section, key in ANALYSIS_COLUMNS:
+            value = analysis.get(section)
+            if key is not None:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value if value is None or isinstance(value, str) else json.dumps(value))
+        values.append(analysis.get('error'))
+    return [_csv_cell(value) for value in values]
+
+def stream_export(rows, export_format, include_analysis):
+    """Generator of CSV or NDJSON text, flushed in chunks of about FLUSH_SIZE"""
+    buffer = io.StringIO()
+    count = 0
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        header = list(FIELDS)
+        if include_analysis:
+            header += [column for column, _, _ in ANALYSIS_COLUMNS] + ['analysis_error']
+        writer.writerow(header)
+
+    for row in rows:
+        record = _record(row, include_analysis)
+        if export_format == 'csv':
+            writer.writerow(_csv_values(record, include_analysis))
+        else:
+            buffer.write(json.dumps(record) + '\n')
+        count += 1
+        if buffer.tell() >= FLUSH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+    print(f"Assessment export finished: {count} rows ({export_format})")
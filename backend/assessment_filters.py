@@ -0,0 +1,65 @@
+"""
+Career Flow Diagnostic Tool - Assessment Filters
+Shared parsing of admin query filters (date range, role, industry, report_sent) into SQLAlchemy conditions
+"""
+
+from datetime import datetime, timedelta
+
+from models import db, Assessment
+
+def _text(args, field):
+    """A filter value as a string (JSON bodies can carry anything); None when absent or empty"""
+    value = args.get(field)
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid {field} {value!r}, expected a string")
+    return value
+
+def _parse_date(value, field):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {field} date '{value}', expected YYYY-MM-DD")
+
+def parse_assessment_filters(args):
+    """
+    Build filter conditions from request args (or a JSON body dict).
+
+    from / to   - submitted_at range, inclusive; date-only 'to' covers the whole day
+    role        - case-insensitive exact match
+    industry    - case-insensitive exact match
+    report_sent - true / false
+
+    Raises ValueError for malformed values, including non-strings (report_sent may be a boolean).
+    """
+    conditions = []
+
+    start, to, role, industry = (_text(args, field) for field in ('from', 'to', 'role', 'industry'))
+    if start:
+        conditions.append(Assessment.submitted_at >= _parse_date(start, 'from'))
+    if to:
+        end = _parse_date(to, 'to')
+        if len(to) == 10:
+            end += timedelta(days=1)
+            conditions.append(Assessment.submitted_at < end)
+        else:
+            conditions.append(Assessment.submitted_at <= end)
+    if role:
+        conditions.append(db.func.lower(Assessment.role) == role.strip().lower())
+    if industry:
+        conditions.append(db.func.lower(Assessment.industry) == industry.strip().lower())
+    report_sent = args.get('report_sent')
+    if report_sent not in (None, ''):
+        if not isinstance(report_sent, (str, bool)):
+            raise ValueError(f"Invalid report_sent {report_sent!r}, expected true or false")
+        if isinstance(report_sent, str):
+            if report_sent.lower() not in ('true', 'false', '1', '0'):
+                raise ValueError(f"Invalid report_sent '{report_sent}', expected true or false")
+            report_sent = report_sent.lower() in ('true', '1')
+        if report_sent:
+            conditions.append(Assessment.report_sent.is_(True))
+        else:
+            conditions.append(db.or_(Assessment.report_sent.is_(False), Assessment.report_sent.is_(None)))
+
+    return conditions
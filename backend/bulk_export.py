@@ -0,0 +1,218 @@
+"""
+Career Flow Diagnostic Tool - Bulk PDF Export
+Renders every report matching an admin filter across a process pool and streams them
+back as a ZIP while rendering is still in progress.
+
+Reports with a current stored render (see reports.py) are copied straight into the
+archive; the rest are rendered by pool processes. Progress is written to the
+bulk_export table so any web worker can report it.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from types import SimpleNamespace
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+
+from models import db, Assessment, AssessmentAnalysis, BulkExport, RenderedReport
+import reports
+
+CHUNK_SIZE = int(os.environ.get('BULK_EXPORT_CHUNK_SIZE', 50))
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+POOL_SIZE = int(os.environ.get('BULK_EXPORT_PROCESSES', 0)) or available_cores()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Process pool shared by all exports in this process.
+    Uses 'spawn' so children don't inherit the web worker's threads or DB connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_SIZE, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def render_pdf(assessment_id, name, analysis):
+    """Pool task: render one report; runs in a child process without app or DB access"""
+    if 'error' in analysis:
+        raise ValueError('Analysis failed for this assessment')
+    return reports.generate_pdf_report(SimpleNamespace(name=name), analysis).getvalue()
+
+def report_filename(assessment_id, name, submitted_at):
+    safe_name = re.sub(r'[^A-Za-z0-9_-]+', '_', name or 'report').strip('_')
+    return f"{submitted_at:%Y-%m-%d}_{assessment_id}_{safe_name}.pdf"
+
+class StreamBuffer:
+    """Write-only, non-seekable file object; ZipFile then streams entries with data descriptors"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def create_export(filters, conditions):
+    """Record a new export and return it with the ids it covers"""
+    ids = db.session.execute(
+        db.select(Assessment.id)
+        .join(AssessmentAnalysis)
+        .where(*conditions)
+        .order_by(Assessment.submitted_at, Assessment.id)
+    ).scalars().all()
+
+    export = BulkExport(filters=json.dumps(filters), total=len(ids))
+    db.session.add(export)
+    db.session.commit()
+    return export, ids
+
+def _load_chunk(chunk_ids):
+    """Rows for a chunk plus the id of a current stored render, if any (analysis and PDF bytes not loaded)"""
+    return db.session.execute(
+        db.select(Assessment.id, Assessment.name, Assessment.submitted_at, AssessmentAnalysis.digest,
+                  RenderedReport.id, RenderedReport.analysis_hash)
+        .join(AssessmentAnalysis)
+        .outerjoin(RenderedReport, db.and_(RenderedReport.assessment_id == Assessment.id,
+                                           RenderedReport.template_version == reports.TEMPLATE_VERSION))
+        .where(Assessment.id.in_(chunk_ids))
+    ).all()
+
+def stream_export(export, ids):
+    """
+    Generator of ZIP bytes. Renders run POOL_SIZE-wide with at most two tasks per process
+    in flight, so memory stays bounded regardless of how many reports match.
+    """
+    buffer = StreamBuffer()
+    archive = zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED)
+    pool = get_pool()
+    max_in_flight = POOL_SIZE * 2
+    in_flight = {}
+    errors = []
+    started = time.monotonic()
+    last_progress = started
+
+    def write_entry(filename, pdf_bytes):
+        archive.writestr(filename, pdf_bytes)
+        export.completed += 1
+
+    def collect(block):
+        done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            assessment_id, filename = in_flight.pop(future)
+            try:
+                write_entry(filename, future.result())
+            except Exception as e:
+                export.failed += 1
+                errors.append({'assessment_id': assessment_id, 'error': str(e)})
+
+    def record_progress(force=False):
+        nonlocal last_progress
+        now = time.monotonic()
+        if force or now - last_progress >= PROGRESS_INTERVAL:
+            elapsed = now - started
+            export.pdfs_per_second = round(export.completed / elapsed, 2) if elapsed > 0 else None
+            db.session.commit()
+            last_progress = now
+            print(f"Bulk export {export.id}: {export.completed + export.failed}/{export.total} "
+                  f"({export.pdfs_per_second} PDFs/sec)")
+
+    try:
+        for offset in range(0, len(ids), CHUNK_SIZE):
+            for row in _load_chunk(ids[offset:offset + CHUNK_SIZE]):
+                assessment_id, name, submitted_at, digest, report_id, stored_hash = row
+                filename = report_filename(assessment_id, name, submitted_at)
+
+                if report_id is not None and stored_hash == digest:
+                    write_entry(filename, db.session.get(RenderedReport, report_id).pdf)
+                    export.reused += 1
+                else:
+                    while len(in_flight) >= max_in_flight:
+                        collect(block=True)
+                    analysis = db.session.get(AssessmentAnalysis, assessment_id).analysis
+                    future = pool.submit(render_pdf, assessment_id, name, analysis)
+                    in_flight[future] = (assessment_id, filename)
+
+                collect(block=False)
+                chunk = buffer.drain()
+                if chunk:
+                    yield chunk
+                record_progress()
+
+            # Stored PDFs for this chunk are written; don't keep them in the identity map
+            db.session.expunge_all()
+            db.session.add(export)
+
+        while in_flight:
+            collect(block=True)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+            record_progress()
+
+        elapsed = time.monotonic() - started
+        export.status = 'completed'
+        export.finished_at = datetime.utcnow()
+        export.pdfs_per_second = round(export.completed / elapsed, 2) if elapsed > 0 else None
+        archive.writestr('export_summary.json', json.dumps({
+            'export_id': export.id,
+            'filters': json.loads(export.filters),
+            'total': export.total,
+            'completed': export.completed,
+            'reused_stored_renders': export.reused,
+            'failed': export.failed,
+            'errors': errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'pdfs_per_second': export.pdfs_per_second,
+            'processes': POOL_SIZE
+        }, indent=2))
+        archive.close()
+        record_progress(force=True)
+        yield buffer.drain()
+    except (GeneratorExit, Exception):
+        # Client disconnected or rendering broke: stop queued renders and mark the export failed
+        for future in in_flight:
+            future.cancel()
+        db.session.rollback()
+        export.status = 'failed'
+        export.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+def export_progress(export):
+    elapsed_end = export.finished_at or datetime.utcnow()
+    return {
+        'export_id': export.id,
+        'status': export.status,
+        'filters': json.loads(export.filters) if export.filters else {},
+        'total': export.total,
+        'completed': export.completed,
+        'reused_stored_renders': export.reused,
+        'failed': export.failed,
+        'pdfs_per_second': export.pdfs_per_second,
+        'elapsed_seconds': round((elapsed_end - export.started_at).total_seconds(), 3),
+        'started_at': export.started_at.isoformat(),
+        'finished_at': export.finished_at.isoformat() if export.finished_at else None
+    }
@@ -0,0 +1,384 @@
+"""
+Career Flow Diagnostic Tool - Compensation Index
+Salary benchmarks by role, industry, location and experience band, built from our own
+assessments (the latest per email) plus reference CSVs. A build writes every cell's salaries,
+sorted, into one .npy file that each process memory-maps, with a small JSON key table beside
+it: a percentile lookup is a dict lookup plus a binary search, and gunicorn workers share the
+data through the page cache instead of each holding a copy.
+
+Lookups widen from the exact cohort to broader ones for the same role (FALLBACK_LEVELS) until
+a cell has COMPENSATION_MIN_SAMPLES salaries; without one there is no benchmark and the model
+writes the section. The person being benchmarked is left out of their own sample.
+compensation_gap() turns the benchmark into the report's market range, gap and opportunity,
+so the model only writes the narrative key_insight.
+The index is built by `flask --app app build-compensation-index` (at process start from the
+Procfile, and on whatever schedule should refresh it); running processes reload a new build
+on their next lookup. Analyses never build it.
+"""
+
+import csv
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from models import db, Assessment
+from analytics import cohort_value
+import metrics
+
+INDEX_DIR = os.environ.get('COMPENSATION_INDEX_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'compensation'))
+# Comma-separated CSVs (role, industry, location, years_experience, salary) merged into every build
+REFERENCE_CSVS = [path.strip() for path in os.environ.get('COMPENSATION_REFERENCE_CSV', '').split(',') if path.strip()]
+MIN_SAMPLES = int(os.environ.get('COMPENSATION_MIN_SAMPLES', 10))
+# Salaries outside this range are typos (monthly or hourly figures, extra zeros) and are left out
+MIN_SALARY, MAX_SALARY = 10000, 2000000
+
+KEY_FIELDS = ['role', 'industry', 'location', 'band']
+# Experience bands as (lowest year, label)
+BANDS = [(0, '0-2 years'), (3, '3-5 years'), (6, '6-10 years'), (11, '11-15 years'), (16, '16+ years')]
+# Most specific first; every level is stored, so a lookup walks down until a cell is big enough.
+# All of them keep the role: other profiles' salaries are no benchmark for this one
+FALLBACK_LEVELS = [
+    ('role', 'industry', 'location', 'band'),
+    ('role', 'industry', 'band'),
+    ('role', 'location', 'band'),
+    ('role', 'band'),
+    ('role',)
+]
+ANY = '*'
+# The compensation_gap fields computed here; the prompt shows them to the model as given
+GAP_FIELDS = ('market_salary_range', 'gap_percentage', 'annual_opportunity')
+# One row per assessment in the index, sorted by email digest, so a lookup can leave the person out
+MEMBER_DTYPE = [('email', '<u8'), ('role', '<i4'), ('industry', '<i4'), ('location', '<i4'),
+                ('band', '<i1'), ('salary', '<i4')]
+
+_lock = threading.Lock()
+_index = None
+_missing_reported = False
+_unreadable_mtime = None
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+def experience_band(years):
+    """Index into BANDS, or None when years is missing"""
+    years = _number(years)
+    if years is None:
+        return None
+    return max([0] + [i for i, (lowest, _) in enumerate(BANDS) if years >= lowest])
+
+def email_digest(email):
+    """64-bit digest of a normalized email; the index stores no addresses"""
+    normalized = (email or '').strip().lower().encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(normalized, digest_size=8).digest(), 'little')
+
+def cell_key(values, level):
+    return '\t'.join(str(values[field]) if field in level else ANY for field in KEY_FIELDS)
+
+def _quantile(sample, q):
+    """Linear-interpolated quantile of a sorted array, reading two elements"""
+    position = q * (len(sample) - 1)
+    low = int(position)
+    high = min(low + 1, len(sample) - 1)
+    return float(sample[low]) + (float(sample[high]) - float(sample[low])) * (position - low)
+
+class CompensationIndex:
+    def __init__(self, meta, salaries, members, mtime):
+        self.meta = meta
+        self.cells = meta['cells']
+        self.names = meta['names']
+        self.salaries = salaries
+        self.members = members
+        self.mtime = mtime
+        self.version = meta['version']
+
+    def member(self, email):
+        """The indexed row for an email as cohort values plus salary, or None"""
+        import numpy as np
+        if not email or not len(self.members):
+            return None
+        digest = email_digest(email)
+        position = int(np.searchsorted(self.members['email'], np.uint64(digest)))
+        if position == len(self.members) or int(self.members['email'][position]) != digest:
+            return None
+        row = self.members[position]
+        own = {field: self.names[field][int(row[field])] for field in ('role', 'industry', 'location')}
+        own['band'] = None if int(row['band']) < 0 else int(row['band'])
+        own['salary'] = int(row['salary'])
+        return own
+
+    def benchmark(self, role, industry, location, years_experience, salary=None, email=None):
+        """
+        Percentiles of the most specific cohort with MIN_SAMPLES salaries, or None. The indexed
+        assessment of email, if any, is taken out of the sample first.
+        """
+        import numpy as np
+        values = {
+            'role': cohort_value(role),
+            'industry': cohort_value(industry),
+            'location': cohort_value(location),
+            'band': experience_band(years_experience)
+        }
+        own = self.member(email)
+        for level in FALLBACK_LEVELS:
+            if any(values[field] in ('', None) for field in level):
+                continue
+            entry = self.cells.get(cell_key(values, level))
+            if entry is None:
+                continue
+            offset, count = entry
+            sample = self.salaries[offset:offset + count]
+            if own is not None and all(own[field] == values[field] for field in level):
+                position = int(np.searchsorted(sample, own['salary']))
+                if position < count and int(sample[position]) == own['salary']:
+                    sample = np.delete(sample, position)
+                    count -= 1
+            if count < MIN_SAMPLES:
+                continue
+            result = {
+                'basis': list(level),
+                'samples': count,
+                'p25': round(_quantile(sample, 0.25)),
+                'p50': round(_quantile(sample, 0.50)),
+                'p75': round(_quantile(sample, 0.75)),
+                'p90': round(_quantile(sample, 0.90))
+            }
+            if salary is not None:
+                result['percentile'] = round(100 * int(np.searchsorted(sample, salary, side='right')) / count)
+            return result
+        return None
+
+def _load(path, mtime):
+    import numpy as np
+    with open(path) as f:
+        meta = json.load(f)
+    salaries = np.load(os.path.join(INDEX_DIR, meta['salaries_file']), mmap_mode='r')
+    members = np.load(os.path.join(INDEX_DIR, meta['members_file']), mmap_mode='r')
+    print(f"Loaded compensation index {meta['version']}: {meta['rows']} salaries, {len(meta['cells'])} cells")
+    return CompensationIndex(meta, salaries, members, mtime)
+
+def _index_mtime():
+    try:
+        return os.stat(os.path.join(INDEX_DIR, 'index.json')).st_mtime
+    except FileNotFoundError:
+        return None
+
+def current():
+    """The loaded index, reloaded when a build replaces it; None when none has been built"""
+    global _index, _missing_reported, _unreadable_mtime
+    mtime = _index_mtime()
+    if mtime is None:
+        if not _missing_reported:
+            _missing_reported = True
+            print(f"No compensation index in {INDEX_DIR} - run `flask --app app build-compensation-index`")
+        return None
+    if mtime == _unreadable_mtime:
+        return None
+    if _index is None or _index.mtime != mtime:
+        with _lock:
+            if (_index is None or _index.mtime != mtime) and mtime != _unreadable_mtime:
+                try:
+                    _index = _load(os.path.join(INDEX_DIR, 'index.json'), mtime)
+                except (OSError, ValueError, KeyError) as e:
+                    # Partial copy or an older build format: no benchmarks until the next build
+                    print(f"Compensation index in {INDEX_DIR} is unreadable ({e!r}) - "
+                          f"run `flask --app app build-compensation-index`")
+                    _index, _unreadable_mtime = None, mtime
+                    return None
+    return _index
+
+def _assessment_rows(batch_size):
+    """(role, industry, location, years_experience, salary, email) of each email's latest assessment"""
+    latest = db.select(db.func.max(Assessment.id)).group_by(db.func.lower(Assessment.email)).scalar_subquery()
+    query = (db.select(Assessment.role, Assessment.industry, Assessment.location,
+                       Assessment.years_experience, Assessment.current_salary, Assessment.email)
+             .where(Assessment.id.in_(latest))
+             .execution_options(yield_per=batch_size))
+    yield from db.session.execute(query)
+
+def _csv_rows(path):
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield row.get('role'), row.get('industry'), row.get('location'), row.get('years_experience'), row.get('salary')
+
+def build(csv_paths=None, batch_size=5000):
+    """
+    Rebuild the index from the assessments plus csv_paths (default: COMPENSATION_REFERENCE_CSV)
+    and swap it in atomically; returns the index metadata without the cell table.
+    """
+    import numpy as np
+    started = time.monotonic()
+    csv_paths = REFERENCE_CSVS if csv_paths is None else csv_paths
+
+    # Cohort values become integer codes so grouping is a numpy sort; code 0 is "unknown"
+    codes = {field: {'': 0} for field in ('role', 'industry', 'location')}
+    columns = {field: [] for field in KEY_FIELDS}
+    salaries = []
+    emails = {}  # email digest -> row number
+    sources = {}
+
+    def add(role, industry, location, years, salary, email=None):
+        salary = _number(salary)
+        if salary is None or not MIN_SALARY <= salary <= MAX_SALARY:
+            return False
+        for field, value in (('role', role), ('industry', industry), ('location', location)):
+            value = cohort_value(value)
+            columns[field].append(codes[field].setdefault(value, len(codes[field])))
+        band = experience_band(years)
+        columns['band'].append(-1 if band is None else band)
+        if email:
+            emails[email_digest(email)] = len(salaries)
+        salaries.append(salary)
+        return True
+
+    sources['assessments'] = sum(add(*row) for row in _assessment_rows(batch_size))
+    for path in csv_paths:
+        sources[os.path.basename(path)] = sum(add(*row) for row in _csv_rows(path))
+
+    keys = {field: np.array(values, dtype=np.int64) for field, values in columns.items()}
+    amounts = np.array(salaries, dtype=np.int32)
+    known = {field: keys[field] > 0 for field in ('role', 'industry', 'location')}
+    known['band'] = keys['band'] >= 0
+    names = {field: {code: value for value, code in mapping.items()} for field, mapping in codes.items()}
+    names['band'] = {i: i for i in range(len(BANDS))}
+
+    cells, parts, offset = {}, [], 0
+    for level in FALLBACK_LEVELS:
+        mask = np.ones(len(amounts), dtype=bool)
+        for field in level:
+            mask &= known[field]
+        level_keys = [keys[field][mask] for field in level]
+        level_salaries = amounts[mask]
+        if not len(level_salaries):
+            continue
+        # Sort by cohort, then salary, so each cell is a contiguous sorted run
+        order = np.lexsort([level_salaries] + level_keys[::-1])
+        level_salaries = level_salaries[order]
+        level_keys = [column[order] for column in level_keys]
+        changes = np.zeros(len(level_salaries), dtype=bool)
+        changes[0] = True
+        for column in level_keys:
+            changes[1:] |= column[1:] != column[:-1]
+        starts = np.flatnonzero(changes)
+        counts = np.diff(np.append(starts, len(level_salaries)))
+        for start, count in zip(starts.tolist(), counts.tolist()):
+            values = {field: names[field][int(column[start])] for field, column in zip(level, level_keys)}
+            cells[cell_key(values, level)] = [offset + start, count]
+        parts.append(level_salaries)
+        offset += len(level_salaries)
+
+    data = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+    members = np.zeros(len(emails), dtype=MEMBER_DTYPE)
+    rows = np.array(list(emails.values()), dtype=np.int64)
+    members['email'] = np.array(list(emails.keys()), dtype=np.uint64)
+    for field in KEY_FIELDS:
+        members[field] = keys[field][rows]
+    members['salary'] = amounts[rows]
+    members.sort(order='email')
+
+    digest = hashlib.blake2b(data.tobytes(), digest_size=16)
+    digest.update(members.tobytes())
+    digest.update(json.dumps(cells, sort_keys=True).encode('utf-8'))
+    index_version = digest.hexdigest()[:16]
+    meta = {
+        'version': index_version,
+        'built_at': datetime.utcnow().isoformat(),
+        'rows': len(amounts),
+        'sources': sources,
+        'salaries_file': f"salaries-{index_version}.npy",
+        'members_file': f"members-{index_version}.npy",
+        # Code -> cohort value, to read the member rows
+        'names': {field: sorted(mapping, key=mapping.get) for field, mapping in codes.items()},
+        'cells': cells
+    }
+
+    # Data files first, then the key table that points at them, each renamed into place;
+    # processes still mapping older files keep reading them until they reload
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+    for name, array in ((meta['salaries_file'], data), (meta['members_file'], members)):
+        path = os.path.join(INDEX_DIR, name)
+        with open(path + suffix, 'wb') as f:
+            np.save(f, array)
+        os.replace(path + suffix, path)
+    index_path = os.path.join(INDEX_DIR, 'index.json')
+    with open(index_path + suffix, 'w') as f:
+        json.dump(meta, f)
+    os.replace(index_path + suffix, index_path)
+    current_files = (meta['salaries_file'], meta['members_file'])
+    for name in os.listdir(INDEX_DIR):
+        if name.startswith(('salaries-', 'members-')) and name.endswith('.npy') and name not in current_files:
+            os.remove(os.path.join(INDEX_DIR, name))
+
+    summary = {key: value for key, value in meta.items() if key not in ('cells', 'names')}
+    summary['cells'] = len(cells)
+    print(f"Built compensation index {index_version}: {len(amounts)} salaries, {len(cells)} cells "
+          f"in {time.monotonic() - started:.2f}s")
+    return summary
+
+def _ordinal(number):
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+def _describe(assessment_data, basis):
+    parts = [str(assessment_data.get(field)).strip() for field in ('role', 'industry', 'location') if field in basis]
+    band = experience_band(assessment_data.get('years_experience'))
+    if 'band' in basis and band is not None:
+        parts.append(BANDS[band][1])
+    return ', '.join(parts) if parts else 'all profiles'
+
+def compensation_gap(assessment_data):
+    """
+    The compensation_gap fields computed from the index (everything but key_insight, plus the
+    raw 'benchmark' numbers), or None when there is no usable benchmark and the model writes them
+    """
+    salary = _number(assessment_data.get('current_salary'))
+    if salary is None:
+        return None
+    with metrics.stage('analysis.compensation_index'):
+        index = current()
+        benchmark = index.benchmark(assessment_data.get('role'), assessment_data.get('industry'),
+                                    assessment_data.get('location'), assessment_data.get('years_experience'),
+                                    salary, email=assessment_data.get('email')) if index is not None else None
+    if benchmark is None:
+        return None
+
+    p25, p50, p75 = benchmark['p25'], benchmark['p50'], benchmark['p75']
+    gap = (p50 - salary) / p50 * 100
+    to_median, to_p75 = max(0, p50 - salary), max(0, p75 - salary)
+    if to_p75 == 0:
+        opportunity = "$0 - already at or above the 75th percentile"
+    elif to_median == 0:
+        opportunity = f"${to_p75:,.0f} to reach the 75th percentile"
+    else:
+        opportunity = f"${to_median:,.0f} to reach the median, ${to_p75:,.0f} to reach the 75th percentile"
+    return {
+        'market_salary_range': f"${p25:,.0f} - ${p75:,.0f} (middle 50% of {benchmark['samples']} comparable "
+                               f"profiles: {_describe(assessment_data, benchmark['basis'])})",
+        'gap_percentage': f"{abs(gap):.0f}% {'below' if gap >= 0 else 'above'} the market median of ${p50:,.0f} "
+                          f"({_ordinal(benchmark['percentile'])} percentile)",
+        'annual_opportunity': opportunity,
+        'benchmark': benchmark
+    }
+
+def ground_section(name, value, gap):
+    """A generated section with the local compensation_gap fields merged in (others unchanged)"""
+    if name != 'compensation_gap' or gap is None:
+        return value
+    key_insight = value.get('key_insight') if isinstance(value, dict) else None
+    fields = {key: gap[key] for key in GAP_FIELDS}
+    return dict(fields, key_insight=key_insight, benchmark=gap['benchmark'])
+
+def ground(analysis, gap):
+    """The full analysis with the local compensation_gap fields merged in"""
+    if gap is None:
+        return analysis
+    return {name: ground_section(name, value, gap) for name, value in analysis.items()}
@@ -0,0 +1,49 @@
+"""
+Career Flow Diagnostic Tool - Async (gevent) Gunicorn Configuration
+Serves the same Flask app with gevent workers, so a request waiting on Claude (an SSE
+stream, or a status poll) costs a greenlet instead of an OS thread. Sockets, sleeps,
+locks and the analysis/outbox worker threads all become cooperative; psycogreen makes
+psycopg2 yield while Postgres is working.
+
+Usage:
+    pip install -r requirements-async.txt
+    gunicorn -c gunicorn_async.py app:app
+
+The defaults below apply only when the variables are not already set. LLM_MAX_IN_FLIGHT
+and LLM_REQUESTS_PER_MINUTE still cap concurrent Claude calls, so raise them to what your
+Anthropic rate limits allow.
+"""
+
+import os
+
+# One process, many greenlets; add workers only for CPU-bound work such as PDF rendering
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('GEVENT_WORKER_CONNECTIONS', 1000))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+
+# Analysis workers: twice the gateway's in-flight cap keeps every Claude slot busy while other
+# jobs read or write the database. More would only claim jobs to park them on the gateway
+# semaphore, and poll the queue for nothing. SSE streams and status polls are not limited by this.
+os.environ.setdefault('ANALYSIS_WORKERS', str(2 * int(os.environ.get('LLM_MAX_IN_FLIGHT', 4))))
+os.environ.setdefault('DB_POOL_SIZE', '20')
+os.environ.setdefault('DB_MAX_OVERFLOW', '30')
+
+def post_fork(server, worker):
+    # Runs before the gevent worker monkey-patches the standard library. trio, which some
+    # versions of the Anthropic SDK's HTTP stack import, binds select.epoll at import time
+    # and gevent's select has no epoll, so import it while the real one is still there.
+    try:
+        import trio  # noqa: F401
+    except ImportError:
+        pass
+
+    # psycopg2 needs a wait callback to yield to other greenlets
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen not installed - Postgres queries will block the whole worker")
+        return
+    patch_psycopg()
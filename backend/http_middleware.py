@@ -0,0 +1,147 @@
+"""
+Career Flow Diagnostic Tool - HTTP Middleware
+One WSGI layer around the Flask app for the cross-cutting response work:
+- CORS: preflight OPTIONS requests are answered here, before Flask routing runs, and every
+  other response (errors included) gets the CORS headers when its Origin is allowed
+- Compression: buffered JSON/text bodies above COMPRESSION_MIN_SIZE are sent as brotli
+  (when the Brotli package is installed) or gzip, whichever the client prefers
+- Validators: buffered GET responses get a strong ETag computed from the body, and a matching
+  If-None-Match is answered with 304 and no body
+Streamed responses (SSE, exports, ZIPs) have no Content-Length and pass through untouched.
+"""
+
+import gzip
+import hashlib
+import os
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import metrics
+
+# Support multiple origins separated by comma; trailing slashes are ignored
+ALLOWED_ORIGINS = frozenset(
+    origin.strip().rstrip('/') for origin in os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    if origin.strip()
+)
+ALLOW_METHODS = 'GET, POST, PUT, DELETE, OPTIONS'
+ALLOW_HEADERS = 'Content-Type, Authorization, Idempotency-Key'
+EXPOSE_HEADERS = 'Retry-After'
+PREFLIGHT_MAX_AGE = '3600'
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+
+def cors_headers(origin):
+    """Headers for an allowed Origin, or [] when it is missing or not allowed"""
+    if not origin or origin.rstrip('/') not in ALLOWED_ORIGINS:
+        return []
+    return [
+        ('Access-Control-Allow-Origin', origin),
+        ('Access-Control-Allow-Credentials', 'true'),
+        ('Access-Control-Expose-Headers', EXPOSE_HEADERS)
+    ]
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header, by client preference"""
+    accept = parse_accept_header(accept_encoding)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    quality, encoding = max((accept.quality(name), name) for name in candidates)
+    return encoding if quality > 0 else None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output (and so the ETag) identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def make_etag(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def _add_vary(headers, value):
+    for i, (name, existing) in enumerate(headers):
+        if name.lower() == 'vary':
+            if value.lower() not in existing.lower():
+                headers[i] = (name, f"{existing}, {value}")
+            return
+    headers.append(('Vary', value))
+
+class ResponseMiddleware:
+    """WSGI wrapper for CORS, compression and ETags (install with app.wsgi_app = ResponseMiddleware(app.wsgi_app))"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        origin = environ.get('HTTP_ORIGIN')
+        cors = cors_headers(origin)
+
+        if environ['REQUEST_METHOD'] == 'OPTIONS' and origin:
+            headers = [('Content-Length', '0'), ('Vary', 'Origin')]
+            if cors:
+                headers += cors + [
+                    ('Access-Control-Allow-Methods', ALLOW_METHODS),
+                    ('Access-Control-Allow-Headers', ALLOW_HEADERS),
+                    ('Access-Control-Max-Age', PREFLIGHT_MAX_AGE)
+                ]
+            start_response('204 No Content', headers)
+            return []
+
+        captured = {}
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            # Flask never uses the legacy write() callable
+            return lambda data: None
+
+        app_iter = self.wsgi_app(environ, capture)
+        status, headers = captured['status'], list(captured['headers'])
+        if origin:
+            _add_vary(headers, 'Origin')
+            headers += cors
+
+        values = {name.lower(): value for name, value in headers}
+        content_type = values.get('content-type', '').split(';')[0].strip()
+        buffered = ('content-length' in values and 'content-encoding' not in values
+                    and content_type in COMPRESSIBLE_TYPES and environ['REQUEST_METHOD'] != 'HEAD')
+        if not buffered:
+            start_response(status, headers, captured['exc_info'])
+            return app_iter
+
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        with metrics.stage('http.encode'):
+            return self._encode(environ, start_response, status, headers, values, body)
+
+    def _encode(self, environ, start_response, status, headers, values, body):
+        _add_vary(headers, 'Accept-Encoding')
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING')) if len(body) >= COMPRESSION_MIN_SIZE else None
+
+        if environ['REQUEST_METHOD'] == 'GET' and status.startswith('200') and 'etag' not in values:
+            # One tag per representation (RFC 9110), but any representation of this body matches
+            tag = make_etag(body)
+            headers.append(('ETag', f'"{tag}-{encoding}"' if encoding else f'"{tag}"'))
+            if 'cache-control' not in values:
+                headers.append(('Cache-Control', 'no-cache'))
+            requested = parse_etags(environ.get('HTTP_IF_NONE_MATCH'))
+            if requested.star_tag or any(candidate.split('-')[0] == tag for candidate in requested.as_set(include_weak=True)):
+                headers = [(name, value) for name, value in headers
+                           if name.lower() not in ('content-length', 'content-type')]
+                start_response('304 Not Modified', headers)
+                return []
+
+        if encoding:
+            body = compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+            headers += [('Content-Encoding', encoding), ('Content-Length', str(len(body)))]
+        start_response(status, headers)
+        return [body]
@@ -0,0 +1,55 @@
+"""
+Career Flow Diagnostic Tool - Submission Idempotency
+Collapses duplicate submissions (double-clicks, retries after a proxy timeout) onto the
+first assessment instead of creating another row and another Claude call.
+
+The key comes from the client's Idempotency-Key header, scoped to the email, or is derived
+from the email plus a hash of the normalized answers. Keys live in the submission_key
+table; its primary key is the single-flight lock, so two gunicorn workers racing on the
+same key can't both create an assessment.
+"""
+
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Assessment, SubmissionKey
+from analysis_cache import normalize_inputs
+
+HEADER_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+# Identical answers from the same email within this window are treated as a resubmission
+DERIVED_KEY_TTL = int(os.environ.get('IDEMPOTENCY_DERIVED_TTL', 600))
+
+def submission_key(data, header_key=None):
+    """Returns (key, source) for a submission payload"""
+    email = str(data.get('email', '')).strip().lower()
+    if header_key:
+        material, source = f"header:{email}:{header_key.strip()}", 'header'
+    else:
+        material, source = f"derived:{email}:{json.dumps(normalize_inputs(data), sort_keys=True)}", 'derived'
+    return hashlib.sha256(material.encode('utf-8')).hexdigest(), source
+
+def find_existing(key):
+    """Assessment an unexpired key points at, or None"""
+    entry = db.session.get(SubmissionKey, key)
+    if entry is None or entry.expires_at <= datetime.utcnow():
+        return None
+    return db.session.get(Assessment, entry.assessment_id)
+
+def register(key, source, assessment_id):
+    """
+    Record the key for a new assessment in the caller's transaction (caller commits).
+    Expired keys, including an old row for this one, are cleared first.
+    """
+    now = datetime.utcnow()
+    db.session.execute(db.delete(SubmissionKey).where(SubmissionKey.expires_at <= now))
+    ttl = HEADER_KEY_TTL if source == 'header' else DERIVED_KEY_TTL
+    db.session.add(SubmissionKey(key=key, assessment_id=assessment_id, source=source,
+                                 expires_at=now + timedelta(seconds=ttl)))
+
+def is_duplicate_key_error(error):
+    """True when a commit failed because another request registered the same key first"""
+    return isinstance(error, IntegrityError) and 'submission_key' in str(error.statement)
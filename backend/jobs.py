@@ -0,0 +1,256 @@
+"""
+Career Flow Diagnostic Tool - Background Analysis Queue
+Database-backed job queue so submissions return immediately while a worker pool runs Claude analysis.
+Works on SQLite locally and PostgreSQL in production; jobs are claimed with an atomic
+compare-and-set UPDATE so several gunicorn workers (or a separate worker process) can share the queue.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+from flask import current_app
+
+from models import db, AnalysisJob
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Worker pool configuration
+WORKER_COUNT = int(os.environ.get('ANALYSIS_WORKERS', 2))
+MAX_ATTEMPTS = int(os.environ.get('ANALYSIS_MAX_ATTEMPTS', 2))
+POLL_INTERVAL = float(os.environ.get('ANALYSIS_POLL_INTERVAL', 2.0))
+# Running jobs without a heartbeat for this long are assumed orphaned (worker crashed or was redeployed)
+JOB_TIMEOUT = int(os.environ.get('ANALYSIS_JOB_TIMEOUT', 300))
+# How often a process refreshes heartbeat_at on the jobs it is running, well inside JOB_TIMEOUT
+HEARTBEAT_INTERVAL = max(1, JOB_TIMEOUT // 3)
+# How often each process sweeps for orphaned jobs
+STALE_CHECK_INTERVAL = 30
+
+# Wakes one idle worker per notify, so a new job doesn't send every worker to the database
+_wakeup = threading.Condition()
+_last_stale_check = 0.0
+_stale_check_lock = threading.Lock()
+_workers = []
+_workers_lock = threading.Lock()
+# Ids of the jobs this process is running, kept fresh by one heartbeat thread
+_running = set()
+_running_lock = threading.Lock()
+_heartbeat_thread = None
+
+def enqueue_analysis(assessment_id, bypass_cache=False, delay=0):
+    """
+    Add an analysis job for an assessment to the current session.
+    The caller commits, so the job is persisted together with the assessment.
+    A delay keeps workers away from the job so a streaming request can claim it first.
+    """
+    available_at = datetime.utcnow() + timedelta(seconds=delay) if delay else None
+    job = AnalysisJob(assessment_id=assessment_id, status=QUEUED, bypass_cache=bypass_cache,
+                      available_at=available_at)
+    db.session.add(job)
+    return job
+
+def notify_workers(all_workers=False):
+    """Wake an idle in-process worker (or all of them, e.g. at shutdown) instead of waiting for the next poll"""
+    with _wakeup:
+        if all_workers:
+            _wakeup.notify_all()
+        else:
+            _wakeup.notify()
+
+def latest_job(assessment_id):
+    """Most recent job for an assessment, or None for assessments created before the queue existed"""
+    return (AnalysisJob.query
+            .filter_by(assessment_id=assessment_id)
+            .order_by(AnalysisJob.id.desc())
+            .first())
+
+def claim_job(job_id, worker_id):
+    """
+    Atomically move a queued job to running.
+    Returns True only for the caller that won the race.
+    """
+    result = db.session.execute(
+        db.update(AnalysisJob)
+        .where(AnalysisJob.id == job_id, AnalysisJob.status == QUEUED)
+        .values(status=RUNNING,
+                worker_id=worker_id,
+                started_at=datetime.utcnow(),
+                heartbeat_at=datetime.utcnow(),
+                attempts=AnalysisJob.attempts + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def claim_next_job(worker_id, batch_size=5):
+    """Claim the oldest queued job, or return None if the queue is empty"""
+    now = datetime.utcnow()
+    candidate_ids = db.session.execute(
+        db.select(AnalysisJob.id)
+        .where(AnalysisJob.status == QUEUED,
+               db.or_(AnalysisJob.available_at.is_(None), AnalysisJob.available_at <= now))
+        .order_by(AnalysisJob.id)
+        .limit(batch_size)
+    ).scalars().all()
+
+    for job_id in candidate_ids:
+        if claim_job(job_id, worker_id):
+            return db.session.get(AnalysisJob, job_id)
+    return None
+
+def finish_job(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def release_job(job, error=None):
+    """Hand a claimed job back to the worker pool (e.g. when a streaming client disconnects)"""
+    job.status = QUEUED
+    job.worker_id = None
+    job.available_at = None
+    job.error = error
+    db.session.commit()
+    notify_workers()
+
+def _heartbeat_loop(app):
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _running_lock:
+            job_ids = list(_running)
+        if not job_ids:
+            continue
+        with app.app_context():
+            try:
+                db.session.execute(
+                    db.update(AnalysisJob)
+                    .where(AnalysisJob.id.in_(job_ids), AnalysisJob.status == RUNNING)
+                    .values(heartbeat_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Job heartbeat failed: {e}")
+            finally:
+                db.session.remove()
+
+@contextmanager
+def running(job):
+    """
+    Keep a claimed job's heartbeat fresh for the duration of the block (needs an app context),
+    so jobs waiting on the LLM gateway or a slow call are not mistaken for orphans
+    """
+    global _heartbeat_thread
+    with _running_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, args=(current_app._get_current_object(),),
+                                                 name='analysis-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+        _running.add(job.id)
+    try:
+        yield
+    finally:
+        with _running_lock:
+            _running.discard(job.id)
+
+def requeue_stale_jobs():
+    """Return orphaned running jobs to the queue, or fail them once they are out of attempts"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT)
+    # Jobs claimed before heartbeat_at existed fall back to their start time
+    last_seen = db.func.coalesce(AnalysisJob.heartbeat_at, AnalysisJob.started_at)
+    stale = db.and_(AnalysisJob.status == RUNNING, last_seen < cutoff)
+
+    db.session.execute(
+        db.update(AnalysisJob)
+        .where(stale, AnalysisJob.attempts < MAX_ATTEMPTS)
+        .values(status=QUEUED, worker_id=None)
+    )
+    db.session.execute(
+        db.update(AnalysisJob)
+        .where(stale, AnalysisJob.attempts >= MAX_ATTEMPTS)
+        .values(status=FAILED, error='Analysis timed out', finished_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+def stale_check_due():
+    """True for one caller per STALE_CHECK_INTERVAL in this process"""
+    global _last_stale_check
+    with _stale_check_lock:
+        now = time.monotonic()
+        if now - _last_stale_check < STALE_CHECK_INTERVAL:
+            return False
+        _last_stale_check = now
+        return True
+
+def run_job(job, handler):
+    """Run the handler for a claimed job and record the outcome"""
+    try:
+        with running(job):
+            handler(job)
+        finish_job(job, COMPLETED)
+        print(f"Job {job.id} completed for assessment {job.assessment_id}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Job {job.id} failed (attempt {job.attempts}): {traceback.format_exc()}")
+        if job.attempts < MAX_ATTEMPTS:
+            release_job(job, str(e))
+        else:
+            finish_job(job, FAILED, str(e))
+
+def _worker_loop(app, handler, worker_id, stop_event):
+    """Poll for queued jobs until stopped"""
+    while not stop_event.is_set():
+        job = None
+        with app.app_context():
+            try:
+                if stale_check_due():
+                    requeue_stale_jobs()
+                job = claim_next_job(worker_id)
+                if job is not None:
+                    run_job(job, handler)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Worker {worker_id} error: {e}")
+            finally:
+                db.session.remove()
+
+        if job is None:
+            with _wakeup:
+                _wakeup.wait(POLL_INTERVAL)
+
+def start_workers(app, handler, count=None):
+    """
+    Start the in-process worker pool (idempotent per process).
+    Returns the stop event so callers such as worker.py can shut the pool down.
+    """
+    with _workers_lock:
+        if _workers:
+            return _workers[0][1]
+        if multiprocessing.parent_process() is not None:
+            # Spawned helper processes (e.g. the bulk export pool) re-import the app; they must not poll the queue
+            return threading.Event()
+
+        count = WORKER_COUNT if count is None else count
+        stop_event = threading.Event()
+        host = socket.gethostname()
+        for i in range(count):
+            worker_id = f"{host}:{os.getpid()}:{i}"
+            thread = threading.Thread(
+                target=_worker_loop,
+                args=(app, handler, worker_id, stop_event),
+                name=f"analysis-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            _workers.append((thread, stop_event))
+
+        print(f"Started {count} analysis worker(s) in process {os.getpid()}")
+        return stop_event
@@ -0,0 +1,71 @@
+"""
+Career Flow Diagnostic Tool - Incremental JSON Section Parser
+Reports each top-level member of a streamed JSON object as soon as it is complete,
+so sections of the analysis can be shown before Claude finishes generating the rest.
+"""
+
+import json
+
+class SectionParser:
+    """
+    Feed text chunks as they arrive; feed() returns the (key, value) pairs of
+    top-level members that completed within that chunk.
+
+    Anything before the first '{' (e.g. a ```json fence) is ignored. Members that
+    fail to parse on their own are skipped - the caller's final json.loads of the
+    full text remains the source of truth.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        sections = []
+
+        while self.pos < len(self.buffer) and not self.done:
+            char = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif self.depth == 0:
+                if char == '{':
+                    self.depth = 1
+                    self.member_start = self.pos + 1
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._emit(self.pos, sections)
+                    self.done = True
+            elif char == ',' and self.depth == 1:
+                self._emit(self.pos, sections)
+                self.member_start = self.pos + 1
+
+            self.pos += 1
+
+        return sections
+
+    def _emit(self, end, sections):
+        member = self.buffer[self.member_start:end].strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads('{' + member + '}')
+        except json.JSONDecodeError:
+            return
+        sections.extend(parsed.items())
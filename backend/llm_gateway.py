@@ -0,0 +1,316 @@
+"""
+Career Flow Diagnostic Tool - LLM Gateway
+Process-wide access point for Anthropic calls:
+
+- one shared client, so HTTP connections and TLS sessions are reused
+- a semaphore capping in-flight requests across worker threads
+- token buckets for requests/minute and tokens/minute
+- jittered exponential retry on connection errors, timeouts, 429, 5xx and overloaded errors
+  (honours retry-after)
+- per-call latency, time-to-first-token and token usage accounting (also exported to /metrics)
+
+Point ANTHROPIC_BASE_URL at a local fake server to exercise it offline. The anthropic
+SDK is imported on first use rather than at startup, since importing it takes about a second.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import os
+import random
+import threading
+import time
+
+import metrics
+
+MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 4))
+REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 50))
+TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', 0))  # 0 disables the token bucket
+MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 4))
+RETRY_BASE_DELAY = float(os.environ.get('LLM_RETRY_BASE_DELAY', 1.0))
+RETRY_MAX_DELAY = float(os.environ.get('LLM_RETRY_MAX_DELAY', 30.0))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 529}
+
+class CallCancelled(Exception):
+    """Raised by a caller to abandon a streamed call it no longer needs (the stream is closed)"""
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at rate_per_minute, holding at most one minute's worth
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount is available; returns the seconds spent waiting"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                shortfall = (amount - self.tokens) / self.rate
+            time.sleep(shortfall)
+            waited += shortfall
+
+    def refund(self, amount):
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+def is_retryable(error):
+    import anthropic
+
+    # APITimeoutError is a subclass of APIConnectionError; both are what the SDK retried by itself
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code in RETRYABLE_STATUS:
+            return True
+        body = error.body if isinstance(error.body, dict) else {}
+        return (body.get('error') or {}).get('type') == 'overloaded_error'
+    return False
+
+def retry_after_seconds(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(kwargs):
+    """Rough pre-call charge for the token bucket: ~4 characters per input token plus max_tokens"""
+    system = kwargs.get('system', '')
+    characters = len(system) if isinstance(system, str) else sum(len(block.get('text', '')) for block in system)
+    for message in kwargs.get('messages', []):
+        characters += len(str(message.get('content', '')))
+    return characters // 4 + kwargs.get('max_tokens', 0)
+
+class _FirstTokenTimer:
+    """Wraps a MessageStream and records time-to-first-token on the first content delta"""
+
+    def __init__(self, stream, started):
+        self._stream = stream
+        self._started = started
+
+    def __iter__(self):
+        recorded = False
+        for event in self._stream:
+            if not recorded and getattr(event, 'type', None) == 'content_block_delta':
+                metrics.LLM_TTFT.observe(time.monotonic() - self._started)
+                recorded = True
+            yield event
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class LLMGateway:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_retries=MAX_RETRIES):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._stats = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'in_flight': 0,
+            'waiting': 0,
+            'rate_limit_wait_seconds': 0.0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0,
+            'errors': {}
+        }
+
+    @property
+    def client(self):
+        """Shared Anthropic client; the SDK's own retries are off because the gateway retries"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import anthropic
+
+                    api_key = os.environ.get("ANTHROPIC_API_KEY")
+                    if not api_key:
+                        raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+                    self._client = anthropic.Anthropic(
+                        api_key=api_key,
+                        base_url=os.environ.get('ANTHROPIC_BASE_URL') or None,
+                        max_retries=0
+                    )
+        return self._client
+
+    def queue_depth(self):
+        """Calls currently waiting for a slot (used for routing decisions)"""
+        with self._stats_lock:
+            return self._stats['waiting']
+
+    def _bump(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _record_error(self, error):
+        name = type(error).__name__
+        with self._stats_lock:
+            self._stats['errors'][name] = self._stats['errors'].get(name, 0) + 1
+        metrics.record_error('llm.request', error)
+
+    def _record_usage(self, usage, estimated, started):
+        latency = time.monotonic() - started
+        cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        cache_creation = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        with self._stats_lock:
+            self._latencies.append(latency)
+            self._stats['succeeded'] += 1
+            if usage is not None:
+                self._stats['input_tokens'] += usage.input_tokens or 0
+                self._stats['output_tokens'] += usage.output_tokens or 0
+                self._stats['cache_read_input_tokens'] += cache_read
+                self._stats['cache_creation_input_tokens'] += cache_creation
+        metrics.STAGE_SECONDS.observe(latency, stage='llm.request')
+        if usage is not None:
+            metrics.LLM_TOKENS.inc(usage.input_tokens or 0, kind='input')
+            metrics.LLM_TOKENS.inc(usage.output_tokens or 0, kind='output')
+            metrics.LLM_TOKENS.inc(cache_read, kind='cache_read')
+            metrics.LLM_TOKENS.inc(cache_creation, kind='cache_creation')
+            print(f"LLM call {latency:.2f}s: input={usage.input_tokens} output={usage.output_tokens} "
+                  f"cache_read={cache_read} cache_creation={cache_creation}")
+        if self._token_bucket is not None and usage is not None:
+            # Give back what the estimate over-charged
+            actual = (usage.input_tokens or 0) + cache_creation + (usage.output_tokens or 0)
+            if estimated > actual:
+                self._token_bucket.refund(estimated - actual)
+
+    @contextmanager
+    def _slot(self, kwargs):
+        """Wait for rate limits and a free in-flight slot"""
+        estimated = estimate_tokens(kwargs)
+        self._bump('waiting')
+        try:
+            waited = 0.0
+            if self._request_bucket is not None:
+                waited += self._request_bucket.acquire(1)
+            if self._token_bucket is not None:
+                waited += self._token_bucket.acquire(estimated)
+            self._semaphore.acquire()
+        finally:
+            self._bump('waiting', -1)
+        self._bump('rate_limit_wait_seconds', waited)
+        self._bump('in_flight')
+        try:
+            yield estimated
+        finally:
+            self._bump('in_flight', -1)
+            self._semaphore.release()
+
+    def _backoff(self, attempt, error):
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+            delay = random.uniform(0, delay)  # full jitter
+        self._bump('retries')
+        metrics.LLM_RETRIES.inc()
+        print(f"LLM call retrying in {delay:.1f}s after {type(error).__name__}: {error}")
+        time.sleep(delay)
+
+    def create_message(self, **kwargs):
+        """messages.create with governance and retries"""
+        import anthropic
+
+        self._bump('calls')
+        attempt = 0
+        while True:
+            with self._slot(kwargs) as estimated:
+                started = time.monotonic()
+                try:
+                    message = self.client.messages.create(**kwargs)
+                    self._record_usage(getattr(message, 'usage', None), estimated, started)
+                    return message
+                except anthropic.APIError as e:
+                    self._record_error(e)
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        self._bump('failed')
+                        raise
+                    error = e
+            # Back off outside the slot so other calls can proceed
+            self._backoff(attempt, error)
+            attempt += 1
+
+    @contextmanager
+    def stream(self, **kwargs):
+        """
+        messages.stream with governance. Opening the stream is retried; once tokens
+        have been delivered a failure propagates, since the caller has already used them.
+        """
+        import anthropic
+
+        self._bump('calls')
+        attempt = 0
+        while True:
+            with self._slot(kwargs) as estimated:
+                started = time.monotonic()
+                manager = self.client.messages.stream(**kwargs)
+                try:
+                    stream = manager.__enter__()
+                except anthropic.APIError as e:
+                    self._record_error(e)
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        self._bump('failed')
+                        raise
+                    error = e
+                else:
+                    try:
+                        yield _FirstTokenTimer(stream, started)
+                        final = stream.get_final_message()
+                        self._record_usage(getattr(final, 'usage', None), estimated, started)
+                    except BaseException as e:
+                        if isinstance(e, Exception) and not isinstance(e, CallCancelled):
+                            self._record_error(e)
+                            self._bump('failed')
+                        manager.__exit__(type(e), e, e.__traceback__)
+                        raise
+                    manager.__exit__(None, None, None)
+                    return
+            self._backoff(attempt, error)
+            attempt += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['errors'] = dict(self._stats['errors'])
+            latencies = sorted(self._latencies)
+        stats['max_in_flight'] = self.max_in_flight
+        stats['rate_limit_wait_seconds'] = round(stats['rate_limit_wait_seconds'], 3)
+        if latencies:
+            stats['latency_seconds'] = {
+                'p50': round(latencies[len(latencies) // 2], 3),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                'max': round(latencies[-1], 3),
+                'samples': len(latencies)
+            }
+        return stats
+
+gateway = LLMGateway()
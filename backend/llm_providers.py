@@ -0,0 +1,360 @@
+"""
+Career Flow Diagnostic Tool - LLM Providers
+Runs the Career Flow prompt against Anthropic (via the gateway) or a local Ollama model,
+with a configurable routing policy. Output is schema-constrained (Anthropic tool use,
+Ollama structured output) and every provider's result passes the same validation; invalid
+or missing sections are regenerated on their own rather than redoing the whole report.
+
+LLM_ROUTING:
+    anthropic         - Anthropic only (default)
+    primary_fallback  - LLM_PRIMARY first, LLM_FALLBACK if it errors or returns invalid JSON
+    queue_depth       - Ollama when more than LLM_QUEUE_DEPTH_THRESHOLD gateway calls are waiting
+    race              - both at once, first valid analysis wins (the other call is cancelled)
+
+ANALYSIS_MODE:
+    single  - one call generates every section (default)
+    fanout  - each section is its own concurrent call (at most ANALYSIS_FANOUT_PARALLELISM
+              at once), then a short pass writes the executive summary over the merged result
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import analysis_schema
+from jobs import WORKER_COUNT
+from llm_gateway import gateway, CallCancelled
+import metrics
+
+ANALYSIS_MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 4000
+
+ROUTING = os.environ.get('LLM_ROUTING', 'anthropic')
+PRIMARY = os.environ.get('LLM_PRIMARY', 'anthropic')
+FALLBACK = os.environ.get('LLM_FALLBACK', 'ollama')
+QUEUE_DEPTH_THRESHOLD = int(os.environ.get('LLM_QUEUE_DEPTH_THRESHOLD', 4))
+
+OLLAMA_API_URL = os.environ.get('OLLAMA_API_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'llama3.2')
+OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 120))
+
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'single')
+FANOUT_PARALLELISM = int(os.environ.get('ANALYSIS_FANOUT_PARALLELISM', 3))
+SECTION_MAX_TOKENS = int(os.environ.get('ANALYSIS_SECTION_MAX_TOKENS', 1500))
+SUMMARY_MAX_TOKENS = 500
+
+# Repair passes per generation before giving up (the job retry then regenerates everything)
+REPAIR_ATTEMPTS = int(os.environ.get('ANALYSIS_REPAIR_ATTEMPTS', 1))
+
+_stats_lock = threading.Lock()
+_generation_stats = {
+    'generations': 0,
+    'valid_first_pass': 0,
+    'partial_repairs': 0,
+    'sections_repaired': 0,
+    'repair_failures': 0,
+    'full_regenerations': 0,
+    'full_seconds': 0.0,
+    'repair_seconds': 0.0
+}
+
+class ProviderError(Exception):
+    """A provider failed or produced an analysis that doesn't match the schema"""
+
+def check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise CallCancelled("Generation no longer needed")
+
+def parse_analysis_response(response_text):
+    """
+    Parse model response text into the analysis dict
+    """
+    # Extract JSON from response (models might wrap it in markdown)
+    if "```json" in response_text:
+        json_start = response_text.find("```json") + 7
+        json_end = response_text.find("```", json_start)
+        response_text = response_text[json_start:json_end].strip()
+
+    return json.loads(response_text)
+
+def validate_analysis(analysis):
+    """Raise ProviderError unless the analysis matches the report schema"""
+    problems = analysis_schema.section_errors(analysis)
+    if problems:
+        raise ProviderError("Invalid analysis: " + "; ".join(e for errors in problems.values() for e in errors))
+    return analysis
+
+def record_generation(name, amount=1):
+    with _stats_lock:
+        _generation_stats[name] += amount
+
+def generation_stats():
+    with _stats_lock:
+        stats = dict(_generation_stats)
+    stats['full_seconds'] = round(stats['full_seconds'], 3)
+    stats['repair_seconds'] = round(stats['repair_seconds'], 3)
+    return stats
+
+@metrics.timed('analysis.parse')
+def tool_input(message):
+    """Analysis from a forced tool call, falling back to JSON in a text block"""
+    for block in message.content:
+        if block.type == 'tool_use':
+            return block.input
+    text = ''.join(block.text for block in message.content if block.type == 'text')
+    try:
+        return parse_analysis_response(text)
+    except json.JSONDecodeError as e:
+        raise ProviderError(f"Model returned neither a tool call nor JSON: {e}")
+
+class AnthropicProvider:
+    name = 'anthropic'
+
+    def generate(self, system, messages, schema=analysis_schema.ANALYSIS_SCHEMA, max_tokens=MAX_TOKENS, cancel=None):
+        """cancel: optional threading.Event; the call is streamed so it can be abandoned once set"""
+        request = dict(
+            model=ANALYSIS_MODEL,
+            max_tokens=max_tokens,
+            system=system,
+            messages=messages,
+            tools=[analysis_schema.analysis_tool(schema)],
+            tool_choice={'type': 'tool', 'name': analysis_schema.TOOL_NAME},
+            timeout=60.0
+        )
+        check_cancelled(cancel)
+        if cancel is None:
+            return tool_input(gateway.create_message(**request))
+        with gateway.stream(**request) as stream:
+            for _ in stream:
+                check_cancelled(cancel)
+            message = stream.get_final_message()
+        return tool_input(message)
+
+class OllamaProvider:
+    name = 'ollama'
+
+    def __init__(self, api_url=OLLAMA_API_URL, model=OLLAMA_MODEL, timeout=OLLAMA_TIMEOUT):
+        self.api_url = api_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+
+    def generate(self, system, messages, schema=analysis_schema.ANALYSIS_SCHEMA, max_tokens=MAX_TOKENS, cancel=None):
+        """cancel: optional threading.Event; the reply is streamed so it can be abandoned once set"""
+        check_cancelled(cancel)
+        system_text = '\n\n'.join(block['text'] for block in system)
+        payload = json.dumps({
+            'model': self.model,
+            'messages': [{'role': 'system', 'content': system_text}] + messages,
+            'stream': cancel is not None,
+            'format': schema,
+            'options': {'num_predict': max_tokens}
+        }).encode('utf-8')
+        req = urllib.request.Request(
+            f"{self.api_url}/api/chat",
+            data=payload,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with metrics.stage('llm.ollama'), urllib.request.urlopen(req, timeout=self.timeout) as response:
+                if cancel is None:
+                    content = json.loads(response.read()).get('message', {}).get('content', '')
+                else:
+                    # One JSON object per line; closing the response stops the generation
+                    parts = []
+                    for line in response:
+                        check_cancelled(cancel)
+                        if line.strip():
+                            parts.append(json.loads(line).get('message', {}).get('content', ''))
+                    content = ''.join(parts)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise ProviderError(f"Ollama request failed: {e}")
+        try:
+            with metrics.stage('analysis.parse'):
+                return parse_analysis_response(content)
+        except json.JSONDecodeError as e:
+            raise ProviderError(f"Ollama returned invalid JSON: {e}")
+
+PROVIDERS = {
+    'anthropic': AnthropicProvider(),
+    'ollama': OllamaProvider()
+}
+
+# Each racing job holds one thread per provider; Anthropic calls beyond the gateway's
+# in-flight cap would only wait for a slot, so that side never needs more threads than it
+_race_pools = {
+    'anthropic': ThreadPoolExecutor(max_workers=min(WORKER_COUNT, gateway.max_in_flight),
+                                    thread_name_prefix='llm-race-anthropic'),
+    'ollama': ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix='llm-race-ollama')
+}
+
+def with_note(messages, note):
+    """Append an instruction to the client-data message (the cached system prefix is untouched)"""
+    return messages[:-1] + [{'role': 'user', 'content': messages[-1]['content'] + note}]
+
+def repair_messages(messages, analysis, problems):
+    """Ask for just the broken sections, with the valid ones as context so the report stays consistent"""
+    valid = {name: value for name, value in analysis.items()
+             if name in analysis_schema.SECTION_SCHEMAS and name not in problems}
+    issues = '\n'.join(f"- {error}" for errors in problems.values() for error in errors)
+    return with_note(messages,
+                     f"\n\nSections already written for this client (keep consistent with them):\n"
+                     f"{json.dumps(valid, indent=2)}\n\n"
+                     f"These sections were missing or invalid:\n{issues}\n\n"
+                     f"Generate only these sections: {', '.join(problems)}.")
+
+def iter_fanout(name, system, messages, schemas=analysis_schema.SECTION_SCHEMAS, cancel=None):
+    """
+    Fan-out generation: yields (section, value) as each section's call completes, then
+    the executive summary written over the merged sections. A section whose call fails
+    (the summary included) is left out for repair_analysis to regenerate.
+    """
+    sections = [section for section in analysis_schema.SECTIONS if section != 'executive_summary']
+    merged = {}
+    with ThreadPoolExecutor(max_workers=FANOUT_PARALLELISM, thread_name_prefix='llm-fanout') as pool:
+        futures = {
+            pool.submit(
+                PROVIDERS[name].generate,
+                system,
+                with_note(messages, f"\n\nGenerate only the {section} section."),
+                analysis_schema.sections_schema([section], schemas),
+                SECTION_MAX_TOKENS,
+                cancel
+            ): section
+            for section in sections
+        }
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                result = future.result()
+            except CallCancelled:
+                raise
+            except Exception as e:
+                print(f"Fan-out section {section} failed: {e}")
+                continue
+            if isinstance(result, dict) and section in result:
+                merged[section] = result[section]
+                yield section, result[section]
+
+    try:
+        summary = PROVIDERS[name].generate(
+            system,
+            with_note(messages,
+                      f"\n\nThe full analysis for this client:\n{json.dumps(merged, indent=2)}\n\n"
+                      f"Generate only the executive_summary section, summarizing their biggest opportunity."),
+            analysis_schema.sections_schema(['executive_summary'], schemas),
+            SUMMARY_MAX_TOKENS,
+            cancel
+        )
+    except CallCancelled:
+        raise
+    except Exception as e:
+        print(f"Fan-out executive_summary failed: {e}")
+        return
+    if isinstance(summary, dict) and 'executive_summary' in summary:
+        yield 'executive_summary', summary['executive_summary']
+
+def ordered(analysis):
+    """Sections in report order, as a single-call generation would return them"""
+    return {name: analysis[name] for name in analysis_schema.SECTIONS if name in analysis}
+
+def repair_analysis(name, system, messages, analysis, schemas=analysis_schema.SECTION_SCHEMAS, cancel=None):
+    """
+    Regenerate only the sections that fail validation against schemas. Raises ProviderError when
+    REPAIR_ATTEMPTS passes can't fix them, leaving a full regeneration to the caller.
+    """
+    analysis = dict(analysis) if isinstance(analysis, dict) else {}
+    problems = analysis_schema.section_errors(analysis, schemas)
+    if not problems:
+        record_generation('valid_first_pass')
+        return analysis
+
+    for attempt in range(REPAIR_ATTEMPTS):
+        print(f"Repairing {len(problems)} analysis section(s) from {name}: {', '.join(problems)}")
+        record_generation('partial_repairs')
+        record_generation('sections_repaired', len(problems))
+        started = time.monotonic()
+        try:
+            with metrics.stage('analysis.repair'):
+                patch = PROVIDERS[name].generate(
+                    system,
+                    repair_messages(messages, analysis, problems),
+                    analysis_schema.sections_schema(problems, schemas),
+                    cancel=cancel
+                )
+        finally:
+            record_generation('repair_seconds', time.monotonic() - started)
+        if isinstance(patch, dict):
+            analysis.update({section: patch[section] for section in problems if section in patch})
+        problems = analysis_schema.section_errors(analysis, schemas)
+        if not problems:
+            return analysis
+
+    record_generation('repair_failures')
+    metrics.ERRORS.inc(stage='analysis.repair', type='InvalidAfterRepair')
+    raise ProviderError("Invalid analysis after repair: " + "; ".join(e for errors in problems.values() for e in errors))
+
+def run_provider(name, system, messages, schemas=analysis_schema.SECTION_SCHEMAS, cancel=None):
+    """
+    Generate with one provider and return a validated (and if needed repaired) analysis.
+    schemas is the section set the model fills (BENCHMARKED_SECTION_SCHEMAS when the
+    compensation figures are computed locally). Setting cancel raises CallCancelled.
+    """
+    record_generation('generations')
+    started = time.monotonic()
+    try:
+        if ANALYSIS_MODE == 'fanout':
+            analysis = dict(iter_fanout(name, system, messages, schemas, cancel))
+        else:
+            analysis = PROVIDERS[name].generate(system, messages, analysis_schema.sections_schema(schemas=schemas),
+                                                cancel=cancel)
+    finally:
+        record_generation('full_seconds', time.monotonic() - started)
+    return ordered(repair_analysis(name, system, messages, analysis, schemas, cancel))
+
+def select_provider():
+    """Provider to try first under the configured routing policy"""
+    if ROUTING == 'primary_fallback':
+        return PRIMARY
+    if ROUTING == 'queue_depth':
+        return 'ollama' if gateway.queue_depth() > QUEUE_DEPTH_THRESHOLD else 'anthropic'
+    return 'anthropic'
+
+def _race(system, messages, schemas):
+    cancel = threading.Event()
+    futures = {
+        _race_pools[name].submit(run_provider, name, system, messages, schemas, cancel): name
+        for name in ('anthropic', 'ollama')
+    }
+    errors = []
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result(), futures[future]
+                except Exception as e:
+                    errors.append(f"{futures[future]}: {e}")
+        raise ProviderError("All providers failed - " + "; ".join(errors))
+    finally:
+        # The loser stops at its next streamed chunk (or before its next call) and frees its thread
+        cancel.set()
+
+def generate_analysis(system, messages, schemas=analysis_schema.SECTION_SCHEMAS):
+    """Run the prompt under the routing policy; returns (analysis, provider_name)"""
+    if ROUTING == 'race':
+        return _race(system, messages, schemas)
+
+    first = select_provider()
+    try:
+        return run_provider(first, system, messages, schemas), first
+    except Exception as e:
+        if ROUTING != 'primary_fallback' or FALLBACK == first:
+            raise
+        print(f"LLM provider {first} failed, falling back to {FALLBACK}: {e}")
+        record_generation('full_regenerations')
+        return run_provider(FALLBACK, system, messages, schemas), FALLBACK
@@ -0,0 +1,202 @@
+"""
+Career Flow Diagnostic Tool - Metrics
+Minimal in-process Prometheus instrumentation: counters and histograms with labels,
+a stage() timer for blocks of work, and text exposition for the /metrics endpoint.
+
+Each gunicorn worker keeps its own registry, so scrape every worker (or run one worker
+per container) and aggregate in Prometheus. Child processes of the bulk export pool
+are not counted.
+
+METRICS_PROFILE_RATE (0-1) samples that fraction of requests with cProfile and writes
+.prof files to METRICS_PROFILE_DIR for snakeviz/pstats.
+"""
+
+from contextlib import contextmanager
+import cProfile
+from functools import wraps
+import os
+import random
+import threading
+import time
+
+PROFILE_RATE = float(os.environ.get('METRICS_PROFILE_RATE', 0))
+PROFILE_DIR = os.environ.get('METRICS_PROFILE_DIR', '/tmp/careerflow-profiles')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+_registry = []
+_collectors = []
+
+def counter(name, documentation, labelnames=()):
+    metric = Counter(name, documentation, labelnames)
+    _registry.append(metric)
+    return metric
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+def register_collector(collect):
+    """collect() returns exposition lines computed at scrape time (e.g. gauges read from the DB)"""
+    _collectors.append(collect)
+
+STAGE_SECONDS = histogram('careerflow_stage_seconds', 'Time spent in each processing stage', ['stage'])
+ERRORS = counter('careerflow_errors_total', 'Errors by stage and exception type', ['stage', 'type'])
+HTTP_SECONDS = histogram('careerflow_http_request_seconds', 'HTTP handler latency (excludes streamed bodies)',
+                         ['endpoint', 'method', 'status'])
+LLM_TTFT = histogram('careerflow_llm_time_to_first_token_seconds', 'Time from request to first streamed token',
+                     buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30))
+LLM_TOKENS = counter('careerflow_llm_tokens_total', 'LLM tokens by kind (input, output, cache_read, cache_creation)', ['kind'])
+LLM_RETRIES = counter('careerflow_llm_retries_total', 'LLM calls retried after a rate-limit or overload error')
+
+@contextmanager
+def stage(name):
+    """Time a block as a stage; exceptions are counted by type and re-raised"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.inc(stage=name, type=type(e).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_error(stage_name, error):
+    ERRORS.inc(stage=stage_name, type=type(error).__name__)
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            lines.extend(collect())
+        except Exception as e:
+            ERRORS.inc(stage='metrics.collect', type=type(e).__name__)
+    return '\n'.join(lines) + '\n'
+
+def start_profile():
+    """Returns a running profiler for a sampled fraction of calls, else None"""
+    if PROFILE_RATE <= 0 or random.random() >= PROFILE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def finish_profile(profiler, label):
+    profiler.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+    path = os.path.join(PROFILE_DIR, f"{safe_label}-{int(time.time() * 1000)}-{os.getpid()}.prof")
+    profiler.dump_stats(path)
+    print(f"Profile written to {path}")
+    return path
+
+def init_app(app, collectors=()):
+    """Per-request HTTP timing, sampled profiling, and the /metrics endpoint"""
+    from flask import Response, g, request
+
+    for collect in collectors:
+        register_collector(collect)
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_profiler = start_profile()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None and request.endpoint != 'metrics_endpoint':
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            finish_profile(profiler, f"{request.method}-{request.endpoint or 'unmatched'}")
+        return response
+
+    @app.route('/metrics', methods=['GET'], endpoint='metrics_endpoint')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
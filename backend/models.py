@@ -0,0 +1,340 @@
+"""
+Career Flow Diagnostic Tool - Database Models
+Shared SQLAlchemy instance and table definitions used by the API and background workers
+"""
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.schema import CreateIndex
+from datetime import datetime
+import hashlib
+import json
+import os
+import zlib
+
+db = SQLAlchemy()
+
+# Store new analyses zlib-compressed (a bytea/BLOB column) instead of as JSON/JSONB
+ANALYSIS_COMPRESSION = os.environ.get('ANALYSIS_COMPRESSION', 'false').lower() == 'true'
+
+def skill_list(stored):
+    """
+    Stored technical_skills as a list of strings. Submit keeps whatever JSON the client sent,
+    so a single string is one skill and non-string items are converted.
+    """
+    if not stored:
+        return []
+    try:
+        value = json.loads(stored)
+    except ValueError:
+        value = stored
+    items = value if isinstance(value, list) else [value]
+    return [str(item) for item in items if item is not None]
+
+class Assessment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Compensation Data
+    current_salary = db.Column(db.Integer)
+    years_experience = db.Column(db.Integer)
+    role = db.Column(db.String(100))
+    industry = db.Column(db.String(100))
+    location = db.Column(db.String(100))
+    last_raise_percent = db.Column(db.Float)
+
+    # Free-text answers are only read to build the prompt or an admin view, so they load
+    # together on first access (or with undefer_group('answers'))
+    # Technical Skills (JSON stored as text)
+    technical_skills = db.deferred(db.Column(db.Text), group='answers')
+    certifications = db.deferred(db.Column(db.Text), group='answers')
+    education_level = db.Column(db.String(50))
+
+    # Positioning & Communication
+    role_description = db.deferred(db.Column(db.Text), group='answers')
+    value_articulation = db.deferred(db.Column(db.Text), group='answers')
+    negotiation_experience = db.deferred(db.Column(db.Text), group='answers')
+    visibility_rating = db.Column(db.Integer)  # 1-10 scale
+
+    # Alignment Factors
+    values_clarity = db.Column(db.Integer)  # 1-10 scale
+    purpose_alignment = db.Column(db.Integer)  # 1-10 scale
+    lifestyle_fit = db.Column(db.Integer)  # 1-10 scale
+    energy_level = db.Column(db.Integer)  # 1-10 scale
+
+    # Claude analysis lives in AssessmentAnalysis; use get_analysis() / set_analysis()
+    analysis_record = db.relationship('AssessmentAnalysis', uselist=False, lazy='select')
+    report_generated = db.Column(db.Boolean, default=False)
+    report_sent = db.Column(db.Boolean, default=False)
+
+    # Indexes backing the admin list: keyset order plus its filters
+    __table_args__ = (
+        db.Index('ix_assessment_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_assessment_role_lower', db.func.lower(role)),
+        db.Index('ix_assessment_industry_lower', db.func.lower(industry)),
+        db.Index('ix_assessment_report_sent', 'report_sent'),
+    )
+
+    @property
+    def has_analysis(self):
+        return self.analysis_record is not None
+
+    def get_analysis(self):
+        """The stored analysis dict, or None while it is pending"""
+        record = self.analysis_record
+        return record.analysis if record is not None else None
+
+    def set_analysis(self, analysis):
+        """Store or replace the analysis (the caller commits); returns the AssessmentAnalysis"""
+        if self.analysis_record is None:
+            self.analysis_record = AssessmentAnalysis(assessment_id=self.id)
+        self.analysis_record.store(analysis)
+        return self.analysis_record
+
+    def analysis_input(self):
+        """Rebuild the submitted form data that generate_claude_analysis expects"""
+        return {
+            'email': self.email,
+            'name': self.name,
+            'current_salary': self.current_salary,
+            'years_experience': self.years_experience,
+            'role': self.role,
+            'industry': self.industry,
+            'location': self.location,
+            'last_raise_percent': self.last_raise_percent,
+            'technical_skills': json.loads(self.technical_skills) if self.technical_skills else [],
+            'certifications': self.certifications,
+            'education_level': self.education_level,
+            'role_description': self.role_description,
+            'value_articulation': self.value_articulation,
+            'negotiation_experience': self.negotiation_experience,
+            'visibility_rating': self.visibility_rating,
+            'values_clarity': self.values_clarity,
+            'purpose_alignment': self.purpose_alignment,
+            'lifestyle_fit': self.lifestyle_fit,
+            'energy_level': self.energy_level
+        }
+
+class CompressedJSON(db.TypeDecorator):
+    """JSON document stored zlib-compressed in a binary column"""
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(json.dumps(value).encode('utf-8'))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value))
+
+class AssessmentAnalysis(db.Model):
+    """
+    Claude analysis of one assessment, kept out of the assessment row so status polls and
+    admin queries read narrow rows. The document is JSONB on Postgres (JSON text elsewhere),
+    or compressed when ANALYSIS_COMPRESSION is on; either way it is decoded once per load.
+    """
+    __tablename__ = 'assessment_analysis'
+
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), primary_key=True)
+    # sha256 of the JSON text; keys stored PDF renders without loading the document
+    digest = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # bytes of JSON text, before compression
+    document = db.deferred(db.Column(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')),
+                           group='document')
+    compressed = db.deferred(db.Column(CompressedJSON), group='document')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def analysis(self):
+        return self.compressed if self.compressed is not None else self.document
+
+    def store(self, analysis, text=None):
+        """Set the document; text is the JSON it came from, when the digest must match an older one"""
+        text = json.dumps(analysis) if text is None else text
+        self.digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self.size = len(text)
+        if ANALYSIS_COMPRESSION:
+            self.document, self.compressed = None, analysis
+        else:
+            self.document, self.compressed = analysis, None
+
+class AnalysisJob(db.Model):
+    """Durable queue entry for one background Claude analysis"""
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker_id = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    bypass_cache = db.Column(db.Boolean, nullable=False, default=False)
+    # Workers leave the job alone until this time (gives a streaming client first claim)
+    available_at = db.Column(db.DateTime)
+    # Refreshed while the job runs; the stale sweep only requeues running jobs whose heartbeat stopped
+    heartbeat_at = db.Column(db.DateTime)
+
+class AnalysisCacheEntry(db.Model):
+    """Shared tier of the analysis cache, keyed on a hash of the prompt inputs"""
+    key = db.Column(db.String(64), primary_key=True)
+    model = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.String(20), nullable=False, index=True)
+    result = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class RenderedReport(db.Model):
+    """Stored PDF render of an assessment's analysis"""
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), nullable=False, index=True)
+    analysis_hash = db.Column(db.String(64), nullable=False)
+    template_version = db.Column(db.String(20), nullable=False)
+    etag = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    pdf = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('assessment_id', 'analysis_hash', 'template_version'),
+    )
+
+class BulkExport(db.Model):
+    """Progress and throughput of an admin bulk PDF export"""
+    id = db.Column(db.Integer, primary_key=True)
+    filters = db.Column(db.Text)  # JSON of the request filters
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, completed, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    reused = db.Column(db.Integer, nullable=False, default=0)  # served from stored renders
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    pdfs_per_second = db.Column(db.Float)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class EmailOutbox(db.Model):
+    """Report email waiting to be sent (or already sent) by the outbox sender"""
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), nullable=False, index=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class RateLimitCounter(db.Model):
+    """Fixed-window request counter shared by every worker (bucket is e.g. 'ip:1.2.3.4')"""
+    bucket = db.Column(db.String(200), primary_key=True)
+    window_start = db.Column(db.DateTime, primary_key=True, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class SubmissionKey(db.Model):
+    """Idempotency key of a submission; the primary key makes duplicates collide across workers"""
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the scoped Idempotency-Key or derived content key
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), nullable=False, index=True)
+    source = db.Column(db.String(10), nullable=False)  # header, derived
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class AnalyticsRollup(db.Model):
+    """
+    Assessment totals for one day and cohort, kept current as assessments arrive (analytics.py).
+    dimension is 'all', 'role', 'industry' or 'location'; value is the lowercased cohort ('' for all).
+    """
+    dimension = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    assessments = db.Column(db.Integer, nullable=False, default=0)
+    analyzed = db.Column(db.Integer, nullable=False, default=0)
+    salary_count = db.Column(db.Integer, nullable=False, default=0)
+    salary_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    raise_count = db.Column(db.Integer, nullable=False, default=0)
+    raise_sum = db.Column(db.Float, nullable=False, default=0)
+    values_clarity_count = db.Column(db.Integer, nullable=False, default=0)
+    values_clarity_sum = db.Column(db.Integer, nullable=False, default=0)
+    energy_level_count = db.Column(db.Integer, nullable=False, default=0)
+    energy_level_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class AnalyticsHistogram(db.Model):
+    """Bin counts per day and cohort behind the salary median and the raise distribution"""
+    dimension = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)  # current_salary, last_raise_percent
+    bin = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def migrate_legacy_analyses(batch_size=500, drop_column=False):
+    """
+    Move analyses from the old assessment.analysis_result text column into assessment_analysis,
+    keeping their digests so stored PDF renders stay valid. Copied values are cleared, so
+    re-running is cheap; drop_column removes the old column once it is empty. Returns the count moved.
+    """
+    if 'analysis_result' not in {column['name'] for column in db.inspect(db.engine).get_columns('assessment')}:
+        return 0
+
+    legacy = db.table('assessment', db.column('id'), db.column('analysis_result'))
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            db.select(legacy.c.id, legacy.c.analysis_result)
+            .where(legacy.c.analysis_result.isnot(None))
+            .order_by(legacy.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        ids = [row.id for row in rows]
+        existing = set(db.session.execute(
+            db.select(AssessmentAnalysis.assessment_id).where(AssessmentAnalysis.assessment_id.in_(ids))
+        ).scalars())
+        for assessment_id, text in rows:
+            if assessment_id not in existing:
+                record = AssessmentAnalysis(assessment_id=assessment_id)
+                record.store(json.loads(text), text)
+                db.session.add(record)
+                moved += 1
+        db.session.flush()
+        db.session.execute(db.update(legacy).where(legacy.c.id.in_(ids)).values(analysis_result=None))
+        db.session.commit()
+
+    if drop_column:
+        db.session.execute(db.text('ALTER TABLE assessment DROP COLUMN analysis_result'))
+        db.session.commit()
+    return moved
+
+def ensure_columns():
+    """
+    Add declared nullable columns missing from existing tables (create_all only creates whole tables)
+    """
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=connection.dialect)
+                    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def ensure_indexes():
+    """
+    Create any declared indexes missing from existing tables (create_all only adds them to new tables)
+    """
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
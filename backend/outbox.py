@@ -0,0 +1,342 @@
+"""
+Career Flow Diagnostic Tool - Email Outbox
+Report emails are written to the email_outbox table and delivered by sender threads that
+each keep one authenticated SMTP connection open across many messages.
+
+- Concurrency is bounded by SMTP_MAX_CONNECTIONS sender threads per process
+- Failed sends retry with exponential backoff and jitter up to SMTP_MAX_ATTEMPTS
+- Assessment.report_sent is set in the same commit that marks the message sent
+
+For local testing point SMTP_SERVER/SMTP_PORT at a stand-in server (e.g. aiosmtpd)
+and set SMTP_USE_TLS=false; login is skipped when SENDER_PASSWORD is empty.
+"""
+
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+import random
+import smtplib
+import socket
+import threading
+import time
+import traceback
+
+from models import db, Assessment, EmailOutbox
+import metrics
+import reports
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Email configuration (use environment variables in production)
+SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
+SENDER_PASSWORD = os.environ.get('SENDER_PASSWORD')
+
+MAX_CONNECTIONS = int(os.environ.get('SMTP_MAX_CONNECTIONS', 2))
+MAX_ATTEMPTS = int(os.environ.get('SMTP_MAX_ATTEMPTS', 6))
+BACKOFF_BASE = float(os.environ.get('SMTP_BACKOFF_BASE', 30))  # seconds before the first retry
+BACKOFF_MAX = float(os.environ.get('SMTP_BACKOFF_MAX', 3600))
+POLL_INTERVAL = float(os.environ.get('SMTP_POLL_INTERVAL', 5))
+# Idle connections are checked with NOOP before reuse, and closed after this long
+IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', 60))
+# Messages stuck in 'sending' longer than this are assumed orphaned
+SEND_TIMEOUT = int(os.environ.get('SMTP_SEND_TIMEOUT', 300))
+
+_wakeup = threading.Event()
+_senders = []
+_senders_lock = threading.Lock()
+
+def is_configured():
+    return bool(SENDER_EMAIL) and (bool(SENDER_PASSWORD) or not SMTP_USE_TLS)
+
+def queue_report_email(assessment):
+    """
+    Add the report email for an assessment to the current session (caller commits).
+    Returns None if one is already pending for the assessment.
+    """
+    existing = EmailOutbox.query.filter(
+        EmailOutbox.assessment_id == assessment.id,
+        EmailOutbox.status.in_([PENDING, SENDING])
+    ).first()
+    if existing is not None:
+        return None
+
+    message = EmailOutbox(assessment_id=assessment.id, recipient=assessment.email, status=PENDING)
+    db.session.add(message)
+    return message
+
+def notify_senders():
+    _wakeup.set()
+
+def build_report_message(assessment, pdf_bytes, sender_email):
+    """
+    MIME message carrying the PDF report
+    """
+    # Imported here so processes that never send mail don't load the MIME machinery
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.base import MIMEBase
+    from email import encoders
+
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = assessment.email
+    msg['Subject'] = f"Your Career Flow Diagnostic Report - {assessment.name}"
+
+    body = f"""Hi {assessment.name},
+
+Thank you for completing the Career Flow Diagnostic assessment!
+
+Your personalized report is attached. This analysis identifies specific opportunities to increase your compensation by 10-30% through strategic positioning.
+
+Key highlights from your assessment:
+• Compensation gap analysis with market benchmarking
+• Top 3 leverage points for fastest impact
+• Specific positioning improvements
+• Your customized 90-day roadmap
+
+Ready to discuss how to implement these strategies? Schedule your strategy call:
+
+https://calendly.com/drcraigmiller-careerflowframework/strategy-call
+
+During this call, we'll discuss how to implement the strategies outlined in your report and create a personalized plan to increase your compensation.
+
+Best regards,
+Craig
+Career Flow Framework
+"""
+
+    msg.attach(MIMEText(body, 'plain'))
+
+    # Attach PDF
+    part = MIMEBase('application', 'octet-stream')
+    part.set_payload(pdf_bytes)
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', f'attachment; filename=Career_Flow_Report_{assessment.name.replace(" ", "_")}.pdf')
+    msg.attach(part)
+    return msg
+
+class SMTPConnection:
+    """
+    One SMTP session reused across messages: connect, STARTTLS and login happen once,
+    not per email. Reconnects transparently when the server has dropped the session.
+    """
+
+    def __init__(self, server=SMTP_SERVER, port=SMTP_PORT, use_tls=SMTP_USE_TLS,
+                 username=SENDER_EMAIL, password=SENDER_PASSWORD, timeout=SMTP_TIMEOUT):
+        self.server = server
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.smtp = None
+        self.last_used = 0.0
+        self.connections_opened = 0
+
+    @metrics.timed('email.connect')
+    def _connect(self):
+        self.smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.use_tls:
+            self.smtp.starttls()
+        if self.password:
+            self.smtp.login(self.username, self.password)
+        self.connections_opened += 1
+
+    def _alive(self):
+        if self.smtp is None:
+            return False
+        if time.monotonic() - self.last_used < 5:
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @metrics.timed('email.send')
+    def send(self, msg):
+        if not self._alive():
+            self.close()
+            self._connect()
+        try:
+            self.smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed an idle session between our check and the send - retry once on a fresh one
+            self.close()
+            self._connect()
+            self.smtp.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.smtp is not None and time.monotonic() - self.last_used > IDLE_TIMEOUT:
+            self.close()
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.smtp = None
+
+def send_report_email(assessment, pdf_buffer):
+    """
+    Send PDF report via email immediately on a one-off connection.
+    Prefer queue_report_email, which retries and reuses connections.
+    """
+    if not is_configured():
+        print("Email credentials not configured")
+        return False
+
+    connection = SMTPConnection()
+    try:
+        connection.send(build_report_message(assessment, pdf_buffer.read(), SENDER_EMAIL))
+        return True
+    except Exception as e:
+        print(f"Email send failed: {e}")
+        return False
+    finally:
+        connection.close()
+
+def backoff_delay(attempts):
+    """Exponential backoff with +/-50% jitter so retries from many messages spread out"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.5)
+
+def is_permanent_failure(error):
+    """5xx replies (bad mailbox, rejected content) won't succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600 and not isinstance(error, smtplib.SMTPAuthenticationError)
+    return False
+
+def claim_next_message(sender_id):
+    """Atomically claim the oldest due message, or return None"""
+    now = datetime.utcnow()
+    candidate_ids = db.session.execute(
+        db.select(EmailOutbox.id)
+        .where(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(5)
+    ).scalars().all()
+
+    for message_id in candidate_ids:
+        result = db.session.execute(
+            db.update(EmailOutbox)
+            .where(EmailOutbox.id == message_id, EmailOutbox.status == PENDING)
+            .values(status=SENDING, locked_by=sender_id, locked_at=now, attempts=EmailOutbox.attempts + 1)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(EmailOutbox, message_id)
+    return None
+
+def requeue_stale_messages():
+    cutoff = datetime.utcnow() - timedelta(seconds=SEND_TIMEOUT)
+    db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.status == SENDING, EmailOutbox.locked_at < cutoff)
+        .values(status=PENDING, locked_by=None, next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+def deliver(message, connection):
+    """Send one claimed message and record the outcome"""
+    assessment = db.session.get(Assessment, message.assessment_id)
+    try:
+        if assessment is None:
+            raise ValueError(f"Assessment {message.assessment_id} no longer exists")
+        if not assessment.has_analysis:
+            raise ValueError("Assessment has no analysis to send")
+
+        report = reports.get_or_render(assessment, assessment.analysis_record)
+        connection.send(build_report_message(assessment, report.pdf, SENDER_EMAIL))
+    except Exception as e:
+        db.session.rollback()
+        metrics.record_error('email.deliver', e)
+        connection.close()
+        if message.attempts >= MAX_ATTEMPTS or is_permanent_failure(e):
+            message.status = FAILED
+            print(f"Report email {message.id} to {message.recipient} failed permanently: {e}")
+        else:
+            message.status = PENDING
+            message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay(message.attempts))
+            print(f"Report email {message.id} failed (attempt {message.attempts}), retrying at {message.next_attempt_at}: {e}")
+        message.locked_by = None
+        message.last_error = str(e)
+        db.session.commit()
+        return False
+
+    message.status = SENT
+    message.sent_at = datetime.utcnow()
+    message.locked_by = None
+    message.last_error = None
+    assessment.report_sent = True
+    db.session.commit()
+    return True
+
+def _sender_loop(app, sender_id, stop_event):
+    connection = SMTPConnection()
+    while not stop_event.is_set():
+        message = None
+        with app.app_context():
+            try:
+                requeue_stale_messages()
+                message = claim_next_message(sender_id)
+                if message is not None:
+                    deliver(message, connection)
+            except Exception:
+                db.session.rollback()
+                print(f"Sender {sender_id} error: {traceback.format_exc()}")
+            finally:
+                db.session.remove()
+
+        if message is None:
+            connection.close_if_idle()
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+    connection.close()
+
+def start_senders(app, count=None):
+    """
+    Start the outbox sender threads (idempotent per process); each holds one SMTP connection
+    """
+    with _senders_lock:
+        if _senders:
+            return _senders[0][1]
+        if multiprocessing.parent_process() is not None:
+            return threading.Event()
+        if not is_configured():
+            print("Email credentials not configured - outbox sender not started")
+            return threading.Event()
+
+        count = MAX_CONNECTIONS if count is None else count
+        stop_event = threading.Event()
+        host = socket.gethostname()
+        for i in range(count):
+            sender_id = f"{host}:{os.getpid()}:smtp{i}"
+            thread = threading.Thread(
+                target=_sender_loop,
+                args=(app, sender_id, stop_event),
+                name=f"outbox-sender-{i}",
+                daemon=True
+            )
+            thread.start()
+            _senders.append((thread, stop_event))
+
+        print(f"Started {count} outbox sender(s) in process {os.getpid()}")
+        return stop_event
+
+def outbox_stats():
+    counts = dict(db.session.execute(
+        db.select(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status)
+    ).all())
+    return {status: counts.get(status, 0) for status in (PENDING, SENDING, SENT, FAILED)}
@@ -0,0 +1,118 @@
+"""
+Career Flow Diagnostic Tool - Analysis Prompt
+Versioned prompt template. The persona, Career Flow Framework guidance and JSON structure
+are a static system block marked for Anthropic prompt caching; only the client data
+goes in the per-request user message.
+
+Anything that varies per assessment must stay out of SYSTEM_PROMPT, or the cached prefix
+stops matching. Anthropic only caches prefixes above a model minimum (1024 tokens for
+Sonnet); below that the request still works and usage simply reports no cache tokens.
+Bump PROMPT_VERSION on any change here - it is part of the analysis cache key.
+tests/test_prompts.py checks the cacheable prefix is byte-stable across assessments.
+"""
+
+
+PROMPT_VERSION = "4"
+
+SYSTEM_PROMPT = """You are an expert STEM career strategist with a PhD in Bioengineering and experience leading utility operations. You analyze career diagnostic assessments for clients who want to increase their compensation by 10-30% through strategic positioning.
+
+Each request contains one client's CLIENT DATA, TECHNICAL PROFILE, POSITIONING & COMMUNICATION and ALIGNMENT FACTORS. Generate a comprehensive analysis following the Career Flow Framework and record it with the record_analysis tool (or as a JSON object when no tool is offered), using these sections:
+
+{
+  "executive_summary": "2-3 sentence overview of their biggest opportunity",
+  "compensation_gap": {
+    "market_salary_range": "Estimated market range for their experience/role",
+    "gap_percentage": "Estimated % below market",
+    "annual_opportunity": "Dollar amount leaving on table",
+    "key_insight": "Why this gap exists"
+  },
+  "leverage_points": [
+    {
+      "area": "Highest leverage area (technical/positioning/alignment)",
+      "current_state": "What's happening now",
+      "impact": "Why this matters for compensation",
+      "quick_win": "Specific action they can take this week"
+    },
+    // 2 more leverage points
+  ],
+  "positioning_diagnosis": {
+    "language_gaps": "How their self-description undersells them",
+    "visibility_issues": "Problems with how work is perceived",
+    "narrative_coherence": "Strength of their career story",
+    "specific_fixes": ["3-4 concrete positioning changes"]
+  },
+  "alignment_assessment": {
+    "values_insight": "What their scores reveal about purpose/values",
+    "energy_pattern": "Connection between alignment and engagement",
+    "strategic_implication": "How alignment affects negotiation leverage"
+  },
+  "ninety_day_roadmap": [
+    {
+      "week_range": "Weeks 1-4",
+      "focus": "Primary objective",
+      "actions": ["Specific action 1", "Specific action 2", "Specific action 3"],
+      "success_metric": "How to know it's working"
+    },
+    // 2 more phases (weeks 5-8, weeks 9-12)
+  ],
+  "next_step": "Clear call to action for working together"
+}
+
+When the client data includes a COMPENSATION BENCHMARK, the market range, gap and annual opportunity have already been computed from comparable profiles and are added to the report as given: for compensation_gap write only key_insight, explaining why that gap exists, and use those figures wherever the analysis cites numbers.
+
+Be direct about gaps - they've completed this assessment because they know something's wrong. Use your PhD + utility leadership credibility. Tie every recommendation to compensation impact. Use Career Flow Framework language (alignment, positioning, strategic value). When asked to regenerate specific sections, return only those sections."""
+
+def system_blocks():
+    """Static system prompt as a cacheable content block"""
+    return [{
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"}
+    }]
+
+def render_client_data(assessment_data):
+    """
+    Per-assessment user message
+    """
+    return f"""CLIENT DATA:
+Name: {assessment_data['name']}
+Current Role: {assessment_data['role']}
+Industry: {assessment_data['industry']}
+Location: {assessment_data['location']}
+Current Salary: ${int(assessment_data['current_salary']):,}
+Years Experience: {int(assessment_data['years_experience'])}
+Last Raise: {float(assessment_data['last_raise_percent'])}%
+
+TECHNICAL PROFILE:
+Skills: {assessment_data['technical_skills']}
+Certifications: {assessment_data['certifications']}
+Education: {assessment_data['education_level']}
+
+POSITIONING & COMMUNICATION:
+How they describe their role: "{assessment_data['role_description']}"
+How they articulate value: "{assessment_data['value_articulation']}"
+Negotiation experience: "{assessment_data['negotiation_experience']}"
+Work visibility (1-10): {assessment_data['visibility_rating']}
+
+ALIGNMENT FACTORS:
+Values clarity (1-10): {assessment_data['values_clarity']}
+Purpose alignment (1-10): {assessment_data['purpose_alignment']}
+Lifestyle fit (1-10): {assessment_data['lifestyle_fit']}
+Energy level (1-10): {assessment_data['energy_level']}
+{render_benchmark(assessment_data.get('compensation_gap'))}
+Generate this client's Career Flow analysis."""
+
+def render_benchmark(gap):
+    """The locally computed compensation figures (compensation_index.py), when there are any"""
+    if not gap:
+        return ''
+    return f"""
+COMPENSATION BENCHMARK:
+Market range: {gap['market_salary_range']}
+Gap: {gap['gap_percentage']}
+Annual opportunity: {gap['annual_opportunity']}
+"""
+
+def build_request(assessment_data):
+    """Returns (system, messages) for messages.create / messages.stream"""
+    return system_blocks(), [{"role": "user", "content": render_client_data(assessment_data)}]
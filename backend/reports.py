@@ -0,0 +1,184 @@
+"""
+Career Flow Diagnostic Tool - PDF Reports
+Renders the analysis PDF and keeps rendered copies in the database so repeat downloads
+are served from stored bytes (with ETag / Last-Modified) instead of re-running reportlab.
+reportlab is imported on first render, not at startup.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RenderedReport
+import metrics
+
+# Bump whenever generate_pdf_report's layout or wording changes so stored PDFs are re-rendered
+TEMPLATE_VERSION = "1"
+
+@lru_cache(maxsize=1)
+def get_report_styles():
+    """
+    Paragraph styles for the report, built once per process
+    """
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor='#1a1a1a',
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor='#2c3e50',
+        spaceAfter=12,
+        spaceBefore=20
+    )
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['BodyText'],
+        fontSize=11,
+        leading=16,
+        textColor='#333333'
+    )
+    return title_style, heading_style, body_style
+
+@metrics.timed('pdf.render')
+def generate_pdf_report(assessment, analysis):
+    """
+    Generate professional PDF report from analysis
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    story = []
+    
+    title_style, heading_style, body_style = get_report_styles()
+
+    # Title Page
+    story.append(Paragraph("Career Flow Diagnostic Report", title_style))
+    story.append(Paragraph(f"Prepared for: {assessment.name}", body_style))
+    story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", body_style))
+    story.append(Spacer(1, 0.5*inch))
+    
+    # Sections are read with .get so an incomplete analysis renders what it has instead of raising KeyError
+    # Executive Summary
+    story.append(Paragraph("Executive Summary", heading_style))
+    story.append(Paragraph(analysis.get('executive_summary', ''), body_style))
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Compensation Gap Analysis
+    story.append(Paragraph("Compensation Gap Analysis", heading_style))
+    comp_gap = analysis.get('compensation_gap') or {}
+    story.append(Paragraph(f"<b>Market Range:</b> {comp_gap.get('market_salary_range', '')}", body_style))
+    story.append(Paragraph(f"<b>Gap:</b> {comp_gap.get('gap_percentage', '')}", body_style))
+    story.append(Paragraph(f"<b>Annual Opportunity:</b> {comp_gap.get('annual_opportunity', '')}", body_style))
+    story.append(Paragraph(f"<b>Key Insight:</b> {comp_gap.get('key_insight', '')}", body_style))
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Leverage Points
+    story.append(Paragraph("Top 3 Leverage Points for Fastest Impact", heading_style))
+    for i, point in enumerate(analysis.get('leverage_points') or [], 1):
+        story.append(Paragraph(f"<b>{i}. {point.get('area', '')}</b>", body_style))
+        story.append(Paragraph(f"Current State: {point.get('current_state', '')}", body_style))
+        story.append(Paragraph(f"Impact: {point.get('impact', '')}", body_style))
+        story.append(Paragraph(f"Quick Win: {point.get('quick_win', '')}", body_style))
+        story.append(Spacer(1, 0.2*inch))
+    
+    # Positioning Diagnosis
+    story.append(PageBreak())
+    story.append(Paragraph("Positioning Diagnosis", heading_style))
+    pos = analysis.get('positioning_diagnosis') or {}
+    story.append(Paragraph(f"<b>Language Gaps:</b> {pos.get('language_gaps', '')}", body_style))
+    story.append(Spacer(1, 0.1*inch))
+    story.append(Paragraph(f"<b>Visibility Issues:</b> {pos.get('visibility_issues', '')}", body_style))
+    story.append(Spacer(1, 0.1*inch))
+    story.append(Paragraph(f"<b>Narrative Coherence:</b> {pos.get('narrative_coherence', '')}", body_style))
+    story.append(Spacer(1, 0.1*inch))
+    story.append(Paragraph("<b>Specific Fixes:</b>", body_style))
+    for fix in pos.get('specific_fixes') or []:
+        story.append(Paragraph(f"• {fix}", body_style))
+    story.append(Spacer(1, 0.3*inch))
+    
+    # 90-Day Roadmap
+    story.append(Paragraph("Your 90-Day Roadmap", heading_style))
+    for phase in analysis.get('ninety_day_roadmap') or []:
+        story.append(Paragraph(f"<b>{phase.get('week_range', '')}: {phase.get('focus', '')}</b>", body_style))
+        story.append(Paragraph("Actions:", body_style))
+        for action in phase.get('actions') or []:
+            story.append(Paragraph(f"• {action}", body_style))
+        story.append(Paragraph(f"<b>Success Metric:</b> {phase.get('success_metric', '')}", body_style))
+        story.append(Spacer(1, 0.2*inch))
+    
+    # Next Steps
+    story.append(Spacer(1, 0.3*inch))
+    story.append(Paragraph("Next Step", heading_style))
+    story.append(Paragraph(analysis.get('next_step', ''), body_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Schedule a Strategy Call
+    calendly_link = "https://calendly.com/drcraigmiller-careerflowframework/strategy-call"
+    story.append(Paragraph("<b>Ready to Take Action?</b>", heading_style))
+    story.append(Paragraph(f"Schedule your strategy call:", body_style))
+    story.append(Paragraph(calendly_link, body_style))
+    story.append(Spacer(1, 0.2*inch))
+    story.append(Paragraph("During this call, we'll discuss how to implement the strategies outlined in this report and create a personalized plan to increase your compensation.", body_style))
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+def make_etag(assessment_id, digest):
+    """Strong validator for a stored PDF: changes with the analysis or the template"""
+    return f"{assessment_id}-{digest[:32]}-t{TEMPLATE_VERSION}"
+
+def find_stored_report(assessment_id, digest):
+    """Stored render for this analysis and template version (PDF bytes are loaded lazily)"""
+    return RenderedReport.query.filter_by(
+        assessment_id=assessment_id,
+        analysis_hash=digest,
+        template_version=TEMPLATE_VERSION
+    ).first()
+
+def render_and_store(assessment, analysis, digest):
+    """
+    Render the PDF and replace any earlier stored renders for the assessment
+    """
+    pdf_bytes = generate_pdf_report(assessment, analysis).getvalue()
+
+    RenderedReport.query.filter_by(assessment_id=assessment.id).delete()
+    report = RenderedReport(
+        assessment_id=assessment.id,
+        analysis_hash=digest,
+        template_version=TEMPLATE_VERSION,
+        etag=make_etag(assessment.id, digest),
+        size=len(pdf_bytes),
+        pdf=pdf_bytes
+    )
+    db.session.add(report)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent download or the pre-render stored the same render first - serve that one
+        db.session.rollback()
+        return find_stored_report(assessment.id, digest)
+    return report
+
+def get_or_render(assessment, record):
+    """Stored render for the assessment's AssessmentAnalysis; the document is only loaded to render"""
+    report = find_stored_report(assessment.id, record.digest)
+    if report is None:
+        report = render_and_store(assessment, record.analysis, record.digest)
+    return report
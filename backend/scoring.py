@@ -0,0 +1,180 @@
+"""
+Career Flow Diagnostic Tool - Preliminary Scoring
+Rule-based provisional diagnosis from the numeric answers (the five 1-10 ratings, salary,
+experience and last raise, with the compensation index's market median as the expected salary
+when there is one). It is returned with the submission and with status polls, so
+users get a first read in milliseconds; the Claude analysis replaces it once it completes.
+Scoring works on a numpy matrix with one row per assessment, so the same code scores a
+single submission or the whole table for the admin breakdown. numpy loads on first use.
+"""
+
+from collections import defaultdict
+import math
+import os
+
+from models import db, Assessment
+import analytics
+import compensation_index
+
+SCORING_VERSION = '2'
+
+INPUTS = [
+    'visibility_rating', 'values_clarity', 'purpose_alignment', 'lifestyle_fit', 'energy_level',
+    'current_salary', 'years_experience', 'last_raise_percent'
+]
+# Cohort fields for the market benchmark; input_matrix appends its median as column EXPECTED
+COHORT_FIELDS = ['role', 'industry', 'location']
+EXPECTED = len(INPUTS)
+# Alignment factor -> rating column (columns 1-4 of INPUTS)
+ALIGNMENT_FACTORS = {
+    'values': 'values_clarity',
+    'purpose': 'purpose_alignment',
+    'lifestyle': 'lifestyle_fit',
+    'energy': 'energy_level'
+}
+LEVERAGE_AREAS = ['compensation', 'positioning', 'alignment']
+PROFILES = ['misaligned', 'drifting', 'aligned']
+# Alignment score (0-100) at which a profile becomes drifting / aligned
+DRIFTING_AT, ALIGNED_AT = 45, 70
+
+# Compensation heuristics: the raise that keeps pace, and the expected salary for rows the
+# compensation index has no benchmark for: base + per_year * years (capped at 25 years)
+BENCHMARK_RAISE = float(os.environ.get('SCORING_BENCHMARK_RAISE', 4.0))
+BASE_SALARY = float(os.environ.get('SCORING_BASE_SALARY', 60000))
+SALARY_PER_YEAR = float(os.environ.get('SCORING_SALARY_PER_YEAR', 4000))
+
+def _number(value):
+    """Answers can arrive as strings (or empty); anything unparseable is missing"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def expected_salaries(rows, get):
+    """
+    Market median salary per row from the compensation index (NaN without a benchmark). Rows
+    that carry an email leave that person out of their benchmark, as the report does.
+    """
+    index = compensation_index.current()
+    if index is None:
+        return [math.nan] * len(rows)
+    medians, seen = [], {}
+    for row in rows:
+        cohort = tuple(get(row, field) for field in COHORT_FIELDS + ['years_experience'])
+        email = get(row, 'email')
+        if email and index.member(email) is not None:
+            # An indexed person's sample excludes them, so it isn't shared with the cohort
+            benchmark = index.benchmark(*cohort, email=email)
+            medians.append(benchmark['p50'] if benchmark else math.nan)
+            continue
+        if cohort not in seen:
+            benchmark = index.benchmark(*cohort)
+            seen[cohort] = benchmark['p50'] if benchmark else math.nan
+        medians.append(seen[cohort])
+    return medians
+
+def input_matrix(rows):
+    """
+    (n, len(INPUTS) + 1) float matrix from assessments, rows or dicts: the INPUTS columns, then
+    the market median (column EXPECTED). Missing values are NaN.
+    """
+    import numpy as np
+    if rows and isinstance(rows[0], dict):
+        get = lambda row, field: row.get(field)
+    else:
+        get = lambda row, field: getattr(row, field, None)
+    values = np.array([[_number(get(row, field)) for field in INPUTS] for row in rows], dtype=float).reshape(-1, len(INPUTS))
+    return np.column_stack([values, np.array(expected_salaries(rows, get), dtype=float)])
+
+def score_matrix(values):
+    """
+    Score every row of an input matrix at once. Returns arrays:
+    factors (n, 4) and alignment (n,) on 0-100, leverage (n, 3) on 0-100 in LEVERAGE_AREAS order,
+    ranking (n, 3) area indexes strongest first, profile (n,) index into PROFILES.
+    Missing ratings count as the midpoint; missing salary or raise add no compensation leverage.
+    Salaries are compared with the market median where there is one, else the heuristic.
+    """
+    import numpy as np
+    ratings = (np.clip(np.nan_to_num(values[:, :5], nan=5.5), 1, 10) - 1) / 9 * 100
+    factors = ratings[:, 1:5]
+    alignment = factors.mean(axis=1)
+
+    salary, years, last_raise = values[:, 5], values[:, 6], values[:, 7]
+    heuristic = BASE_SALARY + SALARY_PER_YEAR * np.clip(np.nan_to_num(years), 0, 25)
+    expected = np.where(np.isnan(values[:, EXPECTED]), heuristic, values[:, EXPECTED])
+    # A salary half the expected one, or no raise at all, saturates its half of the score
+    salary_gap = np.nan_to_num(np.clip((expected - salary) / expected * 2, 0, 1))
+    raise_gap = np.nan_to_num(np.clip((BENCHMARK_RAISE - last_raise) / BENCHMARK_RAISE, 0, 1))
+
+    leverage = np.column_stack([50 * salary_gap + 50 * raise_gap, 100 - ratings[:, 0], 100 - alignment])
+    return {
+        'factors': factors,
+        'alignment': alignment,
+        'leverage': leverage,
+        'ranking': np.argsort(-leverage, axis=1, kind='stable'),
+        'profile': (alignment >= DRIFTING_AT).astype(int) + (alignment >= ALIGNED_AT).astype(int)
+    }
+
+def _result(scores, i):
+    factors = scores['factors'][i]
+    return {
+        'provisional': True,
+        'scoring_version': SCORING_VERSION,
+        'alignment_profile': {
+            'score': round(float(scores['alignment'][i])),
+            'label': PROFILES[scores['profile'][i]],
+            'factors': {name: round(float(value)) for name, value in zip(ALIGNMENT_FACTORS, factors)},
+            'weakest': list(ALIGNMENT_FACTORS)[int(factors.argmin())]
+        },
+        'leverage_ranking': [
+            {'area': LEVERAGE_AREAS[area], 'score': round(float(scores['leverage'][i][area]))}
+            for area in scores['ranking'][i]
+        ]
+    }
+
+def preliminary(assessment):
+    """Provisional diagnosis for one assessment (or answers dict)"""
+    return _result(score_matrix(input_matrix([assessment])), 0)
+
+def score_table(conditions=(), group_by='all', batch_size=1000):
+    """
+    Score every matching assessment, batch_size rows per matrix, and summarize per cohort of
+    group_by (one of analytics.DIMENSIONS): profile counts, top leverage area counts and averages.
+    Each row is scored as preliminary() scores it for the user.
+    """
+    import numpy as np
+    cohort_column = getattr(Assessment, group_by) if group_by != 'all' else db.literal('')
+    query = (db.select(cohort_column.label('cohort'),
+                       *[getattr(Assessment, field) for field in INPUTS + COHORT_FIELDS + ['email']])
+             .where(*conditions)
+             .execution_options(yield_per=batch_size))
+
+    totals = defaultdict(lambda: {
+        'assessments': 0, 'alignment': 0.0, 'leverage': np.zeros(len(LEVERAGE_AREAS)),
+        'profiles': np.zeros(len(PROFILES), dtype=int), 'top': np.zeros(len(LEVERAGE_AREAS), dtype=int)
+    })
+    for rows in db.session.execute(query).partitions():
+        scores = score_matrix(input_matrix(rows))
+        cohorts, inverse = np.unique([analytics.cohort_value(row.cohort) for row in rows], return_inverse=True)
+        for index, cohort in enumerate(cohorts):
+            members = inverse == index
+            group = totals[str(cohort)]
+            group['assessments'] += int(members.sum())
+            group['alignment'] += float(scores['alignment'][members].sum())
+            group['leverage'] += scores['leverage'][members].sum(axis=0)
+            group['profiles'] += np.bincount(scores['profile'][members], minlength=len(PROFILES))
+            group['top'] += np.bincount(scores['ranking'][members, 0], minlength=len(LEVERAGE_AREAS))
+
+    results = []
+    for cohort, group in totals.items():
+        count = group['assessments']
+        results.append({
+            'cohort': cohort if group_by != 'all' else None,
+            'assessments': count,
+            'avg_alignment': round(group['alignment'] / count, 1),
+            'profiles': dict(zip(PROFILES, group['profiles'].tolist())),
+            'top_leverage': dict(zip(LEVERAGE_AREAS, group['top'].tolist())),
+            'avg_leverage': {area: round(float(value) / count, 1) for area, value in zip(LEVERAGE_AREAS, group['leverage'])}
+        })
+    results.sort(key=lambda result: (-result['assessments'], result['cohort'] or ''))
+    return results
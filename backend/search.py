@@ -0,0 +1,265 @@
+"""
+Career Flow Diagnostic Tool - Full-Text Search
+Indexes what people wrote (role description, value articulation, negotiation experience,
+technical skills) and the text of their analysis, for the admin search endpoint.
+Postgres keeps a weighted tsvector with a GIN index; SQLite uses an FTS5 table; other
+databases fall back to LIKE over the same table. Rows are written in the transaction that
+inserts the assessment or stores its analysis, so search never lags behind the data.
+"""
+
+import html
+import re
+
+from models import db, Assessment, AssessmentAnalysis, skill_list
+
+TABLE = 'assessment_search'
+# Postgres text search configuration (stemming and stop words)
+LANGUAGE = 'english'
+# Highlight markers; private-use characters so user text cannot contain them, swapped for <mark> after escaping
+START, STOP = '\ue000', '\ue001'
+SNIPPET_WORDS = 16
+
+ANSWER_FIELDS = ['role_description', 'value_articulation', 'negotiation_experience']
+
+def _dialect():
+    return db.engine.dialect.name
+
+def _key():
+    """The index column holding the assessment id (FTS5 tables key on rowid)"""
+    return 'rowid' if _dialect() == 'sqlite' else 'assessment_id'
+
+def ensure_index():
+    """Create the search table and its index if missing"""
+    dialect = _dialect()
+    with db.engine.begin() as connection:
+        if dialect == 'sqlite':
+            # rowid is the assessment id
+            connection.execute(db.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(answers, analysis, tokenize='porter unicode61')"
+            ))
+        elif dialect == 'postgresql':
+            connection.execute(db.text(f"""
+                CREATE TABLE IF NOT EXISTS {TABLE} (
+                    assessment_id INTEGER PRIMARY KEY REFERENCES assessment (id) ON DELETE CASCADE,
+                    answers TEXT NOT NULL DEFAULT '',
+                    analysis TEXT NOT NULL DEFAULT '',
+                    document TSVECTOR GENERATED ALWAYS AS (
+                        setweight(to_tsvector('{LANGUAGE}', answers), 'A') ||
+                        setweight(to_tsvector('{LANGUAGE}', analysis), 'B')
+                    ) STORED
+                )
+            """))
+            connection.execute(db.text(
+                f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_document ON {TABLE} USING GIN (document)"
+            ))
+        else:
+            connection.execute(db.text(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} (assessment_id INTEGER PRIMARY KEY, answers TEXT, analysis TEXT)"
+            ))
+
+def answers_text(assessment):
+    """The free-text answers as one document, skills last"""
+    parts = [getattr(assessment, field) or '' for field in ANSWER_FIELDS]
+    parts.append(', '.join(skill_list(assessment.technical_skills)))
+    return '\n'.join(part for part in parts if part)
+
+def analysis_text(analysis):
+    """Every string in the analysis, without the keys; failed analyses index nothing"""
+    if not analysis or 'error' in analysis:
+        return ''
+    strings = []
+    def walk(value):
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+    walk(analysis)
+    return '\n'.join(strings)
+
+def _write(rows):
+    """Replace the index rows for these {'id', 'answers', 'analysis'} dicts"""
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        db.session.execute(db.text(
+            f"INSERT INTO {TABLE} (assessment_id, answers, analysis) VALUES (:id, :answers, :analysis) "
+            f"ON CONFLICT (assessment_id) DO UPDATE SET answers = excluded.answers, analysis = excluded.analysis"
+        ), rows)
+        return
+    db.session.execute(db.text(f"DELETE FROM {TABLE} WHERE {_key()} = :id"), rows)
+    db.session.execute(db.text(
+        f"INSERT INTO {TABLE} ({_key()}, answers, analysis) VALUES (:id, :answers, :analysis)"
+    ), rows)
+
+def index_assessment(assessment):
+    """Index a new (flushed) assessment's answers; the caller commits"""
+    _write([{'id': assessment.id, 'answers': answers_text(assessment), 'analysis': ''}])
+
+def index_analysis(assessment, analysis):
+    """Refresh the analysis text of an indexed assessment; the caller commits"""
+    updated = db.session.execute(db.text(f"UPDATE {TABLE} SET analysis = :analysis WHERE {_key()} = :id"),
+                                 {'id': assessment.id, 'analysis': analysis_text(analysis)}).rowcount
+    if not updated:
+        # Submitted before the index existed and not yet backfilled
+        _write([{'id': assessment.id, 'answers': answers_text(assessment), 'analysis': analysis_text(analysis)}])
+
+def rebuild(batch_size=500):
+    """Re-index every assessment, batch_size at a time; returns the number indexed"""
+    db.session.execute(db.text(f"DELETE FROM {TABLE}"))
+    query = (db.select(Assessment.id, Assessment.technical_skills, *[getattr(Assessment, field) for field in ANSWER_FIELDS],
+                       AssessmentAnalysis.document, AssessmentAnalysis.compressed)
+             .outerjoin(AssessmentAnalysis)
+             .order_by(Assessment.id)
+             .limit(batch_size))
+    indexed, last_id = 0, 0
+    while True:
+        rows = db.session.execute(query.where(Assessment.id > last_id)).all()
+        if not rows:
+            break
+        db.session.execute(db.text(
+            f"INSERT INTO {TABLE} ({_key()}, answers, analysis) VALUES (:id, :answers, :analysis)"
+        ), [
+            {'id': row.id, 'answers': answers_text(row),
+             'analysis': analysis_text(row.compressed if row.compressed is not None else row.document)}
+            for row in rows
+        ])
+        indexed += len(rows)
+        last_id = rows[-1].id
+    db.session.commit()
+    return indexed
+
+def needs_backfill():
+    """True when there are assessments but nothing indexed yet (e.g. right after the index was added)"""
+    indexed = db.session.execute(db.text(f"SELECT 1 FROM {TABLE} LIMIT 1")).first() is not None
+    return not indexed and db.session.execute(db.select(Assessment.id).limit(1)).first() is not None
+
+def terms(query):
+    """The words and "quoted phrases" of a search, punctuation dropped; all of them must match"""
+    found = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        tokens = re.findall(r'\w+', phrase or word)
+        if tokens:
+            found.append(' '.join(tokens))
+    return found
+
+def fts5_query(query):
+    """
+    User input as an FTS5 expression: every term a quoted prefix match (so it can never be a
+    syntax error), all of them required
+    """
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+def tsquery(query):
+    """
+    The same terms as a Postgres to_tsquery expression, so both backends match alike: terms ANDed,
+    the words of a phrase adjacent, the last word a prefix. terms() leaves only word characters,
+    so quoting them is enough
+    """
+    return ' & '.join('(' + ' <-> '.join(f"'{word}'" for word in term.split()) + ':*)' for term in terms(query))
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    if not snippet:
+        return ''
+    return html.escape(snippet, quote=False).replace(START, '<mark>').replace(STOP, '</mark>')
+
+def _search_sqlite(query, limit, offset):
+    match = fts5_query(query)
+    if not match:
+        return 0, []
+    total = db.session.execute(db.text(f"SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH :match"),
+                               {'match': match}).scalar()
+    # bm25 is lower-is-better; answers weigh twice the analysis text
+    rows = db.session.execute(db.text(f"""
+        SELECT rowid AS assessment_id, -bm25({TABLE}, 2.0, 1.0) AS score,
+               snippet({TABLE}, 0, :start, :stop, '…', {SNIPPET_WORDS}) AS answers_snippet,
+               snippet({TABLE}, 1, :start, :stop, '…', {SNIPPET_WORDS}) AS analysis_snippet
+        FROM {TABLE} WHERE {TABLE} MATCH :match
+        ORDER BY bm25({TABLE}, 2.0, 1.0), rowid DESC
+        LIMIT :limit OFFSET :offset
+    """), {'match': match, 'start': START, 'stop': STOP, 'limit': limit, 'offset': offset}).all()
+    return total, rows
+
+def _search_postgresql(query, limit, offset):
+    query = tsquery(query)
+    if not query:
+        return 0, []
+    total = db.session.execute(db.text(
+        f"SELECT count(*) FROM {TABLE} WHERE document @@ to_tsquery('{LANGUAGE}', :query)"
+    ), {'query': query}).scalar()
+    # Rank and page on the GIN index first; ts_headline re-parses the text, so it only runs on the page
+    options = f"StartSel={START}, StopSel={STOP}, MaxWords={SNIPPET_WORDS * 2}, MinWords={SNIPPET_WORDS // 2}, MaxFragments=2, FragmentDelimiter=…"
+    rows = db.session.execute(db.text(f"""
+        WITH query AS (SELECT to_tsquery('{LANGUAGE}', :query) AS tsquery),
+        page AS (
+            SELECT s.assessment_id, ts_rank_cd(s.document, query.tsquery) AS score, s.answers, s.analysis, query.tsquery
+            FROM {TABLE} s, query
+            WHERE s.document @@ query.tsquery
+            ORDER BY score DESC, s.assessment_id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT assessment_id, score,
+               ts_headline('{LANGUAGE}', answers, tsquery, :options) AS answers_snippet,
+               ts_headline('{LANGUAGE}', analysis, tsquery, :options) AS analysis_snippet
+        FROM page
+        ORDER BY score DESC, assessment_id DESC
+    """), {'query': query, 'options': options, 'limit': limit, 'offset': offset}).all()
+    return total, rows
+
+def _search_like(query, limit, offset):
+    words = terms(query)
+    if not words:
+        return 0, []
+    where = ' AND '.join(f"(answers LIKE :w{i} OR analysis LIKE :w{i})" for i in range(len(words)))
+    params = {f"w{i}": f"%{word}%" for i, word in enumerate(words)}
+    total = db.session.execute(db.text(f"SELECT count(*) FROM {TABLE} WHERE {where}"), params).scalar()
+    rows = db.session.execute(db.text(f"""
+        SELECT assessment_id, 0 AS score, substr(answers, 1, 200) AS answers_snippet,
+               substr(analysis, 1, 200) AS analysis_snippet
+        FROM {TABLE} WHERE {where}
+        ORDER BY assessment_id DESC LIMIT :limit OFFSET :offset
+    """), dict(params, limit=limit, offset=offset)).all()
+    return total, rows
+
+def search(query, limit=20, offset=0):
+    """Best matches first: (total matches, [result dicts]) for one page"""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        total, rows = _search_sqlite(query, limit, offset)
+    elif dialect == 'postgresql':
+        total, rows = _search_postgresql(query, limit, offset)
+    else:
+        total, rows = _search_like(query, limit, offset)
+    if not rows:
+        return total, []
+
+    ids = [row.assessment_id for row in rows]
+    assessments = {
+        row.id: row for row in db.session.execute(
+            db.select(Assessment.id, Assessment.name, Assessment.email, Assessment.role,
+                      Assessment.industry, Assessment.submitted_at)
+            .where(Assessment.id.in_(ids))
+        )
+    }
+    results = []
+    for row in rows:
+        assessment = assessments.get(row.assessment_id)
+        if assessment is None:
+            continue
+        results.append({
+            'id': assessment.id,
+            'name': assessment.name,
+            'email': assessment.email,
+            'role': assessment.role,
+            'industry': assessment.industry,
+            'submitted_at': assessment.submitted_at.isoformat() if assessment.submitted_at else None,
+            'score': round(float(row.score), 4),
+            'snippets': {
+                'answers': highlight(row.answers_snippet),
+                'analysis': highlight(row.analysis_snippet)
+            }
+        })
+    return total, results
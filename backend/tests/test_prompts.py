@@ -0,0 +1,71 @@
+"""
+The cached prefix of an analysis request (tool definition, then the system block up to its
+cache_control breakpoint) must be byte-identical for every assessment, or each request
+writes a new cache entry instead of reading the shared one.
+"""
+
+import json
+
+import pytest
+
+import analysis_schema
+import llm_providers
+import prompts
+
+ANN = dict(
+    name='Ann', role='Engineer', industry='Utilities', location='Denver', current_salary=95000,
+    years_experience=6, last_raise_percent=3, technical_skills='Python, SCADA', certifications='PE',
+    education_level='MS', role_description='I keep the plant running', value_articulation='Reliability',
+    negotiation_experience='None', visibility_rating=4, values_clarity=7, purpose_alignment=6,
+    lifestyle_fit=5, energy_level=4
+)
+BO = dict(
+    name='Bo', role='Data Scientist', industry='Biotech', location='Boston', current_salary='140000',
+    years_experience=12, last_raise_percent=8.5, technical_skills='R, ML', certifications='',
+    education_level='PhD', role_description='Models', value_articulation='Insights',
+    negotiation_experience='Negotiated once', visibility_rating=8, values_clarity=3, purpose_alignment=9,
+    lifestyle_fit=8, energy_level=7
+)
+GAP = dict(market_salary_range='$80,000 - $110,000', gap_percentage='5% below the market median',
+           annual_opportunity='$5,000 to reach the median', benchmark={})
+
+class Sent(Exception):
+    pass
+
+@pytest.fixture
+def sent_requests(monkeypatch):
+    """Keyword arguments of every messages.create call, captured instead of sent"""
+    captured = []
+    def create_message(**kwargs):
+        captured.append(kwargs)
+        raise Sent()
+    monkeypatch.setattr(llm_providers.gateway, 'create_message', create_message)
+    return captured
+
+def send(assessment_data, schemas):
+    system, messages = prompts.build_request(assessment_data)
+    with pytest.raises(Sent):
+        llm_providers.AnthropicProvider().generate(system, messages, analysis_schema.sections_schema(schemas=schemas))
+
+def cached_prefix(request):
+    return json.dumps({'tools': request['tools'], 'system': request['system']}, sort_keys=True).encode('utf-8')
+
+@pytest.mark.parametrize('gap, schemas', [
+    (None, analysis_schema.SECTION_SCHEMAS),
+    (GAP, analysis_schema.BENCHMARKED_SECTION_SCHEMAS)
+], ids=['generated', 'benchmarked'])
+def test_cached_prefix_is_identical_across_assessments(sent_requests, gap, schemas):
+    send(dict(ANN, compensation_gap=gap), schemas)
+    send(dict(BO, compensation_gap=gap and dict(GAP, gap_percentage='12% above the market median')), schemas)
+
+    first, second = sent_requests
+    assert cached_prefix(first) == cached_prefix(second)
+    assert first['system'][-1]['cache_control'] == {'type': 'ephemeral'}
+    assert first['messages'] != second['messages']
+
+def test_client_data_stays_out_of_the_system_prompt():
+    system, messages = prompts.build_request(ANN)
+    system_text = json.dumps(system)
+    for value in ('Denver', 'I keep the plant running'):
+        assert value not in system_text
+        assert value in messages[0]['content']
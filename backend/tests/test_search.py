@@ -0,0 +1,30 @@
+"""
+Submit stores technical_skills as whatever JSON the client sent, so the search document has
+to cope with a single string or non-string items as well as a list of strings.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import search
+from search import ANSWER_FIELDS
+
+def assessment(technical_skills):
+    answers = dict.fromkeys(ANSWER_FIELDS, '')
+    return SimpleNamespace(technical_skills=json.dumps(technical_skills), **answers)
+
+@pytest.mark.parametrize('skills, expected', [
+    (['SCADA', 'Python'], 'SCADA, Python'),
+    ('SCADA, Python', 'SCADA, Python'),
+    ([1, 2], '1, 2'),
+    (7, '7'),
+    ([], ''),
+])
+def test_skills_are_indexed_whole(skills, expected):
+    assert search.answers_text(assessment(skills)) == expected
+
+def test_missing_skills_index_nothing():
+    empty = SimpleNamespace(technical_skills=None, **dict.fromkeys(ANSWER_FIELDS, None))
+    assert search.answers_text(empty) == ''
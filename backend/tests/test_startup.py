@@ -0,0 +1,45 @@
+"""
+Startup budget: a fresh process must import the app and answer its first requests quickly,
+with the heavy subsystems (Anthropic SDK, reportlab, numpy, email MIME) still unloaded.
+bench/bench_startup.py reports the same numbers in detail.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ['anthropic', 'reportlab', 'email.mime.multipart', 'numpy']
+# Generous against the ~0.7s measured locally, so only a real regression fails it
+MAX_IMPORT_SECONDS = float(os.environ.get('STARTUP_MAX_IMPORT_SECONDS', 2.0))
+MAX_FIRST_REQUEST_SECONDS = float(os.environ.get('STARTUP_MAX_FIRST_REQUEST_SECONDS', 0.5))
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+eager = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+health = app.app.test_client().get('/health').status_code
+print(json.dumps({{'import': imported - started, 'first_request': time.perf_counter() - imported,
+                  'health': health, 'eager': eager}}))
+"""
+
+def run_probe(tmp_path):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}",
+               ANTHROPIC_API_KEY='test',
+               ANALYSIS_WORKER_MODE='external',
+               COMPENSATION_INDEX_DIR=str(tmp_path / 'compensation'))
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_app_starts_within_budget_with_heavy_modules_unloaded(tmp_path):
+    result = run_probe(tmp_path)
+    assert result['eager'] == []
+    assert result['health'] == 200
+    assert result['import'] < MAX_IMPORT_SECONDS
+    assert result['first_request'] < MAX_FIRST_REQUEST_SECONDS
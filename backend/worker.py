@@ -0,0 +1,38 @@
+"""
+Career Flow Diagnostic Tool - Standalone Analysis Worker
+Runs the background analysis pool and email outbox senders in their own process so web workers only serve HTTP.
+
+Usage:
+    ANALYSIS_WORKER_MODE=external gunicorn app:app   # web process
+    python worker.py                                 # one or more worker processes
+"""
+
+import os
+import signal
+
+# Importing app must not start a second in-process pool
+os.environ.setdefault('ANALYSIS_WORKER_MODE', 'external')
+
+from app import app, process_analysis_job
+import jobs
+import outbox
+
+def main():
+    stop_event = jobs.start_workers(app, process_analysis_job)
+    sender_stop_event = outbox.start_senders(app)
+
+    def shutdown(signum, frame):
+        print(f"Received signal {signum}, stopping analysis workers and outbox senders...")
+        stop_event.set()
+        sender_stop_event.set()
+        jobs.notify_workers(all_workers=True)
+        outbox.notify_senders()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    while not stop_event.is_set():
+        stop_event.wait(1.0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Career Flow Diagnostic Tool - Fan-out Benchmark
+Compares end-to-end analysis latency of ANALYSIS_MODE=single against ANALYSIS_MODE=fanout
+using the fake Anthropic API, and prints p50/p95 for each.
+
+Usage:
+    python bench/bench_fanout.py --requests 20 --concurrency 4
+    python bench/bench_fanout.py --tokens-per-second 600 --ttft 0.06   # 10x faster run
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'backend'))
+sys.path.insert(0, BENCH_DIR)
+
+import fake_anthropic
+
+ASSESSMENT = {
+    'name': 'Bench Client', 'role': 'Process Engineer', 'industry': 'Utilities', 'location': 'Denver, CO',
+    'current_salary': 98000, 'years_experience': 8, 'last_raise_percent': 3,
+    'technical_skills': 'SCADA, Python, Process Control', 'certifications': 'PE',
+    'education_level': "Master's", 'role_description': 'I keep the treatment plant running',
+    'value_articulation': 'I fix problems quickly', 'negotiation_experience': 'Never negotiated',
+    'visibility_rating': 4, 'values_clarity': 7, 'purpose_alignment': 8, 'lifestyle_fit': 5, 'energy_level': 5
+}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_mode(llm_providers, prompts, mode, requests, concurrency):
+    llm_providers.ANALYSIS_MODE = mode
+    system, messages = prompts.build_request(ASSESSMENT)
+
+    def one(_):
+        started = time.monotonic()
+        analysis = llm_providers.run_provider('anthropic', system, messages)
+        llm_providers.validate_analysis(analysis)
+        return time.monotonic() - started
+
+    wall_started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    wall = time.monotonic() - wall_started
+    return {
+        'mode': mode,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'max': max(latencies),
+        'throughput': requests / wall
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Single-call vs fan-out analysis latency')
+    parser.add_argument('--requests', type=int, default=12)
+    parser.add_argument('--concurrency', type=int, default=4, help='analyses in flight at once')
+    parser.add_argument('--max-in-flight', type=int, default=32, help='LLM_MAX_IN_FLIGHT for the gateway')
+    parser.add_argument('--parallelism', type=int, default=6, help='ANALYSIS_FANOUT_PARALLELISM')
+    parser.add_argument('--ttft', type=float, default=0.6)
+    parser.add_argument('--tokens-per-second', type=float, default=60.0)
+    parser.add_argument('--base-url', help='use an already running fake server instead of starting one')
+    args = parser.parse_args()
+
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        server = fake_anthropic.serve(ttft=args.ttft, tokens_per_second=args.tokens_per_second)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # Gateway and provider settings are read at import
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'bench')
+    os.environ['LLM_MAX_IN_FLIGHT'] = str(args.max_in_flight)
+    os.environ['LLM_REQUESTS_PER_MINUTE'] = '0'
+    os.environ['LLM_TOKENS_PER_MINUTE'] = '0'
+    os.environ['ANALYSIS_FANOUT_PARALLELISM'] = str(args.parallelism)
+    import llm_providers
+    import prompts
+
+    print(f"{args.requests} analyses, {args.concurrency} concurrent, fake LLM at {base_url} "
+          f"(ttft {args.ttft}s, {args.tokens_per_second} tokens/s)")
+    print(f"{'mode':<8} {'p50 (s)':>9} {'p95 (s)':>9} {'max (s)':>9} {'analyses/s':>11}")
+    results = [run_mode(llm_providers, prompts, mode, args.requests, args.concurrency) for mode in ('single', 'fanout')]
+    for r in results:
+        print(f"{r['mode']:<8} {r['p50']:>9.2f} {r['p95']:>9.2f} {r['max']:>9.2f} {r['throughput']:>11.2f}")
+    single, fanout = results
+    print(f"fan-out p50 speedup: {single['p50'] / fanout['p50']:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Career Flow Diagnostic Tool - In-flight Analysis Benchmark
+Opens N streamed analyses at once (POST ?stream=1, then read the SSE stream to 'complete')
+against the app on the fake Anthropic API, and reports completions, time to first section,
+time to complete, and the server's peak memory. Use it to compare sync gunicorn with the
+gevent configuration (gunicorn_async.py).
+
+Usage:
+    python bench/bench_inflight.py --analyses 300 --server gevent --workers 1
+    python bench/bench_inflight.py --analyses 300 --server gunicorn --workers 2 --threads 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_fanout import percentile
+from bench_load import Client, add_server_arguments, assessment_payload, start_stack
+
+def process_tree_rss(pid):
+    """Resident memory (bytes) of pid and its descendants, from /proc (Linux only)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+def stream_analysis(base_url, timeout):
+    """Submit with ?stream=1 and read the SSE stream; returns (first_section_seconds, total_seconds, outcome)"""
+    client = Client(base_url, timeout=timeout)
+    started = time.monotonic()
+    first_section = None
+    try:
+        status, data = client.request('POST', '/api/submit-assessment?stream=1', assessment_payload())
+        if status != 202:
+            return None, time.monotonic() - started, f"submit {status}"
+        assessment_id = json.loads(data)['assessment_id']
+
+        client.connection.request('GET', f'/api/assessment-stream/{assessment_id}')
+        response = client.connection.getresponse()
+        event = None
+        for raw in response:
+            line = raw.decode('utf-8').strip()
+            if line.startswith('event: '):
+                event = line[7:]
+                if event == 'section' and first_section is None:
+                    first_section = time.monotonic() - started
+                elif event in ('complete', 'error'):
+                    return first_section, time.monotonic() - started, event
+        return first_section, time.monotonic() - started, 'disconnected'
+    except Exception as e:
+        return first_section, time.monotonic() - started, type(e).__name__
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent streamed analyses against one server')
+    parser.add_argument('--analyses', type=int, default=200, help='streamed analyses opened at once')
+    parser.add_argument('--llm-max-in-flight', type=int, default=1000,
+                        help='LLM_MAX_IN_FLIGHT for the app (the fake API has no limit)')
+    parser.add_argument('--timeout', type=float, default=300)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ['LLM_MAX_IN_FLIGHT'] = str(args.llm_max_in_flight)
+    workdir = tempfile.mkdtemp(prefix='careerflow-inflight-')
+    base_url, process, _ = start_stack(args, workdir)
+
+    results = []
+    lock = threading.Lock()
+    peak_rss = process_tree_rss(process.pid)
+    idle_rss = peak_rss
+
+    def one():
+        result = stream_analysis(base_url, args.timeout)
+        with lock:
+            results.append(result)
+
+    try:
+        print(f"{args.analyses} concurrent streamed analyses against {args.server} "
+              f"({args.workers} workers{'' if args.server == 'gevent' else f' x {args.threads} threads'}); "
+              f"fake LLM ttft {args.ttft}s, {args.tokens_per_second} tokens/s; logs in {workdir}")
+        threads = [threading.Thread(target=one, daemon=True) for _ in range(args.analyses)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            peak_rss = max(peak_rss, process_tree_rss(process.pid))
+            time.sleep(0.25)
+        wall = time.monotonic() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    completed = [r for r in results if r[2] == 'complete']
+    outcomes = {}
+    for _, _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    print(f"outcomes: {outcomes} in {wall:.1f}s ({len(completed) / wall:.1f} analyses/s)")
+    if completed:
+        firsts = [r[0] for r in completed if r[0] is not None]
+        totals = [r[1] for r in completed]
+        print(f"{'':<20} {'p50 (s)':>8} {'p95 (s)':>8} {'max (s)':>8}")
+        if firsts:
+            print(f"{'first section':<20} {percentile(firsts, 50):>8.2f} {percentile(firsts, 95):>8.2f} {max(firsts):>8.2f}")
+        print(f"{'complete':<20} {percentile(totals, 50):>8.2f} {percentile(totals, 95):>8.2f} {max(totals):>8.2f}")
+    print(f"server memory: {idle_rss / 2**20:.0f} MiB idle, {peak_rss / 2**20:.0f} MiB peak")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Career Flow Diagnostic Tool - Load Benchmark
+Starts the Flask app (gunicorn or the dev server) against SQLite or Postgres, with the fake
+Anthropic API and an SMTP sink, then drives a mixed workload (submit, status polling,
+download-report, admin listing) at each concurrency level and reports throughput and
+p50/p95/p99 latency per endpoint. Results can be saved as a baseline and later runs
+compared against it; the run exits 1 when a regression is flagged.
+
+Usage:
+    python bench/bench_load.py --concurrency 4 16 32 --duration 20
+    python bench/bench_load.py --workers 4 --threads 8 --database-url postgresql://localhost/careerflow_bench
+    python bench/bench_load.py --save bench/baselines/local.json
+    python bench/bench_load.py --compare bench/baselines/local.json
+    python bench/bench_load.py --url http://127.0.0.1:5000   # an already running server (no fakes started)
+"""
+
+import argparse
+from collections import defaultdict
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+sys.path.insert(0, BENCH_DIR)
+
+import fake_anthropic
+import fake_smtp
+from bench_fanout import ASSESSMENT, percentile
+
+DEFAULT_MIX = 'submit=1,status=6,download=2,admin=1'
+
+class Client:
+    """One keep-alive HTTP connection per virtual user, reopened when the server closes it"""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = dict(headers or {})
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.HTTPException, ConnectionError):
+                # Stale keep-alive connection: retry once on a fresh one
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def assessment_payload():
+    """Unique email and salary so neither idempotency nor the analysis cache collapses submissions"""
+    return dict(ASSESSMENT, email=f"bench-{uuid.uuid4().hex[:12]}@example.com",
+                current_salary=random.randint(60000, 180000))
+
+class Workload:
+    """Mixed request stream; status and download target assessments created during the run"""
+
+    def __init__(self, mix, completed_ids):
+        self.ops = []
+        for item in mix.split(','):
+            name, weight = item.split('=')
+            self.ops += [name.strip()] * int(weight)
+        self.completed_ids = list(completed_ids)
+        self.submitted_ids = list(completed_ids)
+        self.lock = threading.Lock()
+
+    def run_one(self, client):
+        op = random.choice(self.ops)
+        if op == 'submit':
+            status, data = client.request('POST', '/api/submit-assessment', assessment_payload(),
+                                          {'Idempotency-Key': uuid.uuid4().hex})
+            if status == 202:
+                with self.lock:
+                    self.submitted_ids.append(json.loads(data)['assessment_id'])
+        elif op == 'status':
+            with self.lock:
+                assessment_id = random.choice(self.submitted_ids[-200:])
+            status, _ = client.request('GET', f'/api/assessment-status/{assessment_id}')
+        elif op == 'download':
+            status, _ = client.request('GET', f'/api/download-report/{random.choice(self.completed_ids)}')
+        elif op == 'admin':
+            status, _ = client.request('GET', '/api/admin/assessments?limit=50')
+        else:
+            raise ValueError(f"Unknown operation {op}")
+        return op, status
+
+def summarize(values, errors, wall):
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / wall, 2),
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4)
+    }
+
+def run_level(base_url, workload, concurrency, duration):
+    """Drive the workload with `concurrency` closed-loop users for `duration` seconds"""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def user():
+        client = Client(base_url)
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                op, status = workload.run_one(client)
+                failed = status >= 400
+            except Exception:
+                op, failed = 'error', True
+                client.close()
+            elapsed = time.monotonic() - started
+            with lock:
+                latencies[op].append(elapsed)
+                if failed:
+                    errors[op] += 1
+        client.close()
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    result = {op: summarize(latencies[op], errors[op], wall) for op in sorted(latencies)}
+    result['all'] = summarize([v for values in latencies.values() for v in values], sum(errors.values()), wall)
+    return result
+
+def start_stack(args, workdir):
+    """Fake Anthropic API, SMTP sink and the app server; returns (base_url, server process, sink)"""
+    llm = fake_anthropic.serve(ttft=args.ttft, tokens_per_second=args.tokens_per_second, jitter=args.jitter)
+    sink = fake_smtp.serve(delay=args.smtp_delay)
+    port = args.port
+
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'ANTHROPIC_API_KEY': env.get('ANTHROPIC_API_KEY', 'bench'),
+        'ANTHROPIC_BASE_URL': f"http://127.0.0.1:{llm.server_port}",
+        # The fake API has no rate limit, and every request comes from one address
+        'LLM_REQUESTS_PER_MINUTE': '0',
+        'ADMISSION_CONTROL_ENABLED': 'true' if args.admission else 'false',
+        'EMAIL_REPORTS_ENABLED': 'true',
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(sink.server_address[1]),
+        'SMTP_USE_TLS': 'false',
+        'SENDER_EMAIL': 'bench@example.com',
+        'SENDER_PASSWORD': '',
+        'ANALYSIS_POLL_INTERVAL': '0.2',
+        'SMTP_POLL_INTERVAL': '0.5'
+    })
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f"127.0.0.1:{port}",
+                   '--workers', str(args.workers), '--threads', str(args.threads), '--timeout', '120']
+    elif args.server == 'gevent':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_async.py', 'app:app',
+                   '--bind', f"127.0.0.1:{port}", '--workers', str(args.workers)]
+    else:
+        command = [sys.executable, '-c', f"import app; app.app.run(port={port}, threaded=True)"]
+
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, check=True)
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    client = Client(base_url, timeout=2)
+    for _ in range(150):
+        if process.poll() is not None:
+            break
+        try:
+            if client.request('GET', '/health')[0] == 200:
+                client.close()
+                return base_url, process, sink
+        except OSError:
+            client.close()
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start; see {log.name}")
+
+def add_server_arguments(parser):
+    """Options for the stack start_stack() brings up (shared with bench_inflight.py)"""
+    parser.add_argument('--server', choices=['gunicorn', 'gevent', 'dev'], default='gunicorn',
+                        help='gunicorn: sync/gthread workers; gevent: gunicorn_async.py')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker (gunicorn server only)')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--database-url', help='default: a fresh SQLite file in a temp directory')
+    parser.add_argument('--admission', action='store_true', help='keep admission control on')
+    parser.add_argument('--ttft', type=float, default=0.6)
+    parser.add_argument('--tokens-per-second', type=float, default=60.0)
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--smtp-delay', type=float, default=0.05)
+
+def seed(base_url, count, timeout=120):
+    """Submit `count` assessments and wait for their analyses so downloads have something to serve"""
+    client = Client(base_url)
+    ids = []
+    for _ in range(count):
+        status, data = client.request('POST', '/api/submit-assessment', assessment_payload())
+        if status != 202:
+            raise RuntimeError(f"Seed submission failed ({status}): {data[:200]}")
+        ids.append(json.loads(data)['assessment_id'])
+
+    deadline = time.monotonic() + timeout
+    pending = set(ids)
+    while pending and time.monotonic() < deadline:
+        for assessment_id in list(pending):
+            status, data = client.request('GET', f'/api/assessment-status/{assessment_id}')
+            if json.loads(data).get('status') == 'completed':
+                pending.discard(assessment_id)
+        time.sleep(0.5)
+    client.close()
+    if pending:
+        raise RuntimeError(f"Seed analyses did not complete: {sorted(pending)}")
+    return ids
+
+def print_level(concurrency, result):
+    print(f"\nconcurrency {concurrency}")
+    print(f"  {'endpoint':<10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for op, r in result.items():
+        print(f"  {op:<10} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>8.1f} "
+              f"{r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f}")
+
+def compare(baseline, current, tolerance, min_delta):
+    """
+    Regressions: p95 up by more than `tolerance` (and at least `min_delta` seconds, to
+    ignore noise on very fast endpoints) or throughput down by more than `tolerance`
+    """
+    regressions = []
+    for level, endpoints in current['levels'].items():
+        for op, r in endpoints.items():
+            base = baseline.get('levels', {}).get(level, {}).get(op)
+            if base is None:
+                continue
+            if r['p95'] > base['p95'] * (1 + tolerance) and r['p95'] - base['p95'] >= min_delta:
+                regressions.append(f"c={level} {op}: p95 {base['p95'] * 1000:.1f}ms -> {r['p95'] * 1000:.1f}ms")
+            if r['throughput'] < base['throughput'] * (1 - tolerance):
+                regressions.append(f"c={level} {op}: throughput {base['throughput']:.1f} -> {r['throughput']:.1f} req/s")
+            if r['errors'] > base['errors']:
+                regressions.append(f"c={level} {op}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed-workload load test against a local stack')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16], help='virtual users per level')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per concurrency level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation weights')
+    parser.add_argument('--seed', type=int, default=5, help='completed assessments to create before measuring')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting the stack')
+    add_server_arguments(parser)
+    parser.add_argument('--save', help='write results JSON (a baseline) to this path')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative change before flagging')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='ignore p95 increases smaller than this (s)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='careerflow-bench-')
+    process = sink = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        base_url, process, sink = start_stack(args, workdir)
+
+    try:
+        print(f"Benchmarking {base_url} ({args.server}, {args.workers} workers x {args.threads} threads, "
+              f"{'postgres' if (args.database_url or '').startswith('postgres') else 'sqlite'}); logs in {workdir}")
+        completed_ids = seed(base_url, args.seed)
+        results = {
+            'config': {
+                'server': args.server, 'workers': args.workers, 'threads': args.threads,
+                'database': (args.database_url or 'sqlite').split(':')[0], 'mix': args.mix,
+                'duration': args.duration, 'ttft': args.ttft, 'tokens_per_second': args.tokens_per_second
+            },
+            'levels': {}
+        }
+        for concurrency in args.concurrency:
+            workload = Workload(args.mix, completed_ids)
+            result = run_level(base_url, workload, concurrency, args.duration)
+            results['levels'][str(concurrency)] = result
+            print_level(concurrency, result)
+        if sink is not None:
+            print(f"\nSMTP sink received {sink.messages} report emails")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\nRegressions against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+if __name__ == '__main__':
+    main()
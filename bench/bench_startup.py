@@ -0,0 +1,129 @@
+"""
+Career Flow Diagnostic Tool - Startup Benchmark
+Measures how long a fresh process takes to import the app and serve its first requests,
+and checks that the Anthropic SDK, reportlab, numpy and the email MIME modules are still loaded
+lazily. Exits 1 when a budget is exceeded or one of them is imported at startup, so it can
+run as a CI step.
+
+Usage:
+    python bench/bench_startup.py
+    python bench/bench_startup.py --runs 10 --max-import-seconds 0.8 --gunicorn
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+
+# Subsystems that must not load until a request needs them
+LAZY_MODULES = ['anthropic', 'reportlab', 'email.mime.multipart', 'numpy']
+
+# Runs in a fresh interpreter; prints one JSON line
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+eager = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+client = app.app.test_client()
+health = client.get('/health').status_code
+first_request = time.perf_counter()
+listing = client.get('/api/admin/assessments?limit=1').status_code
+first_query = time.perf_counter()
+print(json.dumps({{
+    'import': imported - started,
+    'first_request': first_request - imported,
+    'first_query': first_query - first_request,
+    'status': [health, listing],
+    'eager': eager
+}}))
+"""
+
+def run_probe(env):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - started
+    return result
+
+def gunicorn_cold_start(env, port):
+    """Seconds from launching gunicorn to the first 200 from /health"""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f"127.0.0.1:{port}",
+                                '--workers', '1'],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while process.poll() is None and time.perf_counter() - started < 30:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            try:
+                connection.request('GET', '/health')
+                if connection.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+            finally:
+                connection.close()
+        raise RuntimeError('gunicorn did not come up')
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description='App import time and first-request latency')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes to time (the median is reported)')
+    parser.add_argument('--max-import-seconds', type=float, default=1.0)
+    parser.add_argument('--max-first-request-seconds', type=float, default=0.5,
+                        help='budget for /health plus the first database-backed request')
+    parser.add_argument('--gunicorn', action='store_true', help='also time gunicorn from launch to first response')
+    parser.add_argument('--port', type=int, default=5056)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='careerflow-startup-')
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        'ANTHROPIC_API_KEY': env.get('ANTHROPIC_API_KEY', 'bench')
+    })
+    # Schema creation is a deploy step, not part of startup
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=BACKEND_DIR, env=env, capture_output=True, check=True)
+
+    runs = [run_probe(env) for _ in range(args.runs)]
+    print(f"{args.runs} fresh processes (median, seconds)")
+    for key, label in (('import', 'import app'), ('first_request', 'first request (/health)'),
+                       ('first_query', 'first DB request'), ('process', 'whole process')):
+        values = [run[key] for run in runs]
+        print(f"  {label:<24} {statistics.median(values):>7.3f}  (min {min(values):.3f}, max {max(values):.3f})")
+    if args.gunicorn:
+        print(f"  {'gunicorn to first 200':<24} {gunicorn_cold_start(env, args.port):>7.3f}")
+
+    failures = []
+    import_time = statistics.median(run['import'] for run in runs)
+    first_requests = statistics.median(run['first_request'] + run['first_query'] for run in runs)
+    if import_time > args.max_import_seconds:
+        failures.append(f"import took {import_time:.3f}s (budget {args.max_import_seconds}s)")
+    if first_requests > args.max_first_request_seconds:
+        failures.append(f"first requests took {first_requests:.3f}s (budget {args.max_first_request_seconds}s)")
+    eager = sorted({name for run in runs for name in run['eager']})
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if any(status != 200 for run in runs for status in run['status']):
+        failures.append(f"unexpected status codes: {runs[0]['status']}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: within budget, heavy subsystems load lazily")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Career Flow Diagnostic Tool - Fake Anthropic Messages API
+Local stand-in for POST /v1/messages with realistic timing: a time-to-first-token delay
+(optionally jittered), then output paced at a fixed tokens/second (~4 characters per token). Honours forced tool
+calls by returning only the sections (and object fields) named in the tool's input_schema, and supports
+streaming (SSE) as well as plain responses.
+
+Usage:
+    python bench/fake_anthropic.py --port 8099 --ttft 0.6 --tokens-per-second 60 --jitter 0.3
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8099 python backend/app.py
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CHARS_PER_TOKEN = 4
+
+def _leverage_point(area):
+    return {
+        'area': area,
+        'current_state': "Your work keeps critical systems reliable, but it is described in operational terms that "
+                         "leadership reads as cost of doing business rather than value created.",
+        'impact': "Decision makers set compensation from perceived business impact; until this is framed in "
+                  "outcomes, raises will track inflation instead of market value.",
+        'quick_win': "Rewrite your last three accomplishments as before/after outcomes with a dollar or risk figure "
+                     "and share them in your next one-on-one."
+    }
+
+def _phase(weeks, focus):
+    return {
+        'week_range': weeks,
+        'focus': focus,
+        'actions': [
+            "Document three recent wins with quantified outcomes and the stakeholders who benefited",
+            "Schedule conversations with two senior leaders to test the revised positioning",
+            "Collect current market data for your role from at least two independent sources"
+        ],
+        'success_metric': "Leaders repeat your outcome language back to you and you have a documented market range."
+    }
+
+SAMPLE_ANALYSIS = {
+    'executive_summary': "You are paid for the role you had three years ago, not the one you perform today. "
+                         "Reframing your operational expertise as risk reduction and strategic value is the fastest "
+                         "path to closing a gap of roughly 18% within two review cycles.",
+    'compensation_gap': {
+        'market_salary_range': "$112,000 - $128,000 for your experience, credentials and region",
+        'gap_percentage': "Approximately 15-20% below market",
+        'annual_opportunity': "$17,000 - $23,000 per year",
+        'key_insight': "Your raises have compounded from a below-market starting offer, and you have never "
+                       "renegotiated from a market reference point, so each increase widened the absolute gap."
+    },
+    'leverage_points': [
+        _leverage_point("Positioning - translate technical work into business outcomes"),
+        _leverage_point("Visibility - make your risk reduction visible to decision makers"),
+        _leverage_point("Alignment - negotiate from the work that energizes you")
+    ],
+    'positioning_diagnosis': {
+        'language_gaps': "You describe what you maintain rather than what you prevent and enable, which "
+                         "undersells the judgment your role requires.",
+        'visibility_issues': "Your best work is invisible when it succeeds; nobody sees the outages that did not "
+                             "happen unless you report them.",
+        'narrative_coherence': "The pieces of a strong story are present but not connected into a clear arc of "
+                               "increasing responsibility and impact.",
+        'specific_fixes': [
+            "Lead every status update with the business outcome, then the technical detail",
+            "Keep a running log of incidents prevented and their estimated cost",
+            "Retitle your LinkedIn headline around the outcome you deliver",
+            "Prepare a two-minute career narrative that ends with your next-level role"
+        ]
+    },
+    'alignment_assessment': {
+        'values_insight': "High purpose alignment with lower lifestyle fit suggests you care about the mission "
+                          "but are absorbing unsustainable load to deliver it.",
+        'energy_pattern': "Energy drops where your contribution is least visible, which reinforces the "
+                          "positioning gap and makes advocacy feel harder than it is.",
+        'strategic_implication': "Negotiating for scope and recognition, not just salary, will raise both your "
+                                 "leverage and your energy going into the conversation."
+    },
+    'ninety_day_roadmap': [
+        _phase("Weeks 1-4", "Build the evidence base"),
+        _phase("Weeks 5-8", "Reposition with decision makers"),
+        _phase("Weeks 9-12", "Negotiate from market data")
+    ],
+    'next_step': "Book a strategy call to turn this roadmap into a negotiation plan with specific targets, "
+                 "scripts and timing for your next review."
+}
+
+def _fit(value, schema):
+    """An object section cut down to the properties the schema asks for"""
+    if schema.get('type') == 'object' and isinstance(value, dict):
+        return {key: value[key] for key in schema.get('properties', {}) if key in value}
+    return value
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    ttft = 0.6
+    tokens_per_second = 60.0
+    jitter = 0.0  # +/- fraction applied to each request's ttft and token rate
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sse(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.startswith('/v1/messages'):
+            self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+        tools = body.get('tools') or []
+        if tools:
+            sections = tools[0]['input_schema'].get('properties', {})
+            output = {name: _fit(SAMPLE_ANALYSIS[name], schema) for name, schema in sections.items()
+                      if name in SAMPLE_ANALYSIS}
+            block = {'type': 'tool_use', 'id': 'toolu_fake', 'name': tools[0]['name'], 'input': output}
+        else:
+            output = SAMPLE_ANALYSIS
+            block = {'type': 'text', 'text': json.dumps(output)}
+        text = json.dumps(output)
+
+        request_chars = len(json.dumps(body.get('system', ''))) + len(json.dumps(body.get('messages', [])))
+        usage = {'input_tokens': request_chars // CHARS_PER_TOKEN, 'output_tokens': len(text) // CHARS_PER_TOKEN}
+        message = {
+            'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': body.get('model'),
+            'content': [block], 'stop_reason': 'tool_use' if tools else 'end_turn', 'stop_sequence': None,
+            'usage': usage
+        }
+
+        scale = random.uniform(1 - self.jitter, 1 + self.jitter)
+        tokens_per_second = self.tokens_per_second / scale
+        time.sleep(self.ttft * scale)
+        if not body.get('stream'):
+            time.sleep(usage['output_tokens'] / tokens_per_second)
+            self._send_json(200, message)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self._sse('message_start', {'type': 'message_start',
+                                    'message': dict(message, content=[], usage=dict(usage, output_tokens=1))})
+        start_block = dict(block, input={}) if tools else dict(block, text='')
+        self._sse('content_block_start', {'type': 'content_block_start', 'index': 0, 'content_block': start_block})
+
+        chunk = CHARS_PER_TOKEN * 4  # four tokens per delta
+        for i in range(0, len(text), chunk):
+            piece = text[i:i + chunk]
+            delta = {'type': 'input_json_delta', 'partial_json': piece} if tools else {'type': 'text_delta', 'text': piece}
+            self._sse('content_block_delta', {'type': 'content_block_delta', 'index': 0, 'delta': delta})
+            time.sleep(4 / tokens_per_second)
+
+        self._sse('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        self._sse('message_delta', {'type': 'message_delta',
+                                    'delta': {'stop_reason': message['stop_reason'], 'stop_sequence': None},
+                                    'usage': {'output_tokens': usage['output_tokens']}})
+        self._sse('message_stop', {'type': 'message_stop'})
+        self.close_connection = True
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # hundreds of concurrent connects in the in-flight benchmark
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections (e.g. an app server shutting down) aren't errors here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(host='127.0.0.1', port=0, ttft=0.6, tokens_per_second=60.0, jitter=0.0):
+    """Start the fake API on a background thread; returns the server (server.server_port has the port)"""
+    handler = type('ConfiguredHandler', (FakeAnthropicHandler,), {
+        'ttft': ttft,
+        'tokens_per_second': tokens_per_second,
+        'jitter': jitter
+    })
+    server = QuietHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Anthropic Messages API for local benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--ttft', type=float, default=0.6, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=60.0)
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- fraction of random variation per request')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.ttft, args.tokens_per_second, args.jitter)
+    print(f"Fake Anthropic API on http://{args.host}:{server.server_port} "
+          f"(ttft {args.ttft}s, {args.tokens_per_second} tokens/s, jitter {args.jitter})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Career Flow Diagnostic Tool - SMTP Sink
+Minimal SMTP server that accepts and discards every message (no TLS, no auth), with an
+optional per-message delay to mimic a slow relay. Enough of RFC 5321 for smtplib.
+
+Usage:
+    python bench/fake_smtp.py --port 8025 --delay 0.2
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SMTP_USE_TLS=false SENDER_EMAIL=bench@example.com python backend/app.py
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    delay = 0.0
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        self.reply('220 sink ESMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-sink\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n')
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                time.sleep(self.delay)
+                self.server.record(size)
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+def serve(host='127.0.0.1', port=0, delay=0.0):
+    """Start the sink on a background thread; returns the server (server.server_address[1] has the port)"""
+    handler = type('ConfiguredHandler', (SMTPSinkHandler,), {'delay': delay})
+    server = SMTPSink((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='SMTP sink for local benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to hold each message before accepting it')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.delay)
+    print(f"SMTP sink on {args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"{server.messages} messages, {server.bytes} bytes received")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,73 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import './Admin.css';
 
+const PAGE_SIZE = 50;
+
 function Admin() {
   const [assessments, setAssessments] = useState([]);
+  const [summary, setSummary] = useState({ total: 0, reports_sent: 0, avg_salary: null });
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [filters, setFilters] = useState({ role: '', industry: '', from: '', to: '', report_sent: '' });
   const [selectedAssessment, setSelectedAssessment] = useState(null);
   const [loading, setLoading] = useState(true);
   const [view, setView] = useState('list'); // 'list' or 'detail'
+  const sentinelRef = useRef(null);
 
-  useEffect(() => {
-    fetchAssessments();
-  }, []);
+  const buildQuery = (cursor) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== '') params.append(key, value);
+    });
+    if (cursor) params.append('cursor', cursor);
+    return params.toString();
+  };
 
-  const fetchAssessments = async () => {
+  // First page (also used by Refresh and when filters change)
+  const fetchAssessments = useCallback(async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/admin/assessments');
+      const response = await fetch(`http://localhost:5000/api/admin/assessments?${buildQuery(null)}`);
       const data = await response.json();
-      setAssessments(data);
+      setAssessments(data.items || []);
+      setSummary(data.summary || { total: 0, reports_sent: 0, avg_salary: null });
+      setNextCursor(data.next_cursor);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching assessments:', error);
       setLoading(false);
     }
+  }, [filters]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  const fetchMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`http://localhost:5000/api/admin/assessments?${buildQuery(nextCursor)}`);
+      const data = await response.json();
+      setAssessments(prev => [...prev, ...(data.items || [])]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching more assessments:', error);
+    }
+    setLoadingMore(false);
+  }, [nextCursor, loadingMore, filters]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  useEffect(() => {
+    fetchAssessments();
+  }, [fetchAssessments]);
+
+  // Infinite scroll: load the next page when the sentinel row comes into view
+  useEffect(() => {
+    if (view !== 'list' || !sentinelRef.current) return undefined;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) fetchMore();
+    }, { rootMargin: '200px' });
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [fetchMore, view]);
+
+  const updateFilter = (key, value) => {
+    setFilters(prev => ({ ...prev, [key]: value }));
   };
 
   const fetchAssessmentDetail = async (id) => {
@@ -52,18 +99,18 @@ function Admin() {
         <h1>Career Flow Diagnostic - Admin Dashboard</h1>
         <div className="admin-stats">
           <div className="stat-card">
-            <div className="stat-number">{assessments.length}</div>
+            <div className="stat-number">{summary.total}</div>
             <div className="stat-label">Total Assessments</div>
           </div>
           <div className="stat-card">
             <div className="stat-number">
-              {assessments.filter(a => a.report_sent).length}
+              {summary.reports_sent}
             </div>
             <div className="stat-label">Reports Sent</div>
           </div>
           <div className="stat-card">
             <div className="stat-number">
-              ${Math.round(assessments.reduce((sum, a) => sum + (a.current_salary || 0), 0) / assessments.length || 0).toLocaleString()}
+              ${(summary.avg_salary || 0).toLocaleString()}
             </div>
             <div className="stat-label">Avg Current Salary</div>
           </div>
@@ -79,6 +126,22 @@ function Admin() {
             </button>
           </div>
 
+          <div className="list-filters">
+            <input type="text" placeholder="Role" value={filters.role}
+              onChange={(e) => updateFilter('role', e.target.value)} />
+            <input type="text" placeholder="Industry" value={filters.industry}
+              onChange={(e) => updateFilter('industry', e.target.value)} />
+            <input type="date" value={filters.from}
+              onChange={(e) => updateFilter('from', e.target.value)} />
+            <input type="date" value={filters.to}
+              onChange={(e) => updateFilter('to', e.target.value)} />
+            <select value={filters.report_sent} onChange={(e) => updateFilter('report_sent', e.target.value)}>
+              <option value="">All reports</option>
+              <option value="true">Sent</option>
+              <option value="false">Pending</option>
+            </select>
+          </div>
+
           <div className="table-container">
             <table className="assessments-table">
               <thead>
@@ -123,6 +186,9 @@ function Admin() {
                 ))}
               </tbody>
             </table>
+            <div ref={sentinelRef} className="scroll-sentinel">
+              {loadingMore && <div className="loading">Loading more...</div>}
+            </div>
           </div>
 
           {assessments.length === 0 && (
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import './App.css';
 
 // Assessment steps configuration
@@ -42,6 +42,8 @@ function App() {
     energy_level: 5
   });
   const [submissionResult, setSubmissionResult] = useState(null);
+  // Sent as Idempotency-Key so double-clicks and retries reuse the first submission
+  const submissionKey = useRef(null);
 
   const updateData = (newData) => {
     setAssessmentData(prev => ({ ...prev, ...newData }));
@@ -59,20 +61,112 @@ function App() {
     }
   };
 
+  // Show the provisional diagnosis until the full analysis replaces it
+  const showPreliminary = (preliminary) => {
+    if (preliminary) {
+      setSubmissionResult({ success: true, status: 'processing', preliminary });
+      setCurrentStep(STEPS.length - 1);
+    }
+  };
+
+  const pollStatus = async (statusUrl, initialStatus) => {
+    let status = initialStatus;
+    while (status.status === 'queued' || status.status === 'running' || status.status === 'processing') {
+      await new Promise(resolve => setTimeout(resolve, 3000));
+      const statusResponse = await fetch(statusUrl);
+      status = await statusResponse.json();
+      showPreliminary(status.preliminary);
+    }
+    return status;
+  };
+
+  // Show each report section as soon as the server streams it; resolves with the final status
+  const streamAnalysis = (streamUrl, preliminary) => new Promise((resolve, reject) => {
+    const source = new EventSource(streamUrl);
+    const sections = {};
+    let shown = false;
+
+    source.addEventListener('section', (event) => {
+      const { name, content } = JSON.parse(event.data);
+      sections[name] = content;
+      setSubmissionResult({ success: true, status: 'running', preliminary, analysis: { ...sections } });
+      if (!shown) {
+        shown = true;
+        setCurrentStep(STEPS.length - 1); // Move to complete step with the first section
+      }
+    });
+    source.addEventListener('complete', (event) => {
+      source.close();
+      resolve(JSON.parse(event.data));
+    });
+    source.addEventListener('error', (event) => {
+      source.close();
+      reject(new Error(event.data ? JSON.parse(event.data).error : 'Stream interrupted'));
+    });
+  });
+
   const submitAssessment = async () => {
     try {
       const apiUrl = process.env.REACT_APP_API_URL || 'http://localhost:5000';
-      const response = await fetch(`${apiUrl}/api/submit-assessment`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(assessmentData)
-      });
-
-      const result = await response.json();
-      setSubmissionResult(result);
-      nextStep(); // Move to complete step
+      const canStream = typeof window.EventSource !== 'undefined';
+      if (!submissionKey.current) {
+        submissionKey.current = window.crypto && window.crypto.randomUUID
+          ? window.crypto.randomUUID()
+          : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      }
+      let result;
+      for (;;) {
+        const response = await fetch(`${apiUrl}/api/submit-assessment${canStream ? '?stream=1' : ''}`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': submissionKey.current,
+          },
+          body: JSON.stringify(assessmentData)
+        });
+        result = await response.json();
+        if (response.status !== 503) {
+          break;
+        }
+
+        // Analysis capacity is full - show the queue position and resubmit when the server says to
+        const retryAfter = result.retry_after || parseInt(response.headers.get('Retry-After'), 10) || 15;
+        setSubmissionResult({ success: true, status: 'processing', queue_position: result.queue_position });
+        setCurrentStep(STEPS.length - 1);
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+      }
+
+      if (!result.success) {
+        if (result.retry_after) {
+          const minutes = Math.ceil(result.retry_after / 60);
+          result.error = `${result.error} (try again in about ${minutes} minute${minutes === 1 ? '' : 's'})`;
+        }
+        setSubmissionResult(result);
+        nextStep();
+        return;
+      }
+
+      // Analysis runs in the background - stream it when possible, otherwise poll until it finishes
+      const statusUrl = result.status_url || `${apiUrl}/api/assessment-status/${result.assessment_id}`;
+      showPreliminary(result.preliminary);
+      let status;
+      if (result.stream_url) {
+        try {
+          status = await streamAnalysis(result.stream_url, result.preliminary);
+        } catch (streamError) {
+          console.warn('Streaming failed, falling back to polling:', streamError);
+          status = await pollStatus(statusUrl, { status: 'queued' });
+        }
+      } else {
+        status = await pollStatus(statusUrl, result);
+      }
+
+      if (status.status === 'completed') {
+        setSubmissionResult({ ...status, success: true });
+      } else {
+        setSubmissionResult({ success: false, error: status.error || status.message });
+      }
+      setCurrentStep(STEPS.length - 1); // Move to complete step
     } catch (error) {
       console.error('Submission error:', error);
       setSubmissionResult({ success: false, error: error.message });
@@ -560,10 +654,59 @@ function ProcessingStep({ submitAssessment }) {
   );
 }
 
+// Provisional diagnosis scored on submit, shown until the full analysis completes
+const LEVERAGE_LABELS = {
+  compensation: 'Compensation',
+  positioning: 'Positioning',
+  alignment: 'Alignment'
+};
+
+function PreliminaryDiagnosis({ preliminary }) {
+  const profile = preliminary.alignment_profile;
+  return (
+    <div style={{ 
+      background: '#f9fafb', 
+      border: '2px dashed #d1d5db', 
+      borderRadius: '12px', 
+      padding: '30px', 
+      margin: '20px 0 30px',
+      textAlign: 'left'
+    }}>
+      <h3 style={{ fontSize: '20px', marginBottom: '5px', color: '#1a1a1a' }}>Your First Read</h3>
+      <p style={{ fontSize: '14px', color: '#666', marginBottom: '20px' }}>
+        Provisional - scored from your ratings and compensation. Your full report replaces it shortly.
+      </p>
+      <div style={{ display: 'grid', gridTemplateColumns: 'repeat(auto-fit, minmax(200px, 1fr))', gap: '20px' }}>
+        <div>
+          <div style={{ fontSize: '14px', color: '#666', marginBottom: '5px' }}>Alignment Profile</div>
+          <div style={{ fontSize: '18px', fontWeight: '600', color: '#1a1a1a', textTransform: 'capitalize' }}>
+            {profile.label} ({profile.score}/100)
+          </div>
+        </div>
+        <div>
+          <div style={{ fontSize: '14px', color: '#666', marginBottom: '5px' }}>Weakest Factor</div>
+          <div style={{ fontSize: '18px', fontWeight: '600', color: '#dc2626', textTransform: 'capitalize' }}>
+            {profile.weakest} ({profile.factors[profile.weakest]}/100)
+          </div>
+        </div>
+        <div>
+          <div style={{ fontSize: '14px', color: '#666', marginBottom: '5px' }}>Biggest Leverage</div>
+          <ol style={{ margin: 0, paddingLeft: '20px', fontSize: '16px', color: '#1a1a1a' }}>
+            {preliminary.leverage_ranking.map((item) => (
+              <li key={item.area}>{LEVERAGE_LABELS[item.area] || item.area} ({item.score})</li>
+            ))}
+          </ol>
+        </div>
+      </div>
+    </div>
+  );
+}
+
 // Step 8: Complete
 function CompleteStep({ submissionResult }) {
   const isProcessing = submissionResult?.status === 'processing';
   const analysis = submissionResult?.analysis;
+  const preliminary = submissionResult?.status !== 'completed' ? submissionResult?.preliminary : null;
   const calendlyUrl = submissionResult?.schedule_call_url || 'https://calendly.com/drcraigmiller-careerflowframework/strategy-call';
 
   // Beautiful results view
@@ -576,6 +719,8 @@ function CompleteStep({ submissionResult }) {
           Your personalized analysis is ready. Here's your comprehensive assessment:
         </p>
 
+        {preliminary && <PreliminaryDiagnosis preliminary={preliminary} />}
+
         {/* Executive Summary */}
         <div style={{ 
           background: 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)', 
@@ -789,7 +934,11 @@ function CompleteStep({ submissionResult }) {
           </p>
           <div className="processing-note" style={{ margin: '20px 0', padding: '15px', background: '#fff3cd', borderRadius: '8px', border: '1px solid #ffc107' }}>
             <p>⏳ Please wait while we analyze your responses...</p>
+            {submissionResult.queue_position > 1 && (
+              <p>We're busy right now - you are number {submissionResult.queue_position} in line.</p>
+            )}
           </div>
+          {preliminary && <PreliminaryDiagnosis preliminary={preliminary} />}
         </>
       ) : (
         <>
@@ -69,7 +69,7 @@ fi
 
 # Initialize database
 echo "Initializing database..."
-python -c "from app import app, db; app.app_context().push(); db.create_all(); print('✓ Database initialized')"
+flask --app app init-db && echo "✓ Database initialized"
 
 cd ..
 